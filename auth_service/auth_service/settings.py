@@ -29,6 +29,10 @@ def get_env_variable(var_name, default=None):
     raise ImproperlyConfigured(f"Set the {var_name} environment variable")
 
 
+def get_env_bool(var_name, default=False):
+    return get_env_variable(var_name, str(default)).lower() in ("1", "true", "yes")
+
+
 # Build paths inside the project like this: BASE_DIR / 'subdir'.
 BASE_DIR = Path(__file__).resolve().parent.parent
 
@@ -63,6 +67,8 @@ INSTALLED_APPS = [
 
 MIDDLEWARE = [
     "corsheaders.middleware.CorsMiddleware",
+    "telegram_user.middleware.RateLimitMiddleware",
+    "telegram_user.middleware.ProfilingMiddleware",
     "django.middleware.security.SecurityMiddleware",
     "django.contrib.sessions.middleware.SessionMiddleware",
     "django.middleware.common.CommonMiddleware",
@@ -95,17 +101,77 @@ WSGI_APPLICATION = "auth_service.wsgi.application"
 # Database
 # https://docs.djangoproject.com/en/5.2/ref/settings/#databases
 
+# Connections are kept across requests. With DB_POOL_ENABLED (default) every
+# worker process holds a psycopg 3 pool of DB_POOL_MIN_SIZE..DB_POOL_MAX_SIZE
+# connections shared by its threads, opened at worker start (gunicorn.conf.py);
+# a request waits at most DB_POOL_TIMEOUT seconds for a free connection.
+# Under gunicorn the DB_POOL_MAX_SIZE default follows the worker class (see
+# gunicorn.conf.py): a sync worker never uses more than one connection.
+# Without the pool each thread keeps its own connection for DB_CONN_MAX_AGE
+# seconds. DB_CONN_HEALTH_CHECKS verifies a reused connection before a request
+# gets it, so a connection dropped by the server is replaced instead of failing.
+DB_POOL_ENABLED = get_env_bool("DB_POOL_ENABLED", True)
+DB_CONN_HEALTH_CHECKS = get_env_bool("DB_CONN_HEALTH_CHECKS", True)
+DB_POOL = {
+    "min_size": int(get_env_variable("DB_POOL_MIN_SIZE", "1")),
+    "max_size": int(get_env_variable("DB_POOL_MAX_SIZE", "8")),
+    "timeout": float(get_env_variable("DB_POOL_TIMEOUT", "10")),
+    # Idle connections above min_size are closed after max_idle seconds
+    "max_idle": float(get_env_variable("DB_POOL_MAX_IDLE", "300")),
+}
+if DB_CONN_HEALTH_CHECKS:
+    from psycopg_pool import ConnectionPool
+
+    DB_POOL["check"] = ConnectionPool.check_connection
+
 DATABASES = {
     "default": {
-        "ENGINE": "django.db.backends.postgresql_psycopg2",
+        "ENGINE": "django.db.backends.postgresql",
         "NAME": get_env_variable("DB_NAME"),
         "USER": get_env_variable("DB_USER"),
         "PASSWORD": get_env_variable("DB_PASSWORD"),
         "HOST": get_env_variable("DB_HOST"),
         "PORT": get_env_variable("DB_PORT"),
+        # The pool keeps connections itself and is incompatible with CONN_MAX_AGE
+        "CONN_MAX_AGE": (
+            0 if DB_POOL_ENABLED else int(get_env_variable("DB_CONN_MAX_AGE", "60"))
+        ),
+        "CONN_HEALTH_CHECKS": DB_CONN_HEALTH_CHECKS,
+        "OPTIONS": {"pool": DB_POOL} if DB_POOL_ENABLED else {},
     }
 }
 
+# Read replicas: DB_REPLICAS is a comma-separated list of host[:port][/name]
+# reached with the primary's credentials (replica_0, replica_1, ...). Reads of
+# TELEGRAM_USER_REPLICAS["MODELS"] go to a random replica; writes and every other
+# model, including refresh-token rotation and revocation, stay on the primary.
+# A refresh or access token issued less than READ_YOUR_WRITES_WINDOW seconds ago
+# means the user has just logged in, so its reads go to the primary as well.
+for index, replica in enumerate(
+    filter(None, get_env_variable("DB_REPLICAS", "").split(","))
+):
+    address, _, name = replica.strip().partition("/")
+    host, _, port = address.partition(":")
+    DATABASES[f"replica_{index}"] = {
+        **DATABASES["default"],
+        "NAME": name or DATABASES["default"]["NAME"],
+        "HOST": host,
+        "PORT": port or DATABASES["default"]["PORT"],
+        "OPTIONS": {**DATABASES["default"]["OPTIONS"]},
+        # В тестах реплика - то же соединение к тестовой БД, что и основная
+        "TEST": {"MIRROR": "default"},
+    }
+
+DATABASE_ROUTERS = ["telegram_user.db_router.ReplicaRouter"]
+
+TELEGRAM_USER_REPLICAS = {
+    "ALIASES": [alias for alias in DATABASES if alias != "default"],
+    "MODELS": ["telegram_user.telegramuser"],
+    "READ_YOUR_WRITES_WINDOW": float(
+        get_env_variable("DB_READ_YOUR_WRITES_WINDOW", "5")
+    ),
+}
+
 
 # Password validation
 # https://docs.djangoproject.com/en/5.2/ref/settings/#auth-password-validators
@@ -150,7 +216,7 @@ DEFAULT_AUTO_FIELD = "django.db.models.BigAutoField"
 
 REST_FRAMEWORK = {
     "DEFAULT_AUTHENTICATION_CLASSES": [
-        "rest_framework_simplejwt.authentication.JWTAuthentication",
+        "telegram_user.authentication.TelegramJWTAuthentication",
     ],
     "DEFAULT_PERMISSION_CLASSES": [
         "rest_framework.permissions.AllowAny",
@@ -163,7 +229,9 @@ SIMPLE_JWT = {
     "ROTATE_REFRESH_TOKENS": True,
     "BLACKLIST_AFTER_ROTATION": True,
     "SIGNING_KEY": JWT_SECRET_KEY,
-    "ALGORITHM": "HS256",
+    # HS256 (JWT_SECRET_KEY) or EdDSA/ES256 with keys from TELEGRAM_USER_JWT_KEYS
+    "ALGORITHM": get_env_variable("JWT_ALGORITHM", "HS256"),
+    "AUTH_TOKEN_CLASSES": ("telegram_user.services.tokens.TelegramAccessToken",),
     # Cookie settings
     # 'AUTH_COOKIE': 'access_token',
     # 'REFRESH_COOKIE': 'refresh_token',
@@ -180,19 +248,30 @@ SIMPLE_JWT = {
 # CSRF_USE_SESSIONS = False
 
 # Logging Configuration
+# Records go through a queue: formatting and file I/O run in a QueueListener
+# thread, repeated identical records are sampled before they are queued
 LOGGING = {
     "version": 1,
     "disable_existing_loggers": False,
     "formatters": {
         "verbose": {
+            "()": "telegram_user.log.StructuredFormatter",
             "format": "{levelname} {asctime} {module} {message}",
             "style": "{",
         },
         "simple": {
+            "()": "telegram_user.log.StructuredFormatter",
             "format": "{levelname} {message}",
             "style": "{",
         },
     },
+    "filters": {
+        "sampling": {
+            "()": "telegram_user.log.SamplingFilter",
+            "burst": int(get_env_variable("LOG_SAMPLING_BURST", "10")),
+            "interval": float(get_env_variable("LOG_SAMPLING_INTERVAL", "60")),
+        },
+    },
     "handlers": {
         "console": {
             "class": "logging.StreamHandler",
@@ -207,21 +286,142 @@ LOGGING = {
             "formatter": "verbose",
             "level": "INFO",
         },
+        # Started by telegram_user.log.start_queue_listener(); stopped around fork
+        # and restarted in the parent and the child
+        "queue": {
+            "class": "telegram_user.log.LazyQueueHandler",
+            "handlers": ["console", "file"],
+            "respect_handler_level": True,
+            "filters": ["sampling"],
+        },
     },
     "loggers": {
         "telegram_user": {
-            "handlers": ["console", "file"],
+            "handlers": ["queue"],
             "level": "DEBUG" if DEBUG else "WARNING",
             "propagate": False,
         },
         "django": {
-            "handlers": ["console", "file"],
+            "handlers": ["queue"],
             "level": "WARNING",
             "propagate": False,
         },
     },
 }
 
+# Telegram
+# Bot tokens (comma separated), one per Mini App served by this instance
+TELEGRAM_BOT_TOKENS = [
+    token.strip()
+    for token in get_env_variable("BOT_TOKEN", default="").split(",")
+    if token.strip()
+]
+
+# Write-behind profile updates: returning users' profile changes are buffered
+# per worker and flushed in bulk every FLUSH_INTERVAL seconds or MAX_SIZE entries
+TELEGRAM_USER_WRITE_BEHIND = {
+    "ENABLED": get_env_bool("WRITE_BEHIND_ENABLED"),
+    "FLUSH_INTERVAL": float(get_env_variable("WRITE_BEHIND_FLUSH_INTERVAL", "1.0")),
+    "MAX_SIZE": int(get_env_variable("WRITE_BEHIND_MAX_SIZE", "500")),
+}
+
+# User summary cache for the refresh path: "locmem" (per worker LRU),
+# "mmap" (shared memory across workers), "django" (Django cache framework)
+# or a dotted path to a backend class
+TELEGRAM_USER_CACHE = {
+    "BACKEND": get_env_variable("USER_CACHE_BACKEND", "locmem"),
+    "TTL": int(get_env_variable("USER_CACHE_TTL", "300")),
+    "MAX_SIZE": int(get_env_variable("USER_CACHE_MAX_SIZE", "10000")),
+    "OPTIONS": {},
+}
+
+# Asymmetric JWT signing keys: JWT_KEYS="kid=/path/key.pem,..." (private or
+# public PEM). Tokens are signed by JWT_ACTIVE_KID (default: the first key), all keys
+# are accepted for verification and published at /.well-known/jwks.json
+TELEGRAM_USER_JWT_KEYS = {
+    "ACTIVE_KID": get_env_variable("JWT_ACTIVE_KID", default=""),
+    "KEYS": dict(
+        item.strip().split("=", 1)
+        for item in get_env_variable("JWT_KEYS", default="").split(",")
+        if item.strip()
+    ),
+    "JWKS_MAX_AGE": int(get_env_variable("JWKS_MAX_AGE", "300")),
+}
+
+# Trusted backends (bot backend, gateway) allowed to call the batch verification
+# and introspection endpoints: comma separated keys sent in the X-Service-Key header
+TELEGRAM_USER_TRUSTED_SERVICE_KEYS = [
+    key.strip()
+    for key in get_env_variable("TRUSTED_SERVICE_KEYS", default="").split(",")
+    if key.strip()
+]
+TELEGRAM_USER_BATCH_MAX_SIZE = int(get_env_variable("BATCH_VERIFY_MAX_SIZE", "1000"))
+# Verified access tokens kept per worker for the introspection endpoint
+TELEGRAM_USER_INTROSPECTION_CACHE_SIZE = int(
+    get_env_variable("INTROSPECTION_CACHE_SIZE", "10000")
+)
+
+# Serve login and refresh with native async views (enable when running under ASGI)
+TELEGRAM_USER_ASYNC_VIEWS = get_env_bool("ASYNC_VIEWS")
+
+# Refresh token revocation store: "database" (RevokedToken table with a
+# per-worker Bloom filter prefilter) or "local" (in-process, single worker/tests)
+TELEGRAM_USER_REVOCATION = {
+    "BACKEND": get_env_variable("REVOCATION_BACKEND", "database"),
+    "BLOOM_CAPACITY": int(get_env_variable("REVOCATION_BLOOM_CAPACITY", "1000000")),
+    "BLOOM_ERROR_RATE": float(get_env_variable("REVOCATION_BLOOM_ERROR_RATE", "0.001")),
+    "OPTIONS": {
+        "sync_interval": float(get_env_variable("REVOCATION_SYNC_INTERVAL", "5")),
+        "rebuild_interval": float(
+            get_env_variable("REVOCATION_REBUILD_INTERVAL", "3600")
+        ),
+    },
+}
+
+# Token-bucket rate limits checked in middleware before DRF and initData checks.
+# Rates are "<count>/<s|m|h>": bucket of <count> tokens refilled over the period.
+# BACKEND: "mmap" (shared by the workers of a host), "django" (CACHES, e.g. Redis,
+# shared by hosts) or "local" (per worker); local buckets are also the fallback
+TELEGRAM_USER_RATE_LIMIT = {
+    "ENABLED": get_env_bool("RATE_LIMIT_ENABLED", True),
+    "BACKEND": get_env_variable("RATE_LIMIT_BACKEND", "mmap"),
+    "MAX_KEYS": int(get_env_variable("RATE_LIMIT_MAX_KEYS", "65536")),
+    "OPTIONS": {},
+    # Behind a reverse proxy use e.g. HTTP_X_REAL_IP
+    "IP_HEADER": get_env_variable("RATE_LIMIT_IP_HEADER", "REMOTE_ADDR"),
+    "IP": get_env_variable("RATE_LIMIT_IP", "20/s"),
+    "TELEGRAM_ID": get_env_variable("RATE_LIMIT_TELEGRAM_ID", "30/m"),
+    "ENDPOINTS": {
+        "telegram-login": get_env_variable("RATE_LIMIT_LOGIN", "500/s"),
+        "token-refresh": get_env_variable("RATE_LIMIT_REFRESH", "500/s"),
+        "token-logout": get_env_variable("RATE_LIMIT_LOGOUT", "500/s"),
+    },
+}
+
+# Prometheus metrics at /metrics: per-stage latency histograms and result
+# counters. Each worker writes a snapshot to DIR (default /dev/shm) at most every
+# FLUSH_INTERVAL seconds, the endpoint sums the snapshots of all live workers
+TELEGRAM_USER_METRICS = {
+    "ENABLED": get_env_bool("METRICS_ENABLED", True),
+    "DIR": get_env_variable("METRICS_DIR", default=""),
+    "FLUSH_INTERVAL": float(get_env_variable("METRICS_FLUSH_INTERVAL", "1.0")),
+}
+
+# cProfile of login and refresh requests, written to DIR (the newest MAX_FILES
+# are kept) and summarized by "manage.py profile_summary". ENABLED installs the
+# middleware (without it there is no overhead); then SAMPLE_RATE of requests is
+# profiled, or the rate set by the ProfilingSwitch in the admin
+TELEGRAM_USER_PROFILING = {
+    "ENABLED": get_env_bool("PROFILING_ENABLED"),
+    "SAMPLE_RATE": float(get_env_variable("PROFILING_SAMPLE_RATE", "0")),
+    "DIR": get_env_variable("PROFILING_DIR", str(BASE_DIR / "logs" / "profiles")),
+    "MAX_FILES": int(get_env_variable("PROFILING_MAX_FILES", "100")),
+    "VIEWS": ("telegram-login", "token-refresh"),
+    "SWITCH_CHECK_INTERVAL": float(
+        get_env_variable("PROFILING_SWITCH_CHECK_INTERVAL", "5")
+    ),
+}
+
 # CORS
 
 if DEBUG:
@@ -0,0 +1,44 @@
+"""
+API-only settings profile: the token endpoints without the admin site.
+
+Login, refresh and the other endpoints are stateless JSON, so sessions,
+messages, static files, templates and their middleware are not loaded.
+The admin runs as a separate deployment with the full auth_service.settings.
+Select with DJANGO_SETTINGS_MODULE=auth_service.settings_api.
+
+Compare both profiles with "python -m benchmarks.profiles".
+"""
+
+from .settings import *
+from .settings import REST_FRAMEWORK
+
+# django.contrib.auth and contenttypes stay: token_blacklist models reference
+# AUTH_USER_MODEL and DRF uses AnonymousUser for unauthenticated requests
+INSTALLED_APPS = [
+    "django.contrib.auth",
+    "django.contrib.contenttypes",
+    "rest_framework",
+    "rest_framework_simplejwt.token_blacklist",
+    "telegram_user",
+]
+
+# No session, CSRF, auth, message or clickjacking middleware: the API uses
+# bearer tokens and its views are CSRF-exempt. CommonMiddleware stays because
+# it validates the Host header against ALLOWED_HOSTS
+MIDDLEWARE = [
+    "corsheaders.middleware.CorsMiddleware",
+    "telegram_user.middleware.RateLimitMiddleware",
+    "telegram_user.middleware.ProfilingMiddleware",
+    "django.middleware.security.SecurityMiddleware",
+    "django.middleware.common.CommonMiddleware",
+]
+
+ROOT_URLCONF = "auth_service.urls_api"
+
+# JSON only: the browsable API is the one consumer of the template engine
+TEMPLATES = []
+
+REST_FRAMEWORK = {
+    **REST_FRAMEWORK,
+    "DEFAULT_RENDERER_CLASSES": ["rest_framework.renderers.JSONRenderer"],
+}
@@ -17,8 +17,11 @@ Including another URLconf
 
 from django.contrib import admin
 from django.urls import include, path
+from telegram_user.views import JWKSView, MetricsView
 
 urlpatterns = [
     path("admin/", admin.site.urls),
+    path(".well-known/jwks.json", JWKSView.as_view(), name="jwks"),
+    path("metrics", MetricsView.as_view(), name="metrics"),
     path("api/v1/tguser/", include("telegram_user.urls")),
 ]
@@ -0,0 +1,13 @@
+"""
+URL configuration of the API-only profile (auth_service.settings_api):
+the same endpoints as auth_service.urls without the admin site.
+"""
+
+from django.urls import include, path
+from telegram_user.views import JWKSView, MetricsView
+
+urlpatterns = [
+    path(".well-known/jwks.json", JWKSView.as_view(), name="jwks"),
+    path("metrics", MetricsView.as_view(), name="metrics"),
+    path("api/v1/tguser/", include("telegram_user.urls")),
+]
@@ -0,0 +1,102 @@
+"""
+Микро-бенчмарк разбора WebAppInitData: однопроходный парсер против прежней
+реализации на parse_qs.
+
+Запуск из каталога auth_service:
+    python -m benchmarks.bench_tg_parser
+"""
+
+import hashlib
+import hmac
+import logging
+import time
+import timeit
+from datetime import datetime, timedelta
+from urllib.parse import parse_qs
+
+from django.core.exceptions import ValidationError
+from telegram_user.services.tg_bot_keys import TelegramBotKeyRegistry
+from telegram_user.services.tg_parser import TelegramDataParser
+from telegram_user.services.tg_signer import TelegramDataSigner
+
+BOT_TOKEN = "1234567890:BENCHMARK_BOT_TOKEN"
+
+
+class LegacyTelegramDataParser:
+    """Прежняя реализация проверки initData (parse_qs + HMAC от bot_token на каждый вызов)."""
+
+    INITDATA_MAX_AGE = timedelta(hours=1)
+
+    @classmethod
+    def _check_hash(cls, parsedData: dict, bot_token: str) -> bool:
+        received_hash = parsedData["hash"][0]
+        filtered_data = {k: v[0] for k, v in parsedData.items() if k != "hash"}
+        data_check_string = "\n".join(
+            f"{k}={v}" for k, v in sorted(filtered_data.items())
+        )
+        secret_key = hmac.new(
+            key=b"WebAppData", msg=bot_token.encode(), digestmod=hashlib.sha256
+        ).digest()
+        computed_hash = hmac.new(
+            key=secret_key, msg=data_check_string.encode(), digestmod=hashlib.sha256
+        ).hexdigest()
+        return computed_hash == received_hash
+
+    @classmethod
+    def _validate_and_parse(cls, initData: str) -> dict:
+        try:
+            parsedData = parse_qs(initData)
+            auth_date = int(parsedData.get("auth_date")[0])
+            if (
+                datetime.now() - datetime.fromtimestamp(auth_date)
+                > cls.INITDATA_MAX_AGE
+            ):
+                raise ValidationError("initData is too old")
+            if not cls._check_hash(parsedData, BOT_TOKEN):
+                raise ValidationError("Invalid hash signature")
+            return parsedData
+        except (KeyError, ValueError, TypeError, AttributeError) as e:
+            raise ValidationError(f"Invalid data format: {e}")
+
+
+def build_cases() -> dict:
+    valid = TelegramDataSigner.build_init_data(
+        BOT_TOKEN, 123456789, "Test", "User", "testtguser"
+    )
+    return {
+        "valid": valid,
+        "bad_hash": valid[:-8] + "deadbeef",
+        "stale_auth_date": TelegramDataSigner.build_init_data(
+            BOT_TOKEN, 123456789, "Test", auth_date=int(time.time()) - 7200
+        ),
+        "unknown_field": "junk=1&" + valid,
+        "oversized": "user=" + "A" * 8192,
+    }
+
+
+def run_case(func, init_data: str, number: int) -> float:
+    def call():
+        try:
+            func(init_data)
+        except ValidationError:
+            pass
+
+    return min(timeit.repeat(call, number=number, repeat=5)) / number * 1e6
+
+
+def main(number: int = 20000) -> None:
+    # Логирование отключено: измеряется только стоимость разбора и проверки
+    logging.getLogger("telegram_user").disabled = True
+    TelegramBotKeyRegistry.load([BOT_TOKEN])
+
+    print(f"{'case':<18}{'legacy, us':>12}{'new, us':>12}{'speedup':>10}")
+    for name, init_data in build_cases().items():
+        legacy = run_case(
+            LegacyTelegramDataParser._validate_and_parse, init_data, number
+        )
+        new = run_case(TelegramDataParser._validate_and_parse, init_data, number)
+        print(f"{name:<18}{legacy:>12.2f}{new:>12.2f}{legacy / new:>9.1f}x")
+
+
+if __name__ == "__main__":
+    main()
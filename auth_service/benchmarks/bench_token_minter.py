@@ -0,0 +1,101 @@
+"""
+Микро-бенчмарк выпуска пары JWT: TokenMinter против прежнего пути через
+объекты RefreshToken/AccessToken simplejwt.
+
+Запуск из каталога auth_service:
+    python -m benchmarks.bench_token_minter
+"""
+
+import logging
+import os
+import tempfile
+import timeit
+from pathlib import Path
+
+import django
+
+os.environ.setdefault("DJANGO_SETTINGS_MODULE", "auth_service.settings")
+django.setup()
+
+from cryptography.hazmat.primitives import serialization
+from cryptography.hazmat.primitives.asymmetric import ec, ed25519
+from django.conf import settings
+from django.test import override_settings
+from telegram_user.services.token_minter import TokenMinter
+from telegram_user.services.tokens import TelegramRefreshToken
+
+TELEGRAM_ID = 123456789
+
+
+def legacy_generate() -> dict:
+    """Прежняя реализация TelegramUserAuthService._generate_jwt_token."""
+    refresh = TelegramRefreshToken()
+
+    refresh.access_token["telegram_id"] = TELEGRAM_ID
+    refresh["telegram_id"] = TELEGRAM_ID
+
+    return {"access": str(refresh.access_token), "refresh": str(refresh)}
+
+
+def minter_generate() -> dict:
+    return TokenMinter.mint_pair({"telegram_id": TELEGRAM_ID})
+
+
+def write_key(directory: str, private_key) -> str:
+    path = Path(directory) / "key.pem"
+    path.write_bytes(
+        private_key.private_bytes(
+            serialization.Encoding.PEM,
+            serialization.PrivateFormat.PKCS8,
+            serialization.NoEncryption(),
+        )
+    )
+    return str(path)
+
+
+def build_cases(directory: str) -> dict:
+    """Настройки SIMPLE_JWT и TELEGRAM_USER_JWT_KEYS для каждого алгоритма."""
+    keys = {
+        "HS256": None,
+        "EdDSA": ed25519.Ed25519PrivateKey.generate(),
+        "ES256": ec.generate_private_key(ec.SECP256R1()),
+    }
+    cases = {}
+    for algorithm, private_key in keys.items():
+        case_dir = Path(directory) / algorithm
+        case_dir.mkdir()
+        cases[algorithm] = {
+            "SIMPLE_JWT": {**settings.SIMPLE_JWT, "ALGORITHM": algorithm},
+            "TELEGRAM_USER_JWT_KEYS": {
+                **settings.TELEGRAM_USER_JWT_KEYS,
+                "ACTIVE_KID": "",
+                "KEYS": (
+                    {"k1": write_key(case_dir, private_key)} if private_key else {}
+                ),
+            },
+        }
+    return cases
+
+
+def run_case(func, number: int) -> float:
+    func()
+    return min(timeit.repeat(func, number=number, repeat=5)) / number * 1e6
+
+
+def main(number: int = 5000) -> None:
+    logging.getLogger("telegram_user").disabled = True
+
+    print(f"{'algorithm':<12}{'legacy, us':>12}{'minter, us':>12}{'speedup':>10}")
+    with tempfile.TemporaryDirectory() as directory:
+        for algorithm, overrides in build_cases(directory).items():
+            with override_settings(**overrides):
+                legacy = run_case(legacy_generate, number)
+                minter = run_case(minter_generate, number)
+            print(
+                f"{algorithm:<12}{legacy:>12.2f}{minter:>12.2f}"
+                f"{legacy / minter:>9.1f}x"
+            )
+
+
+if __name__ == "__main__":
+    main()
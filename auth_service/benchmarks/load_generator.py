@@ -0,0 +1,277 @@
+"""
+Генератор подписанного трафика для нагрузочного теста входа и обновления
+токенов. Запускается командой authload из каталога auth_service:
+    python manage.py authload --url http://127.0.0.1:8000
+"""
+
+import http.client
+import itertools
+import json
+import random
+import threading
+import time
+from collections import Counter, defaultdict, deque
+from typing import NamedTuple
+from urllib.parse import urlsplit
+
+from telegram_user.services.tg_signer import TelegramDataSigner
+
+# Виды запросов и статус, который для них ожидается
+REQUEST_KINDS = {
+    "new": 200,
+    "returning": 200,
+    "refresh": 200,
+    "stale": 401,
+    "bad_hash": 401,
+}
+DEFAULT_MIX = "new=0.1,returning=0.5,refresh=0.3,stale=0.05,bad_hash=0.05"
+
+
+class TrafficMix(NamedTuple):
+    """Доли видов запросов в генерируемом трафике."""
+
+    kinds: tuple[str, ...]
+    weights: tuple[float, ...]
+
+    @classmethod
+    def parse(cls, mix: str) -> "TrafficMix":
+        """Разбирает строку вида "new=0.1,returning=0.5,refresh=0.4"."""
+        weights = {}
+        for item in mix.split(","):
+            kind, _, weight = item.strip().partition("=")
+            if kind not in REQUEST_KINDS:
+                raise ValueError(f"Unknown request kind: {kind!r}")
+            weights[kind] = float(weight)
+        if not any(weights.values()):
+            raise ValueError("Traffic mix is empty")
+        return cls(tuple(weights), tuple(weights.values()))
+
+    def choose(self, rnd: random.Random) -> str:
+        return rnd.choices(self.kinds, self.weights)[0]
+
+
+class Result(NamedTuple):
+    kind: str
+    status: int | str
+    latency: float
+
+
+class LoadReport:
+    """Результаты прогона: задержки и исходы по видам запросов."""
+
+    def __init__(self):
+        self.latencies: dict[str, list[float]] = defaultdict(list)
+        self.outcomes: dict[str, Counter] = defaultdict(Counter)
+        self.elapsed = 0.0
+
+    def add(self, result: Result) -> None:
+        self.latencies[result.kind].append(result.latency)
+        self.outcomes[result.kind][result.status] += 1
+
+    @property
+    def total(self) -> int:
+        return sum(len(latencies) for latencies in self.latencies.values())
+
+    def errors(self, kind: str) -> Counter:
+        """Исходы, отличные от ожидаемого статуса."""
+        return Counter(
+            {
+                status: count
+                for status, count in self.outcomes[kind].items()
+                if status != REQUEST_KINDS[kind]
+            }
+        )
+
+    @staticmethod
+    def percentile(latencies: list[float], percent: float) -> float:
+        ordered = sorted(latencies)
+        return ordered[min(len(ordered) - 1, int(len(ordered) * percent / 100))]
+
+    def rows(self) -> list[dict]:
+        rows = []
+        for kind in REQUEST_KINDS:
+            if not (latencies := self.latencies.get(kind)):
+                continue
+            rows.append(
+                {
+                    "kind": kind,
+                    "requests": len(latencies),
+                    "rps": len(latencies) / self.elapsed if self.elapsed else 0.0,
+                    **{
+                        f"p{p}": self.percentile(latencies, p) * 1000
+                        for p in (50, 95, 99)
+                    },
+                    "errors": self.errors(kind),
+                }
+            )
+        return rows
+
+
+class LoadGenerator:
+    """
+    Нагрузка на эндпоинты входа и обновления токенов подписанным трафиком.
+    Пользователи синтезируются с корректным хэшем initData (TelegramDataSigner);
+    refresh использует токены, выданные предыдущими входами. Каждый поток держит
+    своё keep-alive соединение, общий темп задаётся rate запросов в секунду.
+    """
+
+    LOGIN_PATH = "/api/v1/tguser/auth/login/"
+    REFRESH_PATH = "/api/v1/tguser/auth/refresh/"
+    FIRST_TELEGRAM_ID = 7_000_000_000
+
+    def __init__(
+        self,
+        base_url: str,
+        bot_token: str,
+        mix: TrafficMix,
+        users: int = 10000,
+        concurrency: int = 16,
+        rate: float | None = None,
+        bot_id: int | None = None,
+        timeout: float = 10.0,
+        seed: int | None = None,
+    ):
+        url = urlsplit(base_url)
+        self.connection_class = (
+            http.client.HTTPSConnection
+            if url.scheme == "https"
+            else http.client.HTTPConnection
+        )
+        self.netloc = url.netloc
+        self.prefix = url.path.rstrip("/")
+        self.bot_token = bot_token
+        self.mix = mix
+        self.users = users
+        self.concurrency = concurrency
+        self.interval = 1 / rate if rate else 0.0
+        self.bot_id = bot_id
+        self.timeout = timeout
+        self.seed = seed
+
+        self._lock = threading.Lock()
+        self._next_user = itertools.count()
+        self._registered: list[int] = []
+        self._refresh_tokens: deque[str] = deque(maxlen=users)
+        self._next_send = 0.0
+        self._remaining: int | None = None
+
+    def _init_data(self, telegram_id: int, auth_date: int | None = None) -> str:
+        return TelegramDataSigner.build_init_data(
+            self.bot_token,
+            telegram_id,
+            f"Load{telegram_id % 1000}",
+            "Test",
+            f"load_{telegram_id}",
+            auth_date=auth_date,
+        )
+
+    def _telegram_id(self, kind: str, rnd: random.Random) -> tuple[str, int]:
+        """Пользователь для входа. Когда популяция исчерпана, new становится returning."""
+        if kind == "new":
+            index = next(self._next_user)
+            if index < self.users:
+                return kind, self.FIRST_TELEGRAM_ID + index
+            kind = "returning"
+        with self._lock:
+            if self._registered:
+                return kind, rnd.choice(self._registered)
+        return kind, self.FIRST_TELEGRAM_ID + rnd.randrange(self.users)
+
+    def _request(self, kind: str, rnd: random.Random) -> tuple[str, str, dict]:
+        """Вид запроса (с учётом замен), путь и тело."""
+        if kind == "refresh":
+            with self._lock:
+                token = self._refresh_tokens.popleft() if self._refresh_tokens else None
+            if token is not None:
+                return kind, self.REFRESH_PATH, {"refresh_token": token}
+            kind = "returning"
+
+        kind, telegram_id = self._telegram_id(kind, rnd)
+        auth_date = int(time.time()) - 7200 if kind == "stale" else None
+        init_data = self._init_data(telegram_id, auth_date)
+        if kind == "bad_hash":
+            init_data = init_data[:-8] + "deadbeef"
+        body = {"initData": init_data}
+        if self.bot_id is not None:
+            body["botId"] = self.bot_id
+        return kind, self.LOGIN_PATH, body
+
+    def _remember(self, kind: str, body: dict) -> None:
+        """Запоминает пользователя и его refresh-токен из успешного ответа."""
+        data = body["data"]
+        with self._lock:
+            if kind == "new":
+                self._registered.append(data["user"]["telegram_id"])
+            self._refresh_tokens.append(data["tokens"]["refresh"])
+
+    def _pace(self) -> bool:
+        """Ждёт своей очереди при заданном rate. False, если лимит запросов исчерпан."""
+        with self._lock:
+            if self._remaining is not None:
+                if self._remaining <= 0:
+                    return False
+                self._remaining -= 1
+            if not self.interval:
+                return True
+            now = time.monotonic()
+            scheduled = max(now, self._next_send)
+            self._next_send = scheduled + self.interval
+        if scheduled > now:
+            time.sleep(scheduled - now)
+        return True
+
+    def _worker(self, worker_id: int, deadline: float, report: LoadReport) -> None:
+        rnd = random.Random(None if self.seed is None else self.seed + worker_id)
+        connection = None
+        while time.monotonic() < deadline and self._pace():
+            kind, path, body = self._request(self.mix.choose(rnd), rnd)
+            payload = json.dumps(body)
+            started = time.perf_counter()
+            try:
+                if connection is None:
+                    connection = self.connection_class(
+                        self.netloc, timeout=self.timeout
+                    )
+                connection.request(
+                    "POST",
+                    self.prefix + path,
+                    payload,
+                    {"Content-Type": "application/json"},
+                )
+                response = connection.getresponse()
+                content = response.read()
+                status = response.status
+            except (OSError, http.client.HTTPException) as e:
+                status = type(e).__name__
+                if connection is not None:
+                    connection.close()
+                connection = None
+            latency = time.perf_counter() - started
+
+            if status == 200:
+                self._remember(kind, json.loads(content))
+            with self._lock:
+                report.add(Result(kind, status, latency))
+        if connection is not None:
+            connection.close()
+
+    def run(self, duration: float, requests: int | None = None) -> LoadReport:
+        """Нагружает сервис duration секунд или до requests запросов."""
+        report = LoadReport()
+        self._remaining = requests
+        self._next_send = time.monotonic()
+        started = time.monotonic()
+        threads = [
+            threading.Thread(
+                target=self._worker,
+                args=(worker_id, started + duration, report),
+                daemon=True,
+            )
+            for worker_id in range(self.concurrency)
+        ]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        report.elapsed = time.monotonic() - started
+        return report
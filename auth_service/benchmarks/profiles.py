@@ -0,0 +1,172 @@
+"""
+Сравнение профилей настроек: полного (auth_service.settings) и API-only
+(auth_service.settings_api) по времени холодного старта воркера и накладным
+расходам на запрос.
+
+Каждый профиль запускается в отдельных процессах (--starts раз). Процесс
+замеряет загрузку WSGI-приложения (django.setup и цепочка middleware), первый
+запрос (импорт URLconf и представлений), число загруженных модулей, пиковый
+RSS и время запроса без обращений к БД: GET JWKS (обычное представление Django),
+POST входа без initData (DRF, 400) и GET /me без токена (DRF, 401). Rate limit
+и метрики в процессах выключены, чтобы замер отражал только профиль.
+
+Запуск из каталога auth_service (переменные окружения из .env):
+    python -m benchmarks.profiles
+    python -m benchmarks.profiles --starts 10 --requests 5000
+"""
+
+import argparse
+import io
+import json
+import logging
+import os
+import resource
+import statistics
+import subprocess
+import sys
+import time
+
+PROFILES = {
+    "full": "auth_service.settings",
+    "api": "auth_service.settings_api",
+}
+
+REQUESTS = {
+    "jwks": ("GET", "/.well-known/jwks.json", 200),
+    "login_invalid": ("POST", "/api/v1/tguser/auth/login/", 400),
+    "me_anonymous": ("GET", "/api/v1/tguser/auth/me/", 401),
+}
+
+
+def wsgi_request(application, host: str, method: str, path: str) -> int:
+    """Запрос напрямую к WSGI-приложению, без сети и тестового клиента Django."""
+    body = b"{}" if method == "POST" else b""
+    environ = {
+        "REQUEST_METHOD": method,
+        "PATH_INFO": path,
+        "QUERY_STRING": "",
+        "SERVER_NAME": host,
+        "SERVER_PORT": "80",
+        "SERVER_PROTOCOL": "HTTP/1.1",
+        "HTTP_HOST": host,
+        "REMOTE_ADDR": "127.0.0.1",
+        "CONTENT_TYPE": "application/json",
+        "CONTENT_LENGTH": str(len(body)),
+        "wsgi.input": io.BytesIO(body),
+        "wsgi.errors": sys.stderr,
+        "wsgi.url_scheme": "http",
+        "wsgi.multithread": False,
+        "wsgi.multiprocess": True,
+        "wsgi.run_once": False,
+    }
+    status = []
+    response = application(environ, lambda code, headers: status.append(code))
+    try:
+        for _ in response:
+            pass
+    finally:
+        response.close()
+    return int(status[0].split()[0])
+
+
+def worker(requests: int) -> dict:
+    """Замеры в текущем процессе; профиль задаёт DJANGO_SETTINGS_MODULE."""
+    started = time.perf_counter()
+    from auth_service.wsgi import application
+    from django.conf import settings
+
+    setup = time.perf_counter() - started
+    logging.disable(logging.CRITICAL)
+    host = next((h for h in settings.ALLOWED_HOSTS if "*" not in h), "localhost")
+
+    started = time.perf_counter()
+    wsgi_request(application, host, *REQUESTS["jwks"][:2])
+    first_request = time.perf_counter() - started
+
+    per_request = {}
+    for name, (method, path, expected) in REQUESTS.items():
+        status = wsgi_request(application, host, method, path)
+        if status != expected:
+            raise SystemExit(f"{name}: status {status}, expected {expected}")
+        started = time.perf_counter()
+        for _ in range(requests):
+            wsgi_request(application, host, method, path)
+        per_request[name] = (time.perf_counter() - started) / requests * 1e6
+
+    return {
+        "setup_ms": setup * 1000,
+        "first_request_ms": first_request * 1000,
+        "modules": len(sys.modules),
+        "rss_mib": resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024,
+        "per_request_us": per_request,
+    }
+
+
+def run_profile(settings_module: str, starts: int, requests: int) -> dict:
+    env = {
+        **os.environ,
+        "DJANGO_SETTINGS_MODULE": settings_module,
+        "RATE_LIMIT_ENABLED": "False",
+        "METRICS_ENABLED": "False",
+    }
+    runs = [
+        json.loads(
+            subprocess.run(
+                [sys.executable, "-m", "benchmarks.profiles", "--worker"]
+                + ["--requests", str(requests)],
+                env=env,
+                capture_output=True,
+                text=True,
+                check=True,
+            ).stdout
+        )
+        for _ in range(starts)
+    ]
+    # Медиана по запускам сглаживает шум файлового кэша и планировщика
+    result = {
+        key: statistics.median(run[key] for run in runs)
+        for key in ("setup_ms", "first_request_ms", "modules", "rss_mib")
+    }
+    result["per_request_us"] = {
+        name: statistics.median(run["per_request_us"][name] for run in runs)
+        for name in REQUESTS
+    }
+    return result
+
+
+def print_results(results: dict) -> None:
+    columns = ["setup, ms", "1st req, ms", "modules", "RSS, MiB"]
+    columns += [f"{name}, us" for name in REQUESTS]
+    print(f"{'profile':<10}" + "".join(f"{column:>18}" for column in columns))
+    for profile, result in results.items():
+        values = [
+            f"{result['setup_ms']:.1f}",
+            f"{result['first_request_ms']:.1f}",
+            f"{result['modules']:.0f}",
+            f"{result['rss_mib']:.1f}",
+        ]
+        values += [f"{result['per_request_us'][name]:.1f}" for name in REQUESTS]
+        print(f"{profile:<10}" + "".join(f"{value:>18}" for value in values))
+
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--starts", type=int, default=5, help="Processes per profile")
+    parser.add_argument("--requests", type=int, default=2000, help="Per request kind")
+    parser.add_argument("--worker", action="store_true", help=argparse.SUPPRESS)
+    args = parser.parse_args(argv)
+
+    if args.worker:
+        print(json.dumps(worker(args.requests)))
+        return 0
+
+    results = {
+        profile: run_profile(settings_module, args.starts, args.requests)
+        for profile, settings_module in PROFILES.items()
+    }
+    print_results(results)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
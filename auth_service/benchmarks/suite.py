@@ -0,0 +1,375 @@
+"""
+Набор бенчмарков парсера initData, выпуска токенов, сервисного слоя и эндпоинтов
+со сравнением с сохранённым базовым уровнем (benchmarks/baseline.json).
+
+Для каждого случая записываются операции в секунду, пик выделенной памяти
+на вызов (tracemalloc) и число SQL-запросов на вызов. Регрессией считается
+падение ops/s или рост памяти больше чем на --tolerance, а также любой
+лишний запрос к БД; при регрессии процесс завершается с кодом 1.
+
+Запуск из каталога auth_service (переменные окружения из .env; для случаев
+с БД создаётся и затем удаляется тестовая база PostgreSQL):
+    python -m benchmarks.suite
+    python -m benchmarks.suite --no-db --filter parser
+    python -m benchmarks.suite --update-baseline
+"""
+
+import argparse
+import itertools
+import json
+import logging
+import os
+import platform
+import statistics
+import sys
+import tempfile
+import time
+import tracemalloc
+from collections.abc import Callable
+from pathlib import Path
+from typing import NamedTuple
+
+import django
+
+BOT_TOKEN = "1234567890:BENCHMARK_BOT_TOKEN"
+
+os.environ.setdefault("DJANGO_SETTINGS_MODULE", "auth_service.settings")
+os.environ.setdefault("BOT_TOKEN", BOT_TOKEN)
+django.setup()
+
+from django.conf import settings
+from django.core.exceptions import ValidationError
+from django.db import connection
+from django.test import Client, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+from rest_framework.exceptions import AuthenticationFailed
+from telegram_user.models import TelegramUser
+from telegram_user.services.tg_bot_keys import TelegramBotKeyRegistry
+from telegram_user.services.tg_parser import TelegramDataParser
+from telegram_user.services.tg_signer import TelegramDataSigner
+from telegram_user.services.tg_user_auth import TelegramUserAuthService
+from telegram_user.services.token_minter import TokenMinter
+from telegram_user.services.user_cache import UserSummaryCache
+
+BASELINE_PATH = Path(__file__).with_name("baseline.json")
+FIRST_TELEGRAM_ID = 10_000_000
+
+
+class Case(NamedTuple):
+    """Случай бенчмарка: make(calls) возвращает функцию одного вызова."""
+
+    name: str
+    make: Callable[[int], Callable[[], object]]
+    number: int
+    db: bool = False
+
+
+def build_population(size: int, offset: int = 0, **kwargs) -> list[str]:
+    """Подписанные initData для size разных пользователей."""
+    return [
+        TelegramDataSigner.build_init_data(
+            BOT_TOKEN,
+            FIRST_TELEGRAM_ID + offset + i,
+            f"User{i}",
+            "Bench",
+            f"bench_user_{offset + i}",
+            **kwargs,
+        )
+        for i in range(size)
+    ]
+
+
+def cycled(func: Callable, items: list) -> Callable[[], object]:
+    """Вызов func со следующим элементом items по кругу."""
+    iterator = itertools.cycle(items)
+    return lambda: func(next(iterator))
+
+
+def expect_failure(func: Callable, items: list) -> Callable[[], object]:
+    """Как cycled, но для входных данных, которые должны быть отклонены."""
+    iterator = itertools.cycle(items)
+
+    def call():
+        try:
+            func(next(iterator))
+        except (ValidationError, AuthenticationFailed):
+            return
+        raise AssertionError("invalid input was accepted")
+
+    return call
+
+
+def parser_cases(population: list[str]) -> list[Case]:
+    parsed = TelegramDataParser._parse_fields(population[0])
+    secret_keys = TelegramBotKeyRegistry.secret_keys()
+    bad_hash = [init_data[:-8] + "deadbeef" for init_data in population]
+    stale = build_population(len(population), auth_date=int(time.time()) - 7200)
+    user = TelegramUser(telegram_id=FIRST_TELEGRAM_ID)
+
+    return [
+        Case(
+            "parser.check_hash",
+            lambda calls: lambda: TelegramDataParser._check_hash(parsed, secret_keys),
+            20000,
+        ),
+        Case(
+            "parser.parse_userData",
+            lambda calls: cycled(TelegramDataParser.parse_userData, population),
+            10000,
+        ),
+        Case(
+            "parser.parse_userData_bad_hash",
+            lambda calls: expect_failure(TelegramDataParser.parse_userData, bad_hash),
+            10000,
+        ),
+        Case(
+            "parser.parse_userData_stale",
+            lambda calls: expect_failure(TelegramDataParser.parse_userData, stale),
+            10000,
+        ),
+        Case(
+            "tokens.generate_jwt_token",
+            lambda calls: lambda: TelegramUserAuthService._generate_jwt_token(user),
+            5000,
+        ),
+    ]
+
+
+def db_cases(population: list[str]) -> list[Case]:
+    client = Client()
+    login_url = reverse("telegram-login")
+    refresh_url = reverse("token-refresh")
+    new_offset = itertools.count(len(population), len(population))
+
+    def new_users(calls):
+        # Каждый вызов создаёт пользователя, поэтому initData выпускаются заново
+        return cycled(
+            TelegramUserAuthService.authenticate,
+            build_population(calls, offset=next(new_offset)),
+        )
+
+    def refresh_tokens(calls):
+        # refresh-токен одноразовый: на каждый вызов свой
+        return [
+            TokenMinter.mint_pair({"telegram_id": FIRST_TELEGRAM_ID + i % 100})[
+                "refresh"
+            ]
+            for i in range(calls)
+        ]
+
+    def post(url, key):
+        def call(value):
+            response = client.post(url, {key: value})
+            assert response.status_code == 200, response.content
+            return response
+
+        return call
+
+    return [
+        Case("service.authenticate_new", new_users, 200, db=True),
+        Case(
+            "service.authenticate_returning",
+            lambda calls: cycled(TelegramUserAuthService.authenticate, population),
+            500,
+            db=True,
+        ),
+        Case(
+            "service.refresh_user_token",
+            lambda calls: cycled(
+                TelegramUserAuthService.refresh_user_token, refresh_tokens(calls)
+            ),
+            500,
+            db=True,
+        ),
+        Case(
+            "endpoint.login",
+            lambda calls: cycled(post(login_url, "initData"), population),
+            500,
+            db=True,
+        ),
+        Case(
+            "endpoint.refresh",
+            lambda calls: cycled(
+                post(refresh_url, "refresh_token"), refresh_tokens(calls)
+            ),
+            500,
+            db=True,
+        ),
+    ]
+
+
+def measure_speed(case: Case, repeat: int) -> float:
+    """Лучший результат из repeat прогонов по case.number вызовов, ops/s."""
+    best = float("inf")
+    for _ in range(repeat):
+        call = case.make(case.number)
+        started = time.perf_counter()
+        for _ in range(case.number):
+            call()
+        best = min(best, time.perf_counter() - started)
+    return case.number / best
+
+
+def measure_allocations(case: Case, calls: int = 20) -> int:
+    """Медиана пика памяти, выделенной за один вызов, в байтах."""
+    call = case.make(calls)
+    peaks = []
+    tracemalloc.start()
+    try:
+        for _ in range(calls):
+            tracemalloc.reset_peak()
+            before = tracemalloc.get_traced_memory()[0]
+            call()
+            peaks.append(tracemalloc.get_traced_memory()[1] - before)
+    finally:
+        tracemalloc.stop()
+    return int(statistics.median(peaks))
+
+
+def count_queries(case: Case, calls: int = 5) -> int:
+    """
+    Минимум SQL-запросов за один вызов из calls: периодические запросы
+    (догрузка фильтра отозванных токенов раз в SYNC_INTERVAL) не попадают в счёт.
+    """
+    call = case.make(calls)
+    counts = []
+    for _ in range(calls):
+        with CaptureQueriesContext(connection) as queries:
+            call()
+        counts.append(len(queries))
+    return min(counts)
+
+
+def run(cases: list[Case], repeat: int, with_db: bool) -> dict:
+    results = {}
+    for case in cases:
+        # Прогрев: кэши ключей, соединение с БД, импорт лениво загружаемых модулей
+        case.make(1)()
+        results[case.name] = {
+            "ops_per_sec": round(measure_speed(case, repeat), 1),
+            "alloc_bytes": measure_allocations(case),
+            "queries": count_queries(case) if with_db else None,
+        }
+    return results
+
+
+def compare(results: dict, baseline: dict, tolerance: float) -> list[str]:
+    """Описания регрессий относительно baseline."""
+    regressions = []
+    for name, result in results.items():
+        base = baseline.get(name)
+        if base is None:
+            continue
+        if result["ops_per_sec"] < base["ops_per_sec"] * (1 - tolerance):
+            regressions.append(
+                f"{name}: {result['ops_per_sec']:.0f} ops/s, "
+                f"baseline {base['ops_per_sec']:.0f}"
+            )
+        if result["alloc_bytes"] > base["alloc_bytes"] * (1 + tolerance) + 256:
+            regressions.append(
+                f"{name}: {result['alloc_bytes']} bytes allocated per call, "
+                f"baseline {base['alloc_bytes']}"
+            )
+        if None not in (result["queries"], base["queries"]) and (
+            result["queries"] > base["queries"]
+        ):
+            regressions.append(
+                f"{name}: {result['queries']} queries per call, "
+                f"baseline {base['queries']}"
+            )
+    return regressions
+
+
+def print_results(results: dict, baseline: dict) -> None:
+    print(f"{'case':<34}{'ops/s':>12}{'baseline':>12}{'alloc, B':>10}{'queries':>9}")
+    for name, result in results.items():
+        base = baseline.get(name, {}).get("ops_per_sec")
+        print(
+            f"{name:<34}{result['ops_per_sec']:>12.0f}"
+            f"{f'{base:.0f}' if base is not None else '-':>12}"
+            f"{result['alloc_bytes']:>10}"
+            f"{result['queries'] if result['queries'] is not None else '-':>9}"
+        )
+
+
+def parse_args(argv=None) -> argparse.Namespace:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--filter", default="", help="Only cases containing this")
+    parser.add_argument("--no-db", action="store_true", help="Skip database cases")
+    parser.add_argument("--population", type=int, default=1000)
+    parser.add_argument("--repeat", type=int, default=3)
+    parser.add_argument("--tolerance", type=float, default=0.25)
+    parser.add_argument("--baseline", type=Path, default=BASELINE_PATH)
+    parser.add_argument("--update-baseline", action="store_true")
+    return parser.parse_args(argv)
+
+
+def main(argv=None) -> int:
+    args = parse_args(argv)
+    logging.getLogger("telegram_user").disabled = True
+    TelegramBotKeyRegistry.load([BOT_TOKEN])
+
+    population = build_population(args.population)
+    cases = [
+        case
+        for case in parser_cases(population) + db_cases(population)
+        if args.filter in case.name and not (args.no_db and case.db)
+    ]
+
+    with (
+        tempfile.TemporaryDirectory() as metrics_dir,
+        override_settings(
+            ALLOWED_HOSTS=[*settings.ALLOWED_HOSTS, "testserver"],
+            TELEGRAM_BOT_TOKENS=[BOT_TOKEN],
+            TELEGRAM_USER_RATE_LIMIT={
+                **settings.TELEGRAM_USER_RATE_LIMIT,
+                "ENABLED": False,
+            },
+            TELEGRAM_USER_METRICS={
+                **settings.TELEGRAM_USER_METRICS,
+                "DIR": metrics_dir,
+            },
+        ),
+    ):
+        if args.no_db:
+            results = run(cases, args.repeat, with_db=False)
+        else:
+            old_name = connection.creation.create_test_db(verbosity=0)
+            try:
+                UserSummaryCache.clear()
+                # Пользователи популяции уже существуют: "returning" и refresh
+                for init_data in population:
+                    TelegramUserAuthService.authenticate(init_data)
+                results = run(cases, args.repeat, with_db=True)
+            finally:
+                connection.creation.destroy_test_db(old_name, verbosity=0)
+
+    baseline = {}
+    if args.baseline.exists():
+        baseline = json.loads(args.baseline.read_text())["results"]
+    print_results(results, baseline)
+
+    if args.update_baseline:
+        args.baseline.write_text(
+            json.dumps(
+                {
+                    "python": platform.python_version(),
+                    "machine": platform.machine(),
+                    "results": {**baseline, **results},
+                },
+                indent=2,
+            )
+            + "\n"
+        )
+        print(f"Baseline written to {args.baseline}")
+        return 0
+
+    regressions = compare(results, baseline, args.tolerance)
+    for regression in regressions:
+        print(f"REGRESSION {regression}")
+    return 1 if regressions else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
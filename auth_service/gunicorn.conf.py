@@ -0,0 +1,141 @@
+"""
+Конфигурация gunicorn для продакшена. Читается автоматически из рабочего
+каталога (auth_service/), любое значение можно переопределить переменной
+окружения GUNICORN_* или аргументом командной строки.
+
+Число воркеров считается от доступных процессору ядер (с учётом квоты cgroup
+контейнера): для асинхронных uvicorn-воркеров - по одному на ядро, для
+sync/gthread - 2 * ядра + 1. Приложение загружается до fork (preload_app),
+поэтому воркеры делят память мастера copy-on-write.
+"""
+
+import math
+import os
+import sys
+
+ASYNC_WORKER_CLASS = "uvicorn_worker.UvicornWorker"
+
+
+def _env(name: str, default):
+    value = os.getenv(name)
+    if value is None or value == "":
+        return default
+    if isinstance(default, bool):
+        return value.lower() in ("1", "true", "yes")
+    return type(default)(value)
+
+
+def cpu_count() -> int:
+    """Ядра, доступные процессу: affinity и квота CPU cgroup v2 (cpu.max)."""
+    cpus = len(os.sched_getaffinity(0))
+    try:
+        with open("/sys/fs/cgroup/cpu.max") as f:
+            quota, period = f.read().split()
+        if quota != "max":
+            cpus = min(cpus, math.ceil(int(quota) / int(period)))
+    except (OSError, ValueError):
+        pass
+    return max(1, cpus)
+
+
+# sync по умолчанию: на замерах (README) он быстрее uvicorn-воркера
+worker_class = _env("GUNICORN_WORKER_CLASS", "sync")
+_async = worker_class == ASYNC_WORKER_CLASS
+
+# ASGI для uvicorn-воркеров, WSGI для sync и gthread
+wsgi_app = (
+    "auth_service.asgi:application" if _async else "auth_service.wsgi:application"
+)
+bind = _env("GUNICORN_BIND", "0.0.0.0:8000")
+# WEB_CONCURRENCY - общепринятое имя переменной для числа воркеров
+workers = _env("WEB_CONCURRENCY", cpu_count() if _async else cpu_count() * 2 + 1)
+# threads > 1 превращает sync-воркер в gthread, поэтому потоки - только для gthread
+threads = _env("GUNICORN_THREADS", 4 if worker_class == "gthread" else 1)
+preload_app = _env("GUNICORN_PRELOAD", True)
+
+# Предел пула соединений с БД воркера по умолчанию: sync-воркер обрабатывает
+# один запрос за раз, gthread - threads запросов, uvicorn-воркер выполняет
+# синхронный код в пуле потоков. Поток write-behind занимает ещё одно
+# соединение. Настройки Django читают значение из окружения при загрузке
+# приложения, явно заданный DB_POOL_MAX_SIZE не меняется
+_db_pool_max_size = (8 if _async else threads) + _env("WRITE_BEHIND_ENABLED", False)
+os.environ.setdefault(
+    "DB_POOL_MAX_SIZE", str(max(_db_pool_max_size, _env("DB_POOL_MIN_SIZE", 1)))
+)
+
+# Воркер, не ответивший мастеру timeout секунд, перезапускается
+timeout = _env("GUNICORN_TIMEOUT", 30)
+graceful_timeout = _env("GUNICORN_GRACEFUL_TIMEOUT", 30)
+# Keep-alive соединений обратного прокси: держать дольше, чем прокси держит
+# их простаивающими, иначе возможна гонка закрытия
+keepalive = _env("GUNICORN_KEEPALIVE", 5)
+backlog = _env("GUNICORN_BACKLOG", 2048)
+
+# Перезапуск воркера после max_requests запросов ограничивает рост памяти;
+# jitter разносит перезапуски воркеров во времени
+max_requests = _env("GUNICORN_MAX_REQUESTS", 10000)
+max_requests_jitter = _env("GUNICORN_MAX_REQUESTS_JITTER", max_requests // 10)
+
+# Файл heartbeat в памяти: запись на диск не задерживает проверку живости
+worker_tmp_dir = "/dev/shm" if os.path.isdir("/dev/shm") else None
+accesslog = _env("GUNICORN_ACCESS_LOG", "") or None
+errorlog = "-"
+loglevel = _env("GUNICORN_LOG_LEVEL", "info")
+
+
+def on_starting(server):
+    """
+    При preload проверяет, что миграции применены: их применяет отдельное
+    задание (manage.py migrate_locked), а воркеры со старой схемой не запускаются.
+    SCHEMA_CHECK_WAIT - секунды ожидания, если задание ещё выполняется.
+    """
+    if not (server.cfg.preload_app and _env("SCHEMA_CHECK", True)):
+        return
+    from telegram_user.services.schema import SchemaState
+
+    pending = SchemaState.wait_until_current(_env("SCHEMA_CHECK_WAIT", 0.0))
+    if pending:
+        server.log.error(
+            "Unapplied migrations: %s. Run manage.py migrate_locked first",
+            ", ".join(pending),
+        )
+        sys.exit(1)
+
+
+def pre_fork(server, worker):
+    # Соединения и пулы БД, открытые мастером при preload, не должны наследоваться
+    if server.cfg.preload_app:
+        from telegram_user.services.db_pools import DatabasePools
+
+        DatabasePools.close_all()
+
+
+def post_fork(server, worker):
+    """
+    Заранее открывает соединения с БД (пул воркера или постоянное соединение),
+    чтобы первый запрос не ждал подключения. Без preload приложение ещё
+    не загружено: пул откроется при первом запросе. Поток логирования
+    перезапускается после fork обработчиками os.register_at_fork
+    (telegram_user.log.start_queue_listener).
+    """
+    if not server.cfg.preload_app:
+        return
+    from telegram_user.services.db_pools import DatabasePools
+
+    if failed := DatabasePools.warm_up():
+        server.log.warning(
+            "Worker %s: database warm-up failed for %s", worker.pid, ", ".join(failed)
+        )
+
+
+def worker_exit(server, worker):
+    """
+    Сбрасывает отложенные записи профилей и последний снимок метрик перед
+    завершением воркера: снимок переносится в архив метрик при следующем сборе.
+    """
+    from telegram_user.metrics import Metrics
+    from telegram_user.services.profile_buffer import ProfileWriteBuffer
+
+    ProfileWriteBuffer.flush()
+    if Metrics.enabled():
+        Metrics.flush()
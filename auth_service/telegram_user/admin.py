@@ -0,0 +1,18 @@
+from django.contrib import admin
+
+from .models import ProfilingSwitch
+
+
+@admin.register(ProfilingSwitch)
+class ProfilingSwitchAdmin(admin.ModelAdmin):
+    """Переключатель профилирования: действует, если установлен PROFILING_ENABLED."""
+
+    list_display = ("enabled", "sample_rate", "expires_at", "updated_at")
+
+    def has_add_permission(self, request):
+        # Middleware читает единственную строку pk=1
+        return not ProfilingSwitch.objects.exists()
+
+    def save_model(self, request, obj, form, change):
+        obj.pk = 1
+        super().save_model(request, obj, form, change)
@@ -4,3 +4,15 @@ from django.apps import AppConfig
 class TelegramUserConfig(AppConfig):
     default_auto_field = "django.db.models.BigAutoField"
     name = "telegram_user"
+
+    def ready(self):
+        from .log import start_queue_listener
+        from .metrics import Metrics
+        from .services.db_pools import DatabasePools
+        from .services.jwt_keys import JWTKeyRing
+        from .services.tg_bot_keys import TelegramBotKeyRegistry
+
+        start_queue_listener()
+        TelegramBotKeyRegistry.load()
+        JWTKeyRing.load()
+        Metrics.register_collector(DatabasePools.publish_metrics)
@@ -0,0 +1,66 @@
+import logging
+
+from django.utils.translation import gettext_lazy as _
+from rest_framework_simplejwt.authentication import JWTAuthentication
+from rest_framework_simplejwt.exceptions import InvalidToken
+
+from .db_router import ReplicaRouter, primary_reads
+from .models import TelegramUser
+from .services.user_cache import UserSummaryCache
+
+logger = logging.getLogger("telegram_user")
+
+_NOT_LOADED = object()
+
+
+class TelegramPrincipal:
+    """
+    Пользователь запроса, собранный только из проверенных claims access-токена.
+    Модель TelegramUser загружается лениво (кэш, затем БД) при первом обращении к user.
+    """
+
+    __slots__ = ("_user", "telegram_id", "token")
+
+    is_authenticated = True
+    is_anonymous = False
+
+    def __init__(self, telegram_id: int, token):
+        self.telegram_id = telegram_id
+        self.token = token
+        self._user = _NOT_LOADED
+
+    def __str__(self) -> str:
+        return f"TelegramPrincipal(telegram_id={self.telegram_id})"
+
+    @property
+    def user(self) -> TelegramUser | None:
+        """
+        TelegramUser из кэша или БД (реплики, если токен выпущен не только что),
+        None если пользователь удалён.
+        """
+        if self._user is _NOT_LOADED:
+            user = UserSummaryCache.get_user(self.telegram_id)
+            if user is None:
+                issued_at = self.token.get("iat") if self.token is not None else None
+                with primary_reads(ReplicaRouter.recently_written(issued_at)):
+                    user = TelegramUser.objects.filter(
+                        telegram_id=self.telegram_id
+                    ).first()
+                if user is not None:
+                    UserSummaryCache.set_user(user)
+            self._user = user
+        return self._user
+
+
+class TelegramJWTAuthentication(JWTAuthentication):
+    """
+    Аутентификация по access-токену без запросов к БД: вместо поиска
+    пользователя Django по user_id возвращает TelegramPrincipal из claim telegram_id.
+    """
+
+    def get_user(self, validated_token) -> TelegramPrincipal:
+        telegram_id = validated_token.get("telegram_id")
+        if not isinstance(telegram_id, int):
+            logger.warning("Access token without telegram_id: %r", telegram_id)
+            raise InvalidToken(_("Token contained no recognizable user identification"))
+        return TelegramPrincipal(telegram_id, validated_token)
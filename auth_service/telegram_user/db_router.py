@@ -0,0 +1,62 @@
+import random
+import time
+from contextlib import contextmanager
+from contextvars import ContextVar
+
+from django.conf import settings
+from django.db import DEFAULT_DB_ALIAS
+
+_primary_reads: ContextVar[bool] = ContextVar("primary_reads", default=False)
+
+
+@contextmanager
+def primary_reads(enabled: bool = True):
+    """Внутри блока (при enabled) все чтения текущего контекста идут на основную БД."""
+    token = _primary_reads.set(enabled or _primary_reads.get())
+    try:
+        yield
+    finally:
+        _primary_reads.reset(token)
+
+
+class ReplicaRouter:
+    """
+    Чтение моделей из TELEGRAM_USER_REPLICAS["MODELS"] направляется на случайную
+    реплику из ALIASES. Запись, таблицы ротации и отзыва refresh-токенов и все
+    остальные модели остаются на основной БД. Реплика может отставать, поэтому
+    внутри primary_reads() чтение тоже идёт на основную БД.
+    """
+
+    @staticmethod
+    def config() -> dict:
+        return settings.TELEGRAM_USER_REPLICAS
+
+    @classmethod
+    def recently_written(cls, issued_at: int | None) -> bool:
+        """
+        Токен выпущен менее READ_YOUR_WRITES_WINDOW секунд назад: профиль, записанный
+        при этом входе, мог ещё не дойти до реплик.
+        """
+        if issued_at is None:
+            return True
+        return time.time() - issued_at < cls.config()["READ_YOUR_WRITES_WINDOW"]
+
+    def db_for_read(self, model, **hints):
+        config = self.config()
+        if (
+            not config["ALIASES"]
+            or _primary_reads.get()
+            or model._meta.label_lower not in config["MODELS"]
+        ):
+            return None
+        return random.choice(config["ALIASES"])
+
+    def db_for_write(self, model, **hints):
+        return DEFAULT_DB_ALIAS
+
+    def allow_relation(self, obj1, obj2, **hints):
+        # Реплики содержат те же данные, что и основная БД
+        databases = {DEFAULT_DB_ALIAS, *self.config()["ALIASES"]}
+        if obj1._state.db in databases and obj2._state.db in databases:
+            return True
+        return None
@@ -0,0 +1,126 @@
+import atexit
+import logging
+import os
+import threading
+import time
+from logging.handlers import QueueHandler
+
+QUEUE_HANDLER = "queue"
+
+# Атрибуты обычной LogRecord: всё остальное пришло из extra
+_RECORD_ATTRS = frozenset(logging.LogRecord("", 0, "", 0, "", None, None).__dict__) | {
+    "message",
+    "asctime",
+}
+
+
+class LazyQueueHandler(QueueHandler):
+    """
+    QueueHandler без форматирования в потоке запроса: запись передаётся в очередь
+    как есть, msg % args и файловый ввод-вывод выполняются в потоке QueueListener.
+    """
+
+    def prepare(self, record: logging.LogRecord) -> logging.LogRecord:
+        return record
+
+
+class StructuredFormatter(logging.Formatter):
+    """Дописывает к сообщению поля, переданные через extra, в виде key=value."""
+
+    def formatMessage(self, record: logging.LogRecord) -> str:
+        message = super().formatMessage(record)
+        fields = " ".join(
+            f"{key}={value}"
+            for key, value in record.__dict__.items()
+            if key not in _RECORD_ATTRS
+        )
+        return f"{message} {fields}" if fields else message
+
+
+class SamplingFilter(logging.Filter):
+    """
+    Пропускает не более burst одинаковых записей (логгер, уровень, шаблон и аргументы)
+    за interval секунд. Число отброшенных записей попадает в поле suppressed
+    первой записи следующего интервала. CRITICAL не отбрасывается.
+    """
+
+    def __init__(self, burst: int = 10, interval: float = 60.0, max_keys: int = 1024):
+        super().__init__()
+        self.burst = burst
+        self.interval = interval
+        self.max_keys = max_keys
+        self._windows: dict[tuple, list] = {}
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def _key(record: logging.LogRecord) -> tuple:
+        key = (record.name, record.levelno, record.msg, record.args)
+        try:
+            hash(key)
+        except TypeError:
+            key = (record.name, record.levelno, record.msg)
+        return key
+
+    def filter(self, record: logging.LogRecord) -> bool:
+        if record.levelno >= logging.CRITICAL:
+            return True
+        key = self._key(record)
+        now = time.monotonic()
+        with self._lock:
+            window = self._windows.get(key)
+            if window is None or now - window[0] >= self.interval:
+                if window is None and len(self._windows) >= self.max_keys:
+                    self._windows.clear()
+                suppressed = window[2] if window is not None else 0
+                self._windows[key] = [now, 1, 0]
+                if suppressed:
+                    record.suppressed = suppressed
+                return True
+            if window[1] < self.burst:
+                window[1] += 1
+                return True
+            window[2] += 1
+            return False
+
+
+_listener_running = False
+_fork_hooks_registered = False
+
+
+def _queue_listener():
+    handler = logging.getHandlerByName(QUEUE_HANDLER)
+    return getattr(handler, "listener", None)
+
+
+def start_queue_listener() -> None:
+    """
+    Запускает QueueListener обработчика QUEUE_HANDLER в текущем процессе.
+    На время fork слушатель останавливается: очередь дописывается в обработчики,
+    поток завершается, после fork слушатель запускается заново и в родителе,
+    и в дочернем процессе. Поэтому воркеры gunicorn (preload) не наследуют
+    ни поток, ни захваченные им блокировки, ни недоставленные записи.
+    """
+    global _listener_running, _fork_hooks_registered
+    listener = _queue_listener()
+    if listener is None or _listener_running:
+        return
+    listener.start()
+    _listener_running = True
+    if not _fork_hooks_registered:
+        os.register_at_fork(
+            before=stop_queue_listener,
+            after_in_parent=start_queue_listener,
+            after_in_child=start_queue_listener,
+        )
+        atexit.register(stop_queue_listener)
+        _fork_hooks_registered = True
+
+
+def stop_queue_listener() -> None:
+    """Останавливает QueueListener, предварительно обработав записи в очереди."""
+    global _listener_running
+    listener = _queue_listener()
+    if listener is None or not _listener_running:
+        return
+    listener.stop()
+    _listener_running = False
@@ -0,0 +1,92 @@
+from benchmarks.load_generator import DEFAULT_MIX, LoadGenerator, TrafficMix
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+
+
+class Command(BaseCommand):
+    help = (
+        "Нагрузочный тест эндпоинтов входа и обновления токенов: синтезирует "
+        "пользователей с подписанной initData и смесь новых и повторных входов, "
+        "refresh, устаревших auth_date и неверных хэшей. Выводит пропускную "
+        "способность, p50/p95/p99 и разбивку ошибок по видам запросов."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--url",
+            default="http://127.0.0.1:8000",
+            help="Адрес нагружаемого сервиса",
+        )
+        parser.add_argument(
+            "--bot-token",
+            help="Токен бота для подписи initData (по умолчанию первый из BOT_TOKEN)",
+        )
+        parser.add_argument("--bot-id", type=int, help="botId в запросах входа")
+        parser.add_argument(
+            "--mix",
+            default=DEFAULT_MIX,
+            help="Доли видов запросов: new, returning, refresh, stale, bad_hash",
+        )
+        parser.add_argument(
+            "--users", type=int, default=10000, help="Размер популяции пользователей"
+        )
+        parser.add_argument(
+            "--concurrency", type=int, default=16, help="Число одновременных клиентов"
+        )
+        parser.add_argument(
+            "--rate",
+            type=float,
+            help="Целевой темп, запросов в секунду (по умолчанию без ограничения)",
+        )
+        parser.add_argument(
+            "--duration", type=float, default=30.0, help="Длительность в секундах"
+        )
+        parser.add_argument(
+            "--requests", type=int, help="Остановиться после этого числа запросов"
+        )
+        parser.add_argument(
+            "--timeout", type=float, default=10.0, help="Таймаут запроса в секундах"
+        )
+        parser.add_argument("--seed", type=int, help="Зерно генератора случайных чисел")
+
+    def handle(self, *args, **options):
+        bot_token = options["bot_token"] or next(iter(settings.TELEGRAM_BOT_TOKENS), "")
+        if not bot_token:
+            raise CommandError("Bot token is required: pass --bot-token or BOT_TOKEN")
+        try:
+            mix = TrafficMix.parse(options["mix"])
+        except ValueError as e:
+            raise CommandError(str(e))
+
+        generator = LoadGenerator(
+            options["url"],
+            bot_token,
+            mix,
+            users=options["users"],
+            concurrency=options["concurrency"],
+            rate=options["rate"],
+            bot_id=options["bot_id"],
+            timeout=options["timeout"],
+            seed=options["seed"],
+        )
+        report = generator.run(options["duration"], options["requests"])
+
+        self.stdout.write(
+            f"{report.total} requests in {report.elapsed:.1f}s "
+            f"({report.total / report.elapsed:.1f} req/s)"
+        )
+        self.stdout.write(
+            f"{'kind':<10}{'requests':>10}{'req/s':>9}"
+            f"{'p50, ms':>10}{'p95, ms':>10}{'p99, ms':>10}  errors"
+        )
+        for row in report.rows():
+            errors = (
+                ", ".join(
+                    f"{status}: {count}" for status, count in row["errors"].items()
+                )
+                or "-"
+            )
+            self.stdout.write(
+                f"{row['kind']:<10}{row['requests']:>10}{row['rps']:>9.1f}"
+                f"{row['p50']:>10.1f}{row['p95']:>10.1f}{row['p99']:>10.1f}  {errors}"
+            )
@@ -0,0 +1,32 @@
+from django.core.management.base import BaseCommand, CommandError
+from django.db import DEFAULT_DB_ALIAS
+
+from ...services.schema import SchemaState
+
+
+class Command(BaseCommand):
+    help = (
+        "Проверяет, что все миграции применены (один запрос к django_migrations). "
+        "Завершается с ошибкой, если схема отстаёт: миграции применяет migrate_locked."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--database",
+            default=DEFAULT_DB_ALIAS,
+            help="Псевдоним проверяемой БД",
+        )
+        parser.add_argument(
+            "--wait",
+            type=float,
+            default=0.0,
+            help="Секунды ожидания, пока задание миграций не применит их",
+        )
+
+    def handle(self, *args, database, wait, **options):
+        pending = SchemaState.wait_until_current(wait, using=database)
+        if pending:
+            raise CommandError(
+                f"{len(pending)} unapplied migrations: {', '.join(pending)}"
+            )
+        self.stdout.write("Schema is up to date")
@@ -0,0 +1,102 @@
+import json
+import os
+import subprocess
+import sys
+from collections import Counter
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+
+# Загрузка приложения, как в воркере, и URLconf, который иначе импортируется
+# первым запросом
+TARGET = (
+    "import importlib; importlib.import_module({module!r}); "
+    "from django.urls import get_resolver; get_resolver().url_patterns"
+)
+
+
+class Command(BaseCommand):
+    help = (
+        "Отчёт о времени импорта при старте воркера (python -X importtime): "
+        "загрузка WSGI-приложения и URLconf в отдельном процессе с текущими "
+        "настройками, время по пакетам и самые дорогие модули."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--module",
+            default=settings.WSGI_APPLICATION.rpartition(".")[0],
+            help="Модуль приложения (по умолчанию из WSGI_APPLICATION)",
+        )
+        parser.add_argument(
+            "--limit", type=int, default=15, help="Строк в каждой таблице"
+        )
+        parser.add_argument(
+            "--json", action="store_true", help="Вывести отчёт в JSON для сравнения"
+        )
+
+    @staticmethod
+    def parse(output: str) -> dict[str, int]:
+        """Собственное время импорта модулей, мкс, из вывода -X importtime."""
+        modules = {}
+        for line in output.splitlines():
+            if not line.startswith("import time:"):
+                continue
+            self_us, _, name = line[len("import time:") :].split("|")
+            if self_us.strip().isdigit():
+                modules[name.strip()] = int(self_us)
+        return modules
+
+    def handle(self, *args, module, limit, **options):
+        # --settings команды тоже попадает в DJANGO_SETTINGS_MODULE
+        settings_module = os.environ.get(
+            "DJANGO_SETTINGS_MODULE", settings.SETTINGS_MODULE
+        )
+        target = TARGET.format(module=module)
+        try:
+            result = subprocess.run(
+                [sys.executable, "-X", "importtime", "-c", target],
+                env={**os.environ, "DJANGO_SETTINGS_MODULE": settings_module},
+                cwd=settings.BASE_DIR,
+                capture_output=True,
+                text=True,
+                check=True,
+            )
+        except subprocess.CalledProcessError as e:
+            raise CommandError(f"Import of {module} failed:\n{e.stderr[-2000:]}") from e
+        modules = self.parse(result.stderr)
+        if not modules:
+            raise CommandError(f"Import of {module} reported no modules")
+
+        packages = Counter()
+        for name, self_us in modules.items():
+            packages[name.partition(".")[0]] += self_us
+        total = sum(modules.values())
+
+        if options["json"]:
+            self.stdout.write(
+                json.dumps(
+                    {
+                        "settings": settings_module,
+                        "total_ms": round(total / 1000, 1),
+                        "modules": len(modules),
+                        "packages": {
+                            name: round(us / 1000, 1)
+                            for name, us in packages.most_common(limit)
+                        },
+                    },
+                    indent=2,
+                )
+            )
+            return
+
+        self.stdout.write(
+            f"Import time {total / 1000:.1f} ms, {len(modules)} modules "
+            f"({settings_module})"
+        )
+        self.stdout.write(f"{'package':<32}{'ms':>10}{'share':>8}")
+        for name, us in packages.most_common(limit):
+            self.stdout.write(f"{name:<32}{us / 1000:>10.1f}{us / total:>8.1%}")
+        self.stdout.write(f"\n{'module':<48}{'ms':>10}")
+        for name, us in Counter(modules).most_common(limit):
+            self.stdout.write(f"{name:<48}{us / 1000:>10.1f}")
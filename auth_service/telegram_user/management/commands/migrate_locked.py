@@ -0,0 +1,44 @@
+from django.core.management import call_command
+from django.core.management.base import BaseCommand, CommandError
+from django.db import DEFAULT_DB_ALIAS
+
+from ...services.schema import SchemaState
+
+
+class Command(BaseCommand):
+    help = (
+        "Применяет миграции под advisory-блокировкой PostgreSQL: одноразовое "
+        "задание перед выкаткой. Одновременно запущенные задания выполняются по "
+        "очереди, задание без неприменённых миграций завершается сразу."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--database",
+            default=DEFAULT_DB_ALIAS,
+            help="Псевдоним БД для миграций",
+        )
+        parser.add_argument(
+            "--lock-timeout",
+            type=float,
+            default=300.0,
+            help="Секунды ожидания блокировки, занятой другим заданием",
+        )
+
+    def handle(self, *args, database, lock_timeout, **options):
+        try:
+            with SchemaState.migration_lock(lock_timeout, using=database):
+                pending = SchemaState.pending(database)
+                if not pending:
+                    self.stdout.write("No migrations to apply")
+                    return
+                self.stdout.write(f"Applying {len(pending)} migrations")
+                call_command(
+                    "migrate",
+                    database=database,
+                    interactive=False,
+                    verbosity=options["verbosity"],
+                    stdout=self.stdout,
+                )
+        except TimeoutError as e:
+            raise CommandError(str(e))
@@ -0,0 +1,51 @@
+from collections import Counter
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+
+from ...services.profiling import ProfileStore
+
+
+class Command(BaseCommand):
+    help = (
+        "Сводка профилей, записанных ProfilingMiddleware: суммарная статистика "
+        "cProfile по функциям для всех или последних профилей."
+    )
+
+    SORT_KEYS = ("cumulative", "tottime", "ncalls")
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--dir",
+            default=settings.TELEGRAM_USER_PROFILING["DIR"],
+            help="Каталог профилей",
+        )
+        parser.add_argument(
+            "--view", help="Только профили этого представления, например telegram-login"
+        )
+        parser.add_argument("--last", type=int, help="Только последние N профилей")
+        parser.add_argument(
+            "--sort", choices=self.SORT_KEYS, default="cumulative", help="Сортировка"
+        )
+        parser.add_argument(
+            "--limit", type=int, default=25, help="Сколько функций вывести"
+        )
+
+    def handle(self, *args, view, last, sort, limit, **options):
+        directory = options["dir"]
+        files = ProfileStore(directory).files(view)
+        if last:
+            files = files[-last:]
+        if not files:
+            raise CommandError(f"No profiles found in {directory}")
+
+        views = Counter(ProfileStore.view_name(path) for path in files)
+        self.stdout.write(
+            f"{len(files)} profiles: "
+            + ", ".join(f"{name} {count}" for name, count in views.most_common())
+        )
+        stats = ProfileStore.stats(files, stream=self.stdout)
+        self.stdout.write(
+            f"Average profiled time per request: {stats.total_tt / len(files) * 1000:.2f} ms"
+        )
+        stats.strip_dirs().sort_stats(sort).print_stats(limit)
@@ -0,0 +1,113 @@
+import time
+from functools import partial
+
+from django.core.management.base import BaseCommand
+from django.db import connections, router
+from django.utils import timezone
+from rest_framework_simplejwt.settings import api_settings
+from rest_framework_simplejwt.token_blacklist.models import (
+    BlacklistedToken,
+    OutstandingToken,
+)
+
+from ...models import RefreshTokenRotation, RevokedToken
+from ...services.token_partitions import TokenPartitionManager
+
+
+class Command(BaseCommand):
+    help = (
+        "Удаляет истёкшие токены: секционированные таблицы теряют истёкшие секции "
+        "целиком, остальные таблицы чистятся пакетными DELETE. "
+        "Также создаёт секции на срок жизни refresh-токена вперёд. Запускать ежедневно."
+    )
+
+    PARTITIONED_MODELS = (RefreshTokenRotation, RevokedToken)
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--batch-size",
+            type=int,
+            default=5000,
+            help="Максимум строк, удаляемых одним запросом",
+        )
+        parser.add_argument(
+            "--days-ahead",
+            type=int,
+            default=api_settings.REFRESH_TOKEN_LIFETIME.days + 2,
+            help="На сколько дней вперёд создавать секции",
+        )
+        parser.add_argument(
+            "--sleep",
+            type=float,
+            default=0.0,
+            help="Пауза между пакетами в секундах",
+        )
+
+    def handle(self, *args, batch_size, days_ahead, sleep, **options):
+        now = timezone.now()
+
+        for model in self.PARTITIONED_MODELS:
+            connection = connections[router.db_for_write(model)]
+            table = model._meta.db_table
+            if TokenPartitionManager.is_partitioned(connection, table):
+                created = TokenPartitionManager.ensure_partitions(
+                    connection, table, now.date(), days_ahead
+                )
+                dropped = TokenPartitionManager.drop_expired_partitions(
+                    connection, table, now
+                )
+                self.stdout.write(
+                    f"{table}: created {len(created)} partitions, "
+                    f"dropped {len(dropped)} expired partitions"
+                )
+                # Истёкшие строки живых дневных секций удаляются вместе с секцией
+                deleted = self.purge_batches(
+                    partial(
+                        TokenPartitionManager.delete_expired_default,
+                        connection,
+                        table,
+                        now,
+                        batch_size,
+                    ),
+                    batch_size,
+                    sleep,
+                )
+                self.stdout.write(f"{table}_default: deleted {deleted} expired rows")
+            else:
+                deleted = self.purge(
+                    model.objects.filter(expires_at__lte=now), batch_size, sleep
+                )
+                self.stdout.write(f"{table}: deleted {deleted} expired rows")
+
+        # Строки token_blacklist simplejwt, оставшиеся до перехода на RevokedToken
+        for queryset in (
+            BlacklistedToken.objects.filter(token__expires_at__lte=now),
+            OutstandingToken.objects.filter(expires_at__lte=now),
+        ):
+            deleted = self.purge(queryset, batch_size, sleep)
+            self.stdout.write(
+                f"{queryset.model._meta.db_table}: deleted {deleted} expired rows"
+            )
+
+    @staticmethod
+    def purge_batches(delete_batch, batch_size: int, sleep: float = 0.0) -> int:
+        """Вызывает delete_batch(), пока он удаляет полные пакеты по batch_size строк."""
+        total = 0
+        while True:
+            deleted = delete_batch()
+            total += deleted
+            if deleted < batch_size:
+                return total
+            if sleep:
+                time.sleep(sleep)
+
+    @classmethod
+    def purge(cls, queryset, batch_size: int, sleep: float = 0.0) -> int:
+        """Удаляет строки queryset пакетами по batch_size, по одному запросу на пакет."""
+        model = queryset.model
+
+        def delete_batch() -> int:
+            batch = queryset.values("pk")[:batch_size]
+            return model.objects.filter(pk__in=batch).delete()[0]
+
+        return cls.purge_batches(delete_batch, batch_size, sleep)
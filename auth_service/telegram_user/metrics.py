@@ -0,0 +1,340 @@
+import bisect
+import fcntl
+import json
+import os
+import tempfile
+import threading
+import time
+from contextlib import contextmanager
+
+from django.conf import settings
+from django.core.signals import setting_changed
+from django.dispatch import receiver
+
+# name: (тип, описание) - всё, что может попасть в /metrics
+METRICS = {
+    "auth_stage_duration_seconds": (
+        "histogram",
+        "Duration of login and refresh stages in seconds.",
+    ),
+    "auth_login_total": ("counter", "Login attempts by result."),
+    "auth_refresh_total": ("counter", "Refresh attempts by result."),
+    "auth_introspection_cache_total": (
+        "counter",
+        "Introspection cache lookups by result.",
+    ),
+    "auth_rate_limited_total": ("counter", "Requests rejected by rate limits by path."),
+    "auth_db_pool_size": ("gauge", "Open connections in the database pools."),
+    "auth_db_pool_available": ("gauge", "Idle connections in the database pools."),
+    "auth_db_pool_max_size": ("gauge", "Maximum size of the database pools."),
+    "auth_db_pool_requests_waiting": (
+        "gauge",
+        "Requests waiting for a pooled database connection.",
+    ),
+    "auth_db_pool_requests_total": (
+        "counter",
+        "Connections requested from the database pools.",
+    ),
+    "auth_db_pool_requests_queued_total": (
+        "counter",
+        "Connection requests that had to wait for a free connection.",
+    ),
+    "auth_db_pool_wait_seconds_total": (
+        "counter",
+        "Total time spent waiting for a pooled database connection.",
+    ),
+    "auth_db_pool_errors_total": (
+        "counter",
+        "Connection requests that timed out or failed.",
+    ),
+}
+
+# Границы корзин гистограммы, секунды: от 100 мкс (HMAC) до 2.5 с (ожидание БД)
+BUCKETS = (
+    0.0001,
+    0.00025,
+    0.0005,
+    0.001,
+    0.0025,
+    0.005,
+    0.01,
+    0.025,
+    0.05,
+    0.1,
+    0.25,
+    0.5,
+    1.0,
+    2.5,
+)
+
+
+def _labels(labels: dict) -> str:
+    return ",".join(f'{key}="{value}"' for key, value in labels.items())
+
+
+def _series(name: str, labels: str) -> str:
+    return f"{name}{{{labels}}}" if labels else name
+
+
+def _read_snapshot(path: str) -> dict | None:
+    try:
+        with open(path) as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return None
+
+
+def _merge(snapshot: dict, counters: dict, histograms: dict, gauges=True) -> None:
+    """Прибавляет значения снимка к counters и histograms."""
+    series = snapshot["counters"] + (snapshot.get("gauges", []) if gauges else [])
+    for name, labels, value in series:
+        key = (name, labels)
+        counters[key] = counters.get(key, 0) + value
+    for name, labels, buckets in snapshot["histograms"]:
+        total = histograms.setdefault((name, labels), [0] * len(buckets))
+        for index, value in enumerate(buckets):
+            total[index] += value
+
+
+class Metrics:
+    """
+    Счётчики, текущие значения (gauge) и гистограммы длительности этапов входа
+    и обновления токенов. Каждый воркер копит значения в памяти и не чаще раза в FLUSH_INTERVAL секунд
+    записывает снимок в файл <pid>.json каталога DIR. /metrics суммирует снимки
+    всех живых воркеров и архив завершившихся, поэтому показывает данные всего
+    gunicorn-мастера, а счётчики не уменьшаются при перезапуске воркеров.
+    Перед записью снимка вызываются сборщики (register_collector), которые
+    обновляют текущие значения, например состояние пулов соединений.
+    """
+
+    _config: dict | None = None
+    _lock = threading.Lock()
+    _counters: dict[tuple[str, str], float] = {}
+    _gauges: dict[tuple[str, str], float] = {}
+    # (name, labels) -> [счётчики корзин..., +Inf, сумма]
+    _histograms: dict[tuple[str, str], list[float]] = {}
+    _flushed_at = 0.0
+    _pid: int | None = None
+    _collectors: list = []
+
+    # Счётчики и гистограммы завершившихся воркеров
+    ARCHIVE = "archive.json"
+
+    @classmethod
+    def config(cls) -> dict:
+        if cls._config is None:
+            config = dict(settings.TELEGRAM_USER_METRICS)
+            if not config.get("DIR"):
+                base = (
+                    "/dev/shm" if os.path.isdir("/dev/shm") else tempfile.gettempdir()
+                )
+                config["DIR"] = os.path.join(base, "auth_service_metrics")
+            cls._config = config
+        return cls._config
+
+    @classmethod
+    def enabled(cls) -> bool:
+        return cls.config()["ENABLED"]
+
+    @classmethod
+    def _check_pid(cls) -> None:
+        # Значения, унаследованные от мастера при fork, принадлежат ему
+        if cls._pid != os.getpid():
+            cls._counters, cls._gauges, cls._histograms = {}, {}, {}
+            cls._pid = os.getpid()
+
+    @classmethod
+    def increment(cls, name: str, value: float = 1, **labels) -> None:
+        if not cls.enabled():
+            return
+        key = (name, _labels(labels))
+        with cls._lock:
+            cls._check_pid()
+            cls._counters[key] = cls._counters.get(key, 0) + value
+        cls._maybe_flush()
+
+    @classmethod
+    def set(cls, name: str, value: float, **labels) -> None:
+        """Текущее значение gauge или накопленного вне Metrics счётчика."""
+        if not cls.enabled():
+            return
+        key = (name, _labels(labels))
+        with cls._lock:
+            cls._check_pid()
+            cls._gauges[key] = value
+
+    @classmethod
+    def register_collector(cls, collector) -> None:
+        """collector() вызывается перед каждой записью снимка и вызывает set()."""
+        if collector not in cls._collectors:
+            cls._collectors.append(collector)
+
+    @classmethod
+    def observe(cls, name: str, seconds: float, **labels) -> None:
+        if not cls.enabled():
+            return
+        key = (name, _labels(labels))
+        with cls._lock:
+            cls._check_pid()
+            buckets = cls._histograms.get(key)
+            if buckets is None:
+                buckets = cls._histograms[key] = [0] * (len(BUCKETS) + 2)
+            buckets[bisect.bisect_left(BUCKETS, seconds)] += 1
+            buckets[-1] += seconds
+        cls._maybe_flush()
+
+    @classmethod
+    @contextmanager
+    def timer(cls, stage: str):
+        """Измеряет длительность блока как этап stage гистограммы этапов."""
+        started = time.perf_counter()
+        try:
+            yield
+        finally:
+            cls.observe(
+                "auth_stage_duration_seconds",
+                time.perf_counter() - started,
+                stage=stage,
+            )
+
+    @classmethod
+    def _maybe_flush(cls) -> None:
+        if time.monotonic() - cls._flushed_at >= cls.config()["FLUSH_INTERVAL"]:
+            cls.flush()
+
+    @classmethod
+    def _snapshot(cls) -> dict:
+        with cls._lock:
+            cls._check_pid()
+            return {
+                "counters": [[*key, value] for key, value in cls._counters.items()],
+                "gauges": [[*key, value] for key, value in cls._gauges.items()],
+                "histograms": [
+                    [*key, list(buckets)] for key, buckets in cls._histograms.items()
+                ],
+            }
+
+    @staticmethod
+    def _write(directory: str, filename: str, snapshot: dict) -> None:
+        # Запись во временный файл и os.replace: читатель не увидит половину снимка
+        fd, tmp_path = tempfile.mkstemp(dir=directory, prefix=".tmp")
+        with os.fdopen(fd, "w") as f:
+            json.dump(snapshot, f)
+        os.replace(tmp_path, os.path.join(directory, filename))
+
+    @classmethod
+    def flush(cls) -> None:
+        """Записывает снимок значений текущего воркера в файл каталога DIR."""
+        cls._flushed_at = time.monotonic()
+        for collector in cls._collectors:
+            collector()
+        directory = cls.config()["DIR"]
+        os.makedirs(directory, exist_ok=True)
+        cls._write(directory, f"{os.getpid()}.json", cls._snapshot())
+
+    @classmethod
+    def _archive(cls, directory: str, filename: str) -> None:
+        """
+        Переносит счётчики и гистограммы завершившегося воркера в ARCHIVE и удаляет
+        его снимок. Текущие значения (gauge) не переносятся. Блокировка не даёт
+        двум воркерам, одновременно отвечающим на /metrics, учесть снимок дважды.
+        """
+        with open(os.path.join(directory, ".archive.lock"), "a") as lock:
+            fcntl.flock(lock, fcntl.LOCK_EX)
+            path = os.path.join(directory, filename)
+            snapshot = _read_snapshot(path)
+            if snapshot is not None:
+                archive_path = os.path.join(directory, cls.ARCHIVE)
+                counters, histograms = {}, {}
+                if (archive := _read_snapshot(archive_path)) is not None:
+                    _merge(archive, counters, histograms)
+                _merge(snapshot, counters, histograms, gauges=False)
+                cls._write(
+                    directory,
+                    cls.ARCHIVE,
+                    {
+                        "counters": [[*key, value] for key, value in counters.items()],
+                        "histograms": [
+                            [*key, buckets] for key, buckets in histograms.items()
+                        ],
+                    },
+                )
+            try:
+                os.remove(path)
+            except FileNotFoundError:
+                pass
+
+    @staticmethod
+    def _alive(pid: int) -> bool:
+        try:
+            os.kill(pid, 0)
+        except ProcessLookupError:
+            return False
+        except PermissionError:
+            pass
+        return True
+
+    @classmethod
+    def collect(cls) -> tuple[dict, dict]:
+        """
+        Суммирует снимки живых воркеров и архив завершившихся. Снимки завершившихся
+        воркеров сначала переносятся в архив, чтобы счётчики не уменьшались:
+        Prometheus считает любое уменьшение сбросом счётчика.
+        """
+        cls.flush()
+        directory = cls.config()["DIR"]
+        live = []
+        for filename in os.listdir(directory):
+            pid, _, extension = filename.partition(".")
+            if extension != "json" or not pid.isdigit():
+                continue
+            if cls._alive(int(pid)):
+                live.append(filename)
+            else:
+                cls._archive(directory, filename)
+
+        counters: dict[tuple[str, str], float] = {}
+        histograms: dict[tuple[str, str], list[float]] = {}
+        for filename in [cls.ARCHIVE, *live]:
+            snapshot = _read_snapshot(os.path.join(directory, filename))
+            if snapshot is not None:
+                # Текущие значения воркеров тоже складываются: размер пула
+                # сервиса - сумма пулов воркеров
+                _merge(snapshot, counters, histograms)
+        return counters, histograms
+
+    @classmethod
+    def render(cls) -> str:
+        """Метрики всех воркеров в текстовом формате Prometheus 0.0.4."""
+        counters, histograms = cls.collect()
+        lines = []
+        for name, (metric_type, help_text) in METRICS.items():
+            lines += [f"# HELP {name} {help_text}", f"# TYPE {name} {metric_type}"]
+            for (series_name, labels), value in sorted(counters.items()):
+                if series_name == name:
+                    lines.append(f"{_series(name, labels)} {value:g}")
+            for (series_name, labels), buckets in sorted(histograms.items()):
+                if series_name != name:
+                    continue
+                prefix = f"{labels}," if labels else ""
+                cumulative = 0
+                for bound, count in zip((*BUCKETS, "+Inf"), buckets):
+                    cumulative += count
+                    le = bound if isinstance(bound, str) else f"{bound:g}"
+                    lines.append(f'{name}_bucket{{{prefix}le="{le}"}} {cumulative:g}')
+                lines.append(f"{_series(name + '_sum', labels)} {buckets[-1]:.6g}")
+                lines.append(f"{_series(name + '_count', labels)} {cumulative:g}")
+        return "\n".join(lines) + "\n"
+
+    @classmethod
+    def clear(cls) -> None:
+        with cls._lock:
+            cls._counters, cls._gauges, cls._histograms = {}, {}, {}
+            cls._pid = os.getpid()
+
+
+@receiver(setting_changed)
+def reset_metrics(*, setting, **kwargs):
+    if setting == "TELEGRAM_USER_METRICS":
+        Metrics._config = None
+        Metrics.clear()
@@ -0,0 +1,164 @@
+import cProfile
+import logging
+import math
+import random
+import re
+import threading
+import time
+
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction, sync_to_async
+from django.conf import settings
+from django.core.exceptions import MiddlewareNotUsed
+from django.db import DatabaseError
+from django.http import JsonResponse
+from django.urls import reverse
+
+from .metrics import Metrics
+from .models import ProfilingSwitch
+from .services.profiling import ProfileStore
+from .services.rate_limit import Rate, RateLimiter
+
+logger = logging.getLogger("telegram_user")
+
+
+class RateLimitMiddleware:
+    """
+    Сброс нагрузки до DRF и проверки initData: корзины токенов по IP, по telegram_id
+    из initData и по эндпоинту. При превышении сразу отвечает 429 с Retry-After.
+    telegram_id не проверяется (подпись ещё не проверена), он только выбирает корзину.
+    """
+
+    sync_capable = True
+    async_capable = True
+
+    # user=%7B%22id%22%3A<id> - поле user в initData, закодированной в теле запроса
+    TELEGRAM_ID_RE = re.compile(rb"user=%7B%22id%22%3A(\d{1,20})")
+    MAX_PEEK_BODY = 16 * 1024
+
+    def __init__(self, get_response):
+        config = settings.TELEGRAM_USER_RATE_LIMIT
+        if not config["ENABLED"]:
+            raise MiddlewareNotUsed
+        self.get_response = get_response
+        self.ip_header = config["IP_HEADER"]
+        self.ip_rate = Rate.parse(config["IP"])
+        self.telegram_id_rate = Rate.parse(config["TELEGRAM_ID"])
+        self.endpoints = {
+            reverse(name): Rate.parse(rate)
+            for name, rate in config["ENDPOINTS"].items()
+        }
+        if iscoroutinefunction(self.get_response):
+            markcoroutinefunction(self)
+
+    def _peek_telegram_id(self, request) -> str | None:
+        if request.method != "POST":
+            return None
+        try:
+            length = int(request.META.get("CONTENT_LENGTH") or 0)
+        except ValueError:
+            return None
+        if not 0 < length <= self.MAX_PEEK_BODY:
+            return None
+        # Тело кэшируется в request.body, DRF затем читает его из памяти
+        match = self.TELEGRAM_ID_RE.search(request.body)
+        return match[1].decode() if match else None
+
+    def _rules(self, request, endpoint_rate: Rate) -> list[tuple[str, Rate]]:
+        ip = request.META.get(self.ip_header, "")
+        rules = [(f"ip:{ip}", self.ip_rate)]
+        if telegram_id := self._peek_telegram_id(request):
+            rules.append((f"tg:{telegram_id}", self.telegram_id_rate))
+        rules.append((f"path:{request.path}", endpoint_rate))
+        return rules
+
+    def _check(self, request) -> JsonResponse | None:
+        endpoint_rate = self.endpoints.get(request.path)
+        if endpoint_rate is None:
+            return None
+        retry_after = RateLimiter.check(self._rules(request, endpoint_rate))
+        if not retry_after:
+            return None
+
+        Metrics.increment("auth_rate_limited_total", path=request.path)
+        logger.debug(
+            "Rate limited %s from %s", request.path, request.META.get(self.ip_header)
+        )
+        response = JsonResponse({"error": "Too many requests"}, status=429)
+        response["Retry-After"] = str(math.ceil(retry_after))
+        return response
+
+    def __call__(self, request):
+        if iscoroutinefunction(self):
+            return self.__acall__(request)
+        return self._check(request) or self.get_response(request)
+
+    async def __acall__(self, request):
+        # Локальное и mmap-хранилища проверяются в цикле событий, кэш Django
+        # (Redis, Memcached) - в потоке, чтобы не блокировать другие запросы
+        if RateLimiter.store().blocking:
+            response = await sync_to_async(self._check)(request)
+        else:
+            response = self._check(request)
+        return response or await self.get_response(request)
+
+
+class ProfilingMiddleware:
+    """
+    Профилирование cProfile запросов входа и обновления токенов. Без
+    PROFILING_ENABLED не устанавливается (MiddlewareNotUsed) и ничего не стоит.
+    Профилируется доля SAMPLE_RATE запросов, а при включённом в админке
+    ProfilingSwitch - его доля; переключатель перечитывается из БД не чаще
+    раза в SWITCH_CHECK_INTERVAL секунд. Одновременно профилируется один запрос
+    процесса: cProfile не допускает двух активных профилировщиков.
+    """
+
+    sync_capable = True
+    # cProfile измеряет поток целиком, в цикле событий смешались бы чужие запросы
+    async_capable = False
+
+    def __init__(self, get_response):
+        config = settings.TELEGRAM_USER_PROFILING
+        if not config["ENABLED"]:
+            raise MiddlewareNotUsed
+        self.get_response = get_response
+        self.views = {reverse(name): name for name in config["VIEWS"]}
+        self.sample_rate = config["SAMPLE_RATE"]
+        self.switch_check_interval = config["SWITCH_CHECK_INTERVAL"]
+        self.store = ProfileStore(config["DIR"], config["MAX_FILES"])
+        self._switch_rate = 0.0
+        self._switch_checked_at = float("-inf")
+        self._profiling = threading.Lock()
+
+    def _current_sample_rate(self) -> float:
+        now = time.monotonic()
+        if now - self._switch_checked_at >= self.switch_check_interval:
+            self._switch_checked_at = now
+            try:
+                switch = ProfilingSwitch.objects.filter(pk=1).first()
+            except DatabaseError as e:
+                logger.warning("Profiling switch is unavailable: %s", str(e))
+                switch = None
+            self._switch_rate = switch.active_sample_rate() if switch else 0.0
+        return max(self.sample_rate, self._switch_rate)
+
+    def __call__(self, request):
+        view = self.views.get(request.path)
+        if view is None or random.random() >= self._current_sample_rate():
+            return self.get_response(request)
+        if not self._profiling.acquire(blocking=False):
+            return self.get_response(request)
+
+        profiler = cProfile.Profile()
+        try:
+            profiler.enable()
+            try:
+                response = self.get_response(request)
+            finally:
+                profiler.disable()
+            try:
+                self.store.save(profiler, view)
+            except OSError as e:
+                logger.warning("Failed to save profile: %s", str(e))
+        finally:
+            self._profiling.release()
+        return response
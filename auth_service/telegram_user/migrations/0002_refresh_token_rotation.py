@@ -0,0 +1,28 @@
+# Generated by Django 5.2.4 on 2026-10-18 18:12
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("telegram_user", "0001_initial"),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name="RefreshTokenRotation",
+            fields=[
+                (
+                    "jti",
+                    models.CharField(max_length=255, primary_key=True, serialize=False),
+                ),
+                ("telegram_id", models.BigIntegerField()),
+                ("expires_at", models.DateTimeField()),
+                ("rotated_at", models.DateTimeField()),
+            ],
+            options={
+                "db_table": "auth_refresh_token_rotation",
+            },
+        ),
+    ]
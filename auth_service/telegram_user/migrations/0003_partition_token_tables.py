@@ -0,0 +1,99 @@
+# Generated by Django 5.2.4 on 2026-10-18 19:02
+
+from django.db import migrations, models
+
+REVOKED_TOKEN_SQL = """
+    CREATE TABLE auth_revoked_token (
+        id bigint GENERATED BY DEFAULT AS IDENTITY,
+        jti varchar(255) NOT NULL,
+        expires_at timestamp with time zone NOT NULL,
+        revoked_at timestamp with time zone NOT NULL,
+        PRIMARY KEY (id, expires_at),
+        CONSTRAINT auth_revoked_token_jti_expires_uniq UNIQUE (jti, expires_at)
+    ) PARTITION BY RANGE (expires_at);
+    CREATE TABLE auth_revoked_token_default PARTITION OF auth_revoked_token DEFAULT;
+"""
+
+ROTATION_SQL = """
+    ALTER TABLE auth_refresh_token_rotation RENAME TO auth_refresh_token_rotation_old;
+    CREATE TABLE auth_refresh_token_rotation (
+        jti varchar(255) NOT NULL,
+        telegram_id bigint NOT NULL,
+        expires_at timestamp with time zone NOT NULL,
+        rotated_at timestamp with time zone NOT NULL,
+        PRIMARY KEY (jti, expires_at)
+    ) PARTITION BY RANGE (expires_at);
+    CREATE TABLE auth_refresh_token_rotation_default
+        PARTITION OF auth_refresh_token_rotation DEFAULT;
+    INSERT INTO auth_refresh_token_rotation
+        SELECT jti, telegram_id, expires_at, rotated_at
+        FROM auth_refresh_token_rotation_old;
+    DROP TABLE auth_refresh_token_rotation_old;
+"""
+
+ROTATION_REVERSE_SQL = """
+    ALTER TABLE auth_refresh_token_rotation RENAME TO auth_refresh_token_rotation_old;
+    CREATE TABLE auth_refresh_token_rotation (
+        jti varchar(255) NOT NULL PRIMARY KEY,
+        telegram_id bigint NOT NULL,
+        expires_at timestamp with time zone NOT NULL,
+        rotated_at timestamp with time zone NOT NULL
+    );
+    INSERT INTO auth_refresh_token_rotation
+        SELECT jti, telegram_id, expires_at, rotated_at
+        FROM auth_refresh_token_rotation_old
+        ON CONFLICT DO NOTHING;
+    DROP TABLE auth_refresh_token_rotation_old;
+"""
+
+
+def create_token_tables(apps, schema_editor):
+    """В PostgreSQL таблицы токенов секционируются по expires_at, иначе - обычные."""
+    if schema_editor.connection.vendor != "postgresql":
+        schema_editor.create_model(apps.get_model("telegram_user", "RevokedToken"))
+        return
+    schema_editor.execute(REVOKED_TOKEN_SQL)
+    schema_editor.execute(ROTATION_SQL)
+
+
+def drop_token_tables(apps, schema_editor):
+    if schema_editor.connection.vendor != "postgresql":
+        schema_editor.delete_model(apps.get_model("telegram_user", "RevokedToken"))
+        return
+    schema_editor.execute("DROP TABLE auth_revoked_token")
+    schema_editor.execute(ROTATION_REVERSE_SQL)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("telegram_user", "0002_refresh_token_rotation"),
+    ]
+
+    operations = [
+        migrations.SeparateDatabaseAndState(
+            state_operations=[
+                migrations.CreateModel(
+                    name="RevokedToken",
+                    fields=[
+                        ("id", models.BigAutoField(primary_key=True, serialize=False)),
+                        ("jti", models.CharField(max_length=255)),
+                        ("expires_at", models.DateTimeField()),
+                        ("revoked_at", models.DateTimeField()),
+                    ],
+                    options={
+                        "db_table": "auth_revoked_token",
+                        "constraints": [
+                            models.UniqueConstraint(
+                                fields=("jti", "expires_at"),
+                                name="auth_revoked_token_jti_expires_uniq",
+                            )
+                        ],
+                    },
+                ),
+            ],
+            database_operations=[
+                migrations.RunPython(create_token_tables, drop_token_tables),
+            ],
+        ),
+    ]
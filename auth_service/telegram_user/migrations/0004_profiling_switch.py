@@ -0,0 +1,52 @@
+# Generated by Django 5.2.4 on 2026-10-18 19:40
+
+import django.core.validators
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("telegram_user", "0003_partition_token_tables"),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name="ProfilingSwitch",
+            fields=[
+                (
+                    "id",
+                    models.BigAutoField(
+                        auto_created=True,
+                        primary_key=True,
+                        serialize=False,
+                        verbose_name="ID",
+                    ),
+                ),
+                ("enabled", models.BooleanField(default=False)),
+                (
+                    "sample_rate",
+                    models.FloatField(
+                        default=1.0,
+                        help_text="Fraction of login and refresh requests to profile",
+                        validators=[
+                            django.core.validators.MinValueValidator(0.0),
+                            django.core.validators.MaxValueValidator(1.0),
+                        ],
+                    ),
+                ),
+                (
+                    "expires_at",
+                    models.DateTimeField(
+                        blank=True,
+                        help_text="Profiling is switched off automatically after this time",
+                        null=True,
+                    ),
+                ),
+                ("updated_at", models.DateTimeField(auto_now=True)),
+            ],
+            options={
+                "db_table": "auth_profiling_switch",
+            },
+        ),
+    ]
@@ -1,6 +1,13 @@
-from django.db import models
+import logging
+from typing import NamedTuple
+
+from django.core.validators import MaxValueValidator, MinValueValidator
+from django.db import DatabaseError, connections, models, router
+from django.utils import timezone
 from django.utils.translation import gettext_lazy as _
 
+logger = logging.getLogger("telegram_user")
+
 
 class TimeStampedModel(models.Model):
     """Абстрактная модель с полями даты создания и обновления."""
@@ -20,6 +27,123 @@ class TimeStampedModel(models.Model):
         abstract = True
 
 
+class TelegramUserManager(models.Manager):
+    """Менеджер TelegramUser с upsert профиля за один запрос."""
+
+    PROFILE_FIELDS = ("first_name", "last_name", "username")
+
+    # Профилей в одном запросе bulk_upsert_profiles: 7 параметров на профиль,
+    # PostgreSQL принимает не больше 65535 параметров
+    BULK_BATCH_SIZE = 1000
+
+    def _upsert_query(self, profiles: list[dict]) -> tuple[str, list, str]:
+        using = router.db_for_write(self.model)
+        qn = connections[using].ops.quote_name
+        table = qn(self.model._meta.db_table)
+        profile = ", ".join(qn(f) for f in self.PROFILE_FIELDS)
+        current = ", ".join(f"u.{qn(f)}" for f in self.PROFILE_FIELDS)
+        excluded = ", ".join(f"EXCLUDED.{qn(f)}" for f in self.PROFILE_FIELDS)
+        values = ", ".join(["(%s, %s, %s, %s, %s, %s)"] * len(profiles))
+        ids = ", ".join(["%s"] * len(profiles))
+        now = timezone.now()
+
+        sql = f"""
+            WITH upserted AS (
+                INSERT INTO {table} AS u
+                    ({qn("telegram_id")}, {profile}, {qn("created_at")}, {qn("updated_at")})
+                VALUES {values}
+                ON CONFLICT ({qn("telegram_id")}) DO UPDATE SET
+                    ({profile}, {qn("updated_at")}) = ({excluded}, EXCLUDED.{qn("updated_at")})
+                WHERE ({current}) IS DISTINCT FROM ({excluded})
+                RETURNING u.*
+            )
+            SELECT * FROM upserted
+            UNION ALL
+            SELECT * FROM {table}
+            WHERE {qn("telegram_id")} IN ({ids})
+                AND {qn("telegram_id")} NOT IN (SELECT {qn("telegram_id")} FROM upserted)
+        """
+        params = [
+            value
+            for p in profiles
+            for value in (
+                p["telegram_id"],
+                *(p[field] for field in self.PROFILE_FIELDS),
+                now,
+                now,
+            )
+        ]
+        params += [p["telegram_id"] for p in profiles]
+        return sql, params, using
+
+    def upsert_profile(
+        self, telegram_id: int, first_name: str, last_name: str, username: str
+    ) -> "TelegramUser":
+        """
+        Создаёт пользователя или обновляет его профиль одним запросом
+        (INSERT ... ON CONFLICT DO UPDATE ... WHERE). Если профиль не изменился,
+        строка не перезаписывается и updated_at остаётся прежним.
+        """
+        sql, params, using = self._upsert_query(
+            [
+                {
+                    "telegram_id": telegram_id,
+                    "first_name": first_name,
+                    "last_name": last_name,
+                    "username": username,
+                }
+            ]
+        )
+        rows = list(self.raw(sql, params, using=using))
+        if rows:
+            return rows[0]
+        # Строка вставлена конкурентной транзакцией после начала запроса
+        return self.db_manager(using).get(telegram_id=telegram_id)
+
+    async def aupsert_profile(
+        self, telegram_id: int, first_name: str, last_name: str, username: str
+    ) -> "TelegramUser":
+        """Асинхронная версия upsert_profile."""
+        sql, params, using = self._upsert_query(
+            [
+                {
+                    "telegram_id": telegram_id,
+                    "first_name": first_name,
+                    "last_name": last_name,
+                    "username": username,
+                }
+            ]
+        )
+        async for user in self.raw(sql, params, using=using):
+            return user
+        return await self.db_manager(using).aget(telegram_id=telegram_id)
+
+    def bulk_upsert_profiles(self, profiles: list[dict]) -> list["TelegramUser"]:
+        """
+        Создаёт или обновляет профили пачкой: тот же INSERT ... ON CONFLICT
+        DO UPDATE ... WHERE, что и upsert_profile, по запросу на BULK_BATCH_SIZE
+        профилей. Неизменившиеся строки не перезаписываются, возвращаются
+        пользователи в том виде, в каком они хранятся в БД.
+        Для повторяющихся telegram_id используется последний профиль.
+        """
+        unique = list({p["telegram_id"]: p for p in profiles}.values())
+        users = []
+        for start in range(0, len(unique), self.BULK_BATCH_SIZE):
+            batch = unique[start : start + self.BULK_BATCH_SIZE]
+            sql, params, using = self._upsert_query(batch)
+            found = list(self.raw(sql, params, using=using))
+            if len(found) < len(batch):
+                # Строки вставлены конкурентной транзакцией после начала запроса
+                seen = {user.telegram_id for user in found}
+                found += self.db_manager(using).filter(
+                    telegram_id__in=[
+                        p["telegram_id"] for p in batch if p["telegram_id"] not in seen
+                    ]
+                )
+            users += found
+        return users
+
+
 class TelegramUser(TimeStampedModel):
     """Модель для хранения данных о telegram пользователях"""
 
@@ -28,6 +152,8 @@ class TelegramUser(TimeStampedModel):
     last_name = models.CharField(max_length=255, blank=True, null=True)
     username = models.CharField(max_length=255, blank=True, null=True)
 
+    objects = TelegramUserManager()
+
     class Meta:
         db_table = "auth_telegram_user"
         indexes = [
@@ -36,3 +162,282 @@ class TelegramUser(TimeStampedModel):
 
     def __str__(self):
         return f"tg_id={self.telegram_id} first_name={self.first_name} last_name={self.last_name} username={self.username}"
+
+
+class RefreshClaim(NamedTuple):
+    """
+    Итог захвата jti: захвачен ли токен, есть ли его пользователь на основной БД
+    и отозвано ли семейство токена (по таблице RevokedToken).
+    """
+
+    claimed: bool
+    user_exists: bool
+    revoked: bool = False
+
+
+class RefreshTokenRotationManager(models.Manager):
+    """
+    Менеджер RefreshTokenRotation с атомарным захватом jti за один запрос.
+    jti захватывается, только если пользователь токена есть на основной БД:
+    refresh удалённого пользователя не расходует токен. Отзыв семейства
+    проверяется в том же запросе: фильтр Блума хранилища отзывов в других
+    воркерах может ещё не знать об отзыве.
+    """
+
+    def _claim_sql(self, using: str) -> str:
+        qn = connections[using].ops.quote_name
+        return f"""
+            INSERT INTO {qn(self.model._meta.db_table)}
+                ({qn("jti")}, {qn("telegram_id")}, {qn("expires_at")}, {qn("rotated_at")})
+            SELECT %s, %s, %s, %s
+            WHERE EXISTS (SELECT 1 FROM target) AND NOT EXISTS (SELECT 1 FROM revoked)
+            ON CONFLICT DO NOTHING
+            RETURNING {qn("jti")}
+        """
+
+    def _revoked_sql(self, using: str) -> str:
+        # Семейство отозвано не раньше выпуска токена, поэтому запись отзыва
+        # истекает не раньше токена: PostgreSQL читает только эти секции
+        qn = connections[using].ops.quote_name
+        return f"""
+            SELECT 1 FROM {qn(RevokedToken._meta.db_table)}
+            WHERE {qn("jti")} = %s AND {qn("expires_at")} >= %s
+        """
+
+    def _claim_query(
+        self, jti: str, telegram_id: int, expires_at, family: str | None
+    ) -> tuple[str, list, str]:
+        using = router.db_for_write(self.model)
+        qn = connections[using].ops.quote_name
+        sql = f"""
+            WITH target AS (
+                SELECT 1 FROM {qn(TelegramUser._meta.db_table)}
+                WHERE {qn("telegram_id")} = %s
+            ),
+            revoked AS ({self._revoked_sql(using)}),
+            claimed AS ({self._claim_sql(using)})
+            SELECT (SELECT {qn("jti")} FROM claimed) AS {qn("jti")},
+                EXISTS (SELECT 1 FROM target) AS user_exists,
+                EXISTS (SELECT 1 FROM revoked) AS family_revoked
+        """
+        params = [
+            telegram_id,
+            family or jti,
+            expires_at,
+            jti,
+            telegram_id,
+            expires_at,
+            timezone.now(),
+        ]
+        return sql, params, using
+
+    def claim(
+        self, jti: str, telegram_id: int, expires_at, family: str | None = None
+    ) -> RefreshClaim:
+        """
+        Отмечает refresh-токен использованным.
+        claimed=False: токен уже был использован (повторное предъявление),
+        пользователя нет (user_exists=False) или семейство family (по умолчанию
+        сам jti) отозвано (revoked=True); в двух последних случаях токен
+        не расходуется.
+        """
+        sql, params, using = self._claim_query(jti, telegram_id, expires_at, family)
+        with connections[using].cursor() as cursor:
+            cursor.execute(sql, params)
+            claimed_jti, user_exists, revoked = cursor.fetchone()
+        return RefreshClaim(claimed_jti is not None, user_exists, revoked)
+
+    async def aclaim(
+        self, jti: str, telegram_id: int, expires_at, family: str | None = None
+    ) -> RefreshClaim:
+        """Асинхронная версия claim."""
+        sql, params, using = self._claim_query(jti, telegram_id, expires_at, family)
+        async for row in self.raw(sql, params, using=using):
+            return RefreshClaim(row.pk is not None, row.user_exists, row.family_revoked)
+
+    def _user_database(self) -> str | None:
+        """БД чтения пользователя, если это не БД записи токенов (реплика)."""
+        using = router.db_for_read(TelegramUser)
+        return using if using != router.db_for_write(self.model) else None
+
+    def _read_user(self, telegram_id: int, user_db: str) -> TelegramUser | None:
+        """
+        Пользователь с реплики. При ошибке реплики или отставании (строки ещё
+        нет) - с основной БД.
+        """
+        try:
+            users = TelegramUser.objects.using(user_db).filter(telegram_id=telegram_id)
+            if (found := users.first()) is not None:
+                return found
+        except DatabaseError as e:
+            logger.warning(
+                "Replica %s is unavailable: %s",
+                user_db,
+                str(e),
+                extra={"event": "replica_read_failed"},
+            )
+        primary = TelegramUser.objects.using(router.db_for_write(TelegramUser))
+        return primary.filter(telegram_id=telegram_id).first()
+
+    async def _aread_user(self, telegram_id: int, user_db: str) -> TelegramUser | None:
+        """Асинхронная версия _read_user."""
+        try:
+            users = TelegramUser.objects.using(user_db).filter(telegram_id=telegram_id)
+            if (found := await users.afirst()) is not None:
+                return found
+        except DatabaseError as e:
+            logger.warning(
+                "Replica %s is unavailable: %s",
+                user_db,
+                str(e),
+                extra={"event": "replica_read_failed"},
+            )
+        primary = TelegramUser.objects.using(router.db_for_write(TelegramUser))
+        return await primary.filter(telegram_id=telegram_id).afirst()
+
+    def _claim_and_get_user_query(
+        self, jti: str, telegram_id: int, expires_at, family: str | None
+    ) -> tuple[str, list, str]:
+        using = router.db_for_write(self.model)
+        qn = connections[using].ops.quote_name
+        sql = f"""
+            WITH target AS (
+                SELECT * FROM {qn(TelegramUser._meta.db_table)}
+                WHERE {qn("telegram_id")} = %s
+            ),
+            revoked AS ({self._revoked_sql(using)}),
+            claimed AS ({self._claim_sql(using)})
+            SELECT u.*, EXISTS (SELECT 1 FROM claimed) AS token_claimed,
+                EXISTS (SELECT 1 FROM revoked) AS family_revoked
+            FROM (SELECT 1) AS one
+            LEFT JOIN target AS u ON TRUE
+        """
+        params = [
+            telegram_id,
+            family or jti,
+            expires_at,
+            jti,
+            telegram_id,
+            expires_at,
+            timezone.now(),
+        ]
+        return sql, params, using
+
+    def claim_and_get_user(
+        self, jti: str, telegram_id: int, expires_at, family: str | None = None
+    ) -> tuple[RefreshClaim, TelegramUser | None]:
+        """
+        То же, что claim, но в том же запросе загружает пользователя.
+        Если пользователь читается с реплики - сначала чтение пользователя
+        (с основной БД, если реплика недоступна или отстаёт), затем захват jti
+        на основной БД.
+        Возвращает (итог захвата, пользователь или None).
+        """
+        if (user_db := self._user_database()) is not None:
+            if (user := self._read_user(telegram_id, user_db)) is None:
+                return RefreshClaim(False, False), None
+            return self.claim(jti, telegram_id, expires_at, family), user
+        sql, params, using = self._claim_and_get_user_query(
+            jti, telegram_id, expires_at, family
+        )
+        (row,) = TelegramUser.objects.raw(sql, params, using=using)
+        user = row if row.pk is not None else None
+        return (
+            RefreshClaim(row.token_claimed, user is not None, row.family_revoked),
+            user,
+        )
+
+    async def aclaim_and_get_user(
+        self, jti: str, telegram_id: int, expires_at, family: str | None = None
+    ) -> tuple[RefreshClaim, TelegramUser | None]:
+        """Асинхронная версия claim_and_get_user."""
+        if (user_db := self._user_database()) is not None:
+            if (user := await self._aread_user(telegram_id, user_db)) is None:
+                return RefreshClaim(False, False), None
+            return await self.aclaim(jti, telegram_id, expires_at, family), user
+        sql, params, using = self._claim_and_get_user_query(
+            jti, telegram_id, expires_at, family
+        )
+        async for row in TelegramUser.objects.raw(sql, params, using=using):
+            user = row if row.pk is not None else None
+            return (
+                RefreshClaim(row.token_claimed, user is not None, row.family_revoked),
+                user,
+            )
+
+
+class RefreshTokenRotation(models.Model):
+    """
+    Использованные при ротации refresh-токены (по jti).
+    Уникальность jti гарантирует, что токен обменивается на новую пару только один раз.
+    В PostgreSQL таблица секционирована по дню expires_at, первичный ключ (jti, expires_at).
+    """
+
+    jti = models.CharField(max_length=255, primary_key=True)
+    telegram_id = models.BigIntegerField()
+    expires_at = models.DateTimeField()
+    rotated_at = models.DateTimeField()
+
+    objects = RefreshTokenRotationManager()
+
+    class Meta:
+        db_table = "auth_refresh_token_rotation"
+
+    def __str__(self):
+        return f"jti={self.jti} tg_id={self.telegram_id}"
+
+
+class RevokedToken(models.Model):
+    """
+    Отозванные refresh-токены (по jti).
+    В PostgreSQL таблица секционирована по дню expires_at: истёкшие секции удаляются
+    командой purge_expired_tokens целиком, без DELETE.
+    """
+
+    id = models.BigAutoField(primary_key=True)
+    jti = models.CharField(max_length=255)
+    expires_at = models.DateTimeField()
+    revoked_at = models.DateTimeField()
+
+    class Meta:
+        db_table = "auth_revoked_token"
+        constraints = [
+            models.UniqueConstraint(
+                fields=["jti", "expires_at"], name="auth_revoked_token_jti_expires_uniq"
+            ),
+        ]
+
+    def __str__(self):
+        return f"jti={self.jti}"
+
+
+class ProfilingSwitch(models.Model):
+    """
+    Включение профилирования входа и обновления токенов из админки без перезапуска.
+    Используется одна строка (pk=1), её читает ProfilingMiddleware.
+    """
+
+    enabled = models.BooleanField(default=False)
+    sample_rate = models.FloatField(
+        default=1.0,
+        validators=[MinValueValidator(0.0), MaxValueValidator(1.0)],
+        help_text=_("Fraction of login and refresh requests to profile"),
+    )
+    expires_at = models.DateTimeField(
+        blank=True,
+        null=True,
+        help_text=_("Profiling is switched off automatically after this time"),
+    )
+    updated_at = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        db_table = "auth_profiling_switch"
+
+    def __str__(self):
+        return f"enabled={self.enabled} sample_rate={self.sample_rate}"
+
+    def active_sample_rate(self) -> float:
+        """Доля профилируемых запросов с учётом выключения по сроку."""
+        if not self.enabled or (self.expires_at and self.expires_at <= timezone.now()):
+            return 0.0
+        return self.sample_rate
@@ -0,0 +1,23 @@
+import hmac
+import logging
+
+from django.conf import settings
+from rest_framework.permissions import BasePermission
+
+logger = logging.getLogger("telegram_user")
+
+
+class IsTrustedService(BasePermission):
+    """Доступ только для доверенных сервисов с ключом из TELEGRAM_USER_TRUSTED_SERVICE_KEYS."""
+
+    HEADER = "X-Service-Key"
+
+    def has_permission(self, request, view):
+        received = request.headers.get(self.HEADER, "")
+        if received and any(
+            hmac.compare_digest(received.encode(), key.encode())
+            for key in settings.TELEGRAM_USER_TRUSTED_SERVICE_KEYS
+        ):
+            return True
+        logger.warning("Untrusted service request to %s", request.path)
+        return False
@@ -0,0 +1,99 @@
+import logging
+
+from django.db import DatabaseError, connections
+
+from ..metrics import Metrics
+
+logger = logging.getLogger("telegram_user")
+
+
+class DatabasePools:
+    """
+    Соединения с БД воркера: прогрев при старте, закрытие перед fork и
+    публикация состояния пулов psycopg (OPTIONS["pool"]) в метрики.
+    Без пула прогревается постоянное соединение текущего потока (CONN_MAX_AGE).
+    """
+
+    @staticmethod
+    def _pool(connection):
+        """Уже созданный пул соединения: connection.pool создал бы его заново."""
+        return getattr(connection, "_connection_pools", {}).get(connection.alias)
+
+    @staticmethod
+    def _pooled(connection) -> bool:
+        return bool(connection.settings_dict["OPTIONS"].get("pool"))
+
+    @classmethod
+    def warm_up(cls, timeout: float | None = None) -> list[str]:
+        """
+        Открывает соединения всех БД: пул ждёт min_size соединений (не дольше
+        timeout секунд, по умолчанию - таймаут пула). Возвращает псевдонимы БД,
+        которые не удалось прогреть; первый запрос к ним подключится сам.
+        """
+        failed = []
+        for connection in connections.all():
+            try:
+                with connection.wrap_database_errors:
+                    if cls._pooled(connection):
+                        pool = connection.pool
+                        pool.open(wait=True, timeout=timeout or pool.timeout)
+                    else:
+                        connection.ensure_connection()
+            except DatabaseError as e:
+                failed.append(connection.alias)
+                logger.warning(
+                    "Database %s warm-up failed: %s",
+                    connection.alias,
+                    e,
+                    extra={"event": "db_warm_up_failed"},
+                )
+        return failed
+
+    @classmethod
+    def close_all(cls) -> None:
+        """
+        Закрывает соединения и пулы процесса. Вызывается мастером перед fork:
+        соединения и потоки пула не должны достаться воркерам.
+        """
+        connections.close_all()
+        for connection in connections.all():
+            if cls._pool(connection) is not None:
+                connection.close_pool()
+
+    @classmethod
+    def publish_metrics(cls) -> None:
+        """Состояние пулов в метриках; сборщик Metrics, вызывается при записи снимка."""
+        for connection in connections.all():
+            pool = cls._pool(connection)
+            if pool is None:
+                continue
+            stats = pool.get_stats()
+            alias = connection.alias
+            Metrics.set("auth_db_pool_size", stats.get("pool_size", 0), alias=alias)
+            Metrics.set(
+                "auth_db_pool_available", stats.get("pool_available", 0), alias=alias
+            )
+            Metrics.set("auth_db_pool_max_size", pool.max_size, alias=alias)
+            Metrics.set(
+                "auth_db_pool_requests_waiting",
+                stats.get("requests_waiting", 0),
+                alias=alias,
+            )
+            Metrics.set(
+                "auth_db_pool_requests_total", stats.get("requests_num", 0), alias=alias
+            )
+            Metrics.set(
+                "auth_db_pool_requests_queued_total",
+                stats.get("requests_queued", 0),
+                alias=alias,
+            )
+            Metrics.set(
+                "auth_db_pool_wait_seconds_total",
+                stats.get("requests_wait_ms", 0) / 1000,
+                alias=alias,
+            )
+            Metrics.set(
+                "auth_db_pool_errors_total",
+                stats.get("requests_errors", 0),
+                alias=alias,
+            )
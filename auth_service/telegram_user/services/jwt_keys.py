@@ -0,0 +1,195 @@
+import hashlib
+import json
+import logging
+from pathlib import Path
+
+import jwt
+from cryptography.hazmat.primitives.asymmetric import ec, ed25519
+from cryptography.hazmat.primitives.serialization import (
+    load_pem_private_key,
+    load_pem_public_key,
+)
+from django.conf import settings
+from django.core.exceptions import ImproperlyConfigured
+from django.core.signals import setting_changed
+from django.dispatch import receiver
+from django.utils.translation import gettext_lazy as _
+from rest_framework_simplejwt import settings as simplejwt_settings
+from rest_framework_simplejwt.backends import TokenBackend
+from rest_framework_simplejwt.exceptions import TokenBackendError
+
+logger = logging.getLogger("telegram_user")
+
+
+class KeyRingTokenBackend(TokenBackend):
+    """
+    TokenBackend simplejwt с набором ключей: токены подписываются активным ключом
+    с заголовком kid, а проверяются ключом, указанным в kid токена.
+    """
+
+    def __init__(self, active_kid: str | None, private_key, public_keys: dict):
+        # simplejwt пересоздаёт api_settings при изменении SIMPLE_JWT
+        api_settings = simplejwt_settings.api_settings
+        super().__init__(
+            api_settings.ALGORITHM,
+            api_settings.SIGNING_KEY,
+            api_settings.VERIFYING_KEY,
+            api_settings.AUDIENCE,
+            api_settings.ISSUER,
+            None,
+            api_settings.LEEWAY,
+            api_settings.JSON_ENCODER,
+        )
+        self.active_kid = active_kid
+        self.private_key = private_key
+        self.public_keys = public_keys
+
+    def encode(self, payload: dict) -> str:
+        if self.active_kid is None:
+            return super().encode(payload)
+
+        jwt_payload = payload.copy()
+        if self.audience is not None:
+            jwt_payload["aud"] = self.audience
+        if self.issuer is not None:
+            jwt_payload["iss"] = self.issuer
+
+        return jwt.encode(
+            jwt_payload,
+            self.private_key,
+            algorithm=self.algorithm,
+            headers={"kid": self.active_kid},
+            json_encoder=self.json_encoder,
+        )
+
+    def get_verifying_key(self, token):
+        if self.active_kid is None:
+            return super().get_verifying_key(token)
+        try:
+            kid = jwt.get_unverified_header(token).get("kid")
+        except jwt.InvalidTokenError as e:
+            raise TokenBackendError(_("Token is invalid")) from e
+        if (key := self.public_keys.get(kid)) is None:
+            raise TokenBackendError(_("Token is invalid"))
+        return key
+
+
+class JWTKeyRing:
+    """
+    Ключи подписи JWT для асимметричных алгоритмов (EdDSA, ES256).
+    Ключи из TELEGRAM_USER_JWT_KEYS загружаются один раз. Подписывает только
+    активный ключ, но проверяются и публикуются в JWKS все ключи, что позволяет
+    менять ключи с перекрытием. Для HS* набор пуст и используется JWT_SECRET_KEY.
+    """
+
+    KEY_TYPES = {
+        "EdDSA": ed25519.Ed25519PublicKey,
+        "ES256": ec.EllipticCurvePublicKey,
+    }
+
+    _backend: KeyRingTokenBackend | None = None
+    _jwks: bytes = b""
+    _etag: str = ""
+
+    @staticmethod
+    def algorithm() -> str:
+        return simplejwt_settings.api_settings.ALGORITHM
+
+    @classmethod
+    def asymmetric(cls) -> bool:
+        return not cls.algorithm().startswith("HS")
+
+    @staticmethod
+    def _load_key(kid: str, path: str):
+        """Возвращает (закрытый ключ или None, открытый ключ) из PEM-файла."""
+        try:
+            pem = Path(path).read_bytes()
+        except OSError as e:
+            raise ImproperlyConfigured(f"Cannot read JWT key {kid!r}: {e}")
+        try:
+            private_key = load_pem_private_key(pem, password=None)
+            return private_key, private_key.public_key()
+        except ValueError:
+            pass
+        try:
+            return None, load_pem_public_key(pem)
+        except ValueError:
+            raise ImproperlyConfigured(f"JWT key {kid!r} is not a PEM key")
+
+    @classmethod
+    def load(cls) -> None:
+        """(Пере)загружает ключи из TELEGRAM_USER_JWT_KEYS."""
+        algorithm = cls.algorithm()
+        config = settings.TELEGRAM_USER_JWT_KEYS
+        if not cls.asymmetric():
+            cls._set_jwks([])
+            cls._backend = KeyRingTokenBackend(None, None, {})
+            return
+
+        if algorithm not in cls.KEY_TYPES:
+            raise ImproperlyConfigured(f"Unsupported JWT algorithm {algorithm}")
+        if not config["KEYS"]:
+            raise ImproperlyConfigured(f"JWT_KEYS are required for {algorithm}")
+
+        private_keys, public_keys = {}, {}
+        for kid, path in config["KEYS"].items():
+            private_key, public_key = cls._load_key(kid, path)
+            if not isinstance(public_key, cls.KEY_TYPES[algorithm]):
+                raise ImproperlyConfigured(
+                    f"JWT key {kid!r} does not match {algorithm}"
+                )
+            if algorithm == "ES256" and public_key.curve.name != "secp256r1":
+                raise ImproperlyConfigured(f"JWT key {kid!r} must use the P-256 curve")
+            private_keys[kid] = private_key
+            public_keys[kid] = public_key
+
+        active_kid = config["ACTIVE_KID"] or next(iter(config["KEYS"]))
+        if private_keys.get(active_kid) is None:
+            raise ImproperlyConfigured(
+                f"Active JWT key {active_kid!r} must be a configured private key"
+            )
+
+        jwk_algorithm = jwt.PyJWS().get_algorithm_by_name(algorithm)
+        cls._set_jwks(
+            [
+                {
+                    **jwk_algorithm.to_jwk(public_key, as_dict=True),
+                    "kid": kid,
+                    "use": "sig",
+                    "alg": algorithm,
+                }
+                for kid, public_key in public_keys.items()
+            ]
+        )
+        cls._backend = KeyRingTokenBackend(
+            active_kid, private_keys[active_kid], public_keys
+        )
+        logger.info("Loaded %d JWT keys, active kid=%s", len(public_keys), active_kid)
+
+    @classmethod
+    def _set_jwks(cls, keys: list[dict]) -> None:
+        cls._jwks = json.dumps({"keys": keys}, separators=(",", ":")).encode()
+        cls._etag = f'"{hashlib.sha256(cls._jwks).hexdigest()[:32]}"'
+
+    @classmethod
+    def token_backend(cls) -> KeyRingTokenBackend:
+        if cls._backend is None:
+            cls.load()
+        return cls._backend
+
+    @classmethod
+    def jwks(cls) -> bytes:
+        """Открытые ключи в формате JWKS (сериализованный JSON)."""
+        cls.token_backend()
+        return cls._jwks
+
+    @classmethod
+    def etag(cls) -> str:
+        cls.token_backend()
+        return cls._etag
+
+
+@receiver(setting_changed)
+def reset_jwt_key_ring(*, setting, **kwargs):
+    if setting in ("TELEGRAM_USER_JWT_KEYS", "SIMPLE_JWT"):
+        JWTKeyRing._backend = None
@@ -0,0 +1,107 @@
+import atexit
+import logging
+import os
+import threading
+
+from django.conf import settings
+from django.db import DatabaseError, close_old_connections
+
+from ..models import TelegramUser
+
+logger = logging.getLogger("telegram_user")
+
+
+class ProfileWriteBuffer:
+    """
+    Буфер отложенной записи профилей (write-behind) в пределах одного воркера.
+    Изменения профилей существующих пользователей накапливаются и записываются
+    пачкой по таймеру или при достижении MAX_SIZE, а также при завершении процесса.
+    """
+
+    _pending: dict[int, dict] = {}
+    _lock = threading.Lock()
+    _wakeup = threading.Event()
+    _flusher: threading.Thread | None = None
+    _pid: int | None = None
+    _atexit_registered = False
+
+    @classmethod
+    def config(cls) -> dict:
+        return settings.TELEGRAM_USER_WRITE_BEHIND
+
+    @classmethod
+    def enabled(cls) -> bool:
+        return cls.config()["ENABLED"]
+
+    @classmethod
+    def add(cls, profile: dict) -> None:
+        """Ставит профиль в очередь на запись; более новый профиль заменяет старый."""
+        cls._ensure_started()
+        with cls._lock:
+            cls._pending[profile["telegram_id"]] = profile
+            full = len(cls._pending) >= cls.config()["MAX_SIZE"]
+
+        if full:
+            if cls._flusher is not None:
+                cls._wakeup.set()
+            else:
+                cls.flush()
+
+    @classmethod
+    def pending(cls) -> int:
+        return len(cls._pending)
+
+    @classmethod
+    def flush(cls) -> int:
+        """Записывает накопленные профили одним bulk-запросом. Возвращает их число."""
+        with cls._lock:
+            batch, cls._pending = cls._pending, {}
+        if not batch:
+            return 0
+
+        try:
+            TelegramUser.objects.bulk_upsert_profiles(list(batch.values()))
+        except DatabaseError as e:
+            logger.error("Write-behind flush of %d profiles failed: %s", len(batch), e)
+            with cls._lock:
+                # Возвращаем в очередь профили, которые не были заменены более новыми
+                for telegram_id, profile in batch.items():
+                    cls._pending.setdefault(telegram_id, profile)
+            return 0
+
+        logger.debug("Write-behind flushed %d profiles", len(batch))
+        return len(batch)
+
+    @classmethod
+    def _ensure_started(cls) -> None:
+        """Запускает фоновый поток сброса в текущем процессе (после fork - заново)."""
+        if cls._pid == os.getpid():
+            return
+        with cls._lock:
+            if cls._pid == os.getpid():
+                return
+            cls._pid = os.getpid()
+            cls._pending = {}
+            cls._flusher = None
+            if cls.config()["FLUSH_INTERVAL"] > 0:
+                cls._flusher = threading.Thread(
+                    target=cls._run, name="profile-write-behind", daemon=True
+                )
+                cls._flusher.start()
+            if not cls._atexit_registered:
+                # Регистрация atexit наследуется дочерними процессами после fork
+                atexit.register(cls.flush)
+                cls._atexit_registered = True
+
+    @classmethod
+    def _run(cls) -> None:
+        interval = cls.config()["FLUSH_INTERVAL"]
+        while True:
+            cls._wakeup.wait(interval)
+            cls._wakeup.clear()
+            try:
+                cls.flush()
+            except Exception as e:
+                logger.error("Write-behind flusher error: %s", e)
+            finally:
+                close_old_connections()
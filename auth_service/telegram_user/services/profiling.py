@@ -0,0 +1,56 @@
+import cProfile
+import os
+import pstats
+import time
+from pathlib import Path
+
+
+class ProfileStore:
+    """
+    Каталог профилей cProfile ограниченного размера: хранятся последние
+    max_files профилей, более старые удаляются при записи нового.
+    Имя файла: <время>-<pid>-<имя представления>.prof.
+    """
+
+    SUFFIX = ".prof"
+
+    def __init__(self, directory: str | os.PathLike, max_files: int = 100):
+        self.directory = Path(directory)
+        self.max_files = max_files
+
+    @staticmethod
+    def view_name(path: Path) -> str:
+        return path.stem.split("-", 2)[-1]
+
+    def files(self, view: str | None = None) -> list[Path]:
+        """Профили от старых к новым, при view - только этого представления."""
+        if not self.directory.is_dir():
+            return []
+        return sorted(
+            path
+            for path in self.directory.iterdir()
+            if path.suffix == self.SUFFIX
+            and (view is None or self.view_name(path) == view)
+        )
+
+    def save(self, profiler: cProfile.Profile, view: str) -> Path:
+        self.directory.mkdir(parents=True, exist_ok=True)
+        now = time.time_ns()
+        stamp = time.strftime("%Y%m%dT%H%M%S", time.gmtime(now // 10**9))
+        path = self.directory / (
+            f"{stamp}.{now % 10**9:09d}-{os.getpid()}-{view}{self.SUFFIX}"
+        )
+        profiler.dump_stats(path)
+        self._rotate()
+        return path
+
+    def _rotate(self) -> None:
+        files = self.files()
+        for path in files[: max(0, len(files) - self.max_files)]:
+            # Другой воркер мог удалить файл раньше
+            path.unlink(missing_ok=True)
+
+    @staticmethod
+    def stats(files: list[Path], stream=None) -> pstats.Stats:
+        """Суммарная статистика по нескольким профилям."""
+        return pstats.Stats(*map(str, files), stream=stream)
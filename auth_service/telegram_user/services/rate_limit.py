@@ -0,0 +1,229 @@
+import fcntl
+import hashlib
+import logging
+import mmap
+import os
+import struct
+import tempfile
+import threading
+import time
+from collections import OrderedDict
+from typing import NamedTuple
+
+from django.conf import settings
+from django.core.cache import caches
+from django.core.signals import setting_changed
+from django.dispatch import receiver
+from django.utils.module_loading import import_string
+
+logger = logging.getLogger("telegram_user")
+
+
+class Rate(NamedTuple):
+    """Корзина токенов: capacity токенов, пополняется со скоростью refill в секунду."""
+
+    capacity: float
+    refill: float
+
+    PERIODS = {"s": 1, "m": 60, "h": 3600}
+
+    @classmethod
+    def parse(cls, rate: str) -> "Rate":
+        """Разбирает строку вида "10/s", "30/m", "1000/h"."""
+        count, period = rate.split("/")
+        count = float(count)
+        return cls(count, count / cls.PERIODS[period[0]])
+
+
+def take_token(
+    tokens: float, updated_at: float, rate: Rate, now: float
+) -> tuple[float, float]:
+    """
+    Пополняет корзину на прошедшее время и берёт из неё токен.
+    Возвращает (остаток токенов, секунды до следующего токена или 0 при успехе).
+    """
+    tokens = min(rate.capacity, tokens + (now - updated_at) * rate.refill)
+    if tokens >= 1:
+        return tokens - 1, 0.0
+    return tokens, (1 - tokens) / rate.refill
+
+
+class BaseRateLimitStore:
+    """Хранилище корзин токенов."""
+
+    # consume выполняет сетевой ввод-вывод и не может вызываться в цикле событий
+    blocking = False
+
+    def __init__(self, max_keys: int, **options):
+        self.max_keys = max_keys
+
+    def consume(self, key: str, rate: Rate) -> float:
+        """Берёт токен из корзины key. Возвращает 0 или секунды до следующего токена."""
+        raise NotImplementedError
+
+    def clear(self) -> None:
+        raise NotImplementedError
+
+
+class LocalRateLimitStore(BaseRateLimitStore):
+    """Корзины в памяти процесса (LRU по max_keys). Лимиты действуют на каждый воркер."""
+
+    def __init__(self, max_keys: int, **options):
+        super().__init__(max_keys)
+        self._lock = threading.Lock()
+        self._buckets: OrderedDict[str, tuple[float, float]] = OrderedDict()
+
+    def consume(self, key: str, rate: Rate) -> float:
+        now = time.time()
+        with self._lock:
+            tokens, updated_at = self._buckets.pop(key, (rate.capacity, now))
+            tokens, retry_after = take_token(tokens, updated_at, rate, now)
+            self._buckets[key] = (tokens, now)
+            if len(self._buckets) > self.max_keys:
+                self._buckets.popitem(last=False)
+        return retry_after
+
+    def clear(self) -> None:
+        with self._lock:
+            self._buckets.clear()
+
+
+class MmapRateLimitStore(BaseRateLimitStore):
+    """
+    Общие для всех воркеров корзины в разделяемой памяти (mmap-файл в /dev/shm).
+    Таблица фиксированного размера: слот = хэш ключа % max_keys, при коллизии
+    корзина начинается заново. Чтение и запись слота защищены fcntl-блокировкой
+    его диапазона байт (между воркерами) и threading.Lock (между потоками воркера).
+    """
+
+    SLOT = struct.Struct("<Qdd")  # хэш ключа, токены, время обновления
+
+    def __init__(self, max_keys: int, path: str | None = None, **options):
+        super().__init__(max_keys)
+        if path is None:
+            base = "/dev/shm" if os.path.isdir("/dev/shm") else tempfile.gettempdir()
+            path = os.path.join(base, "auth_service_rate_limit")
+        self.path = path
+        self._fd: int | None = None
+        self._mm: mmap.mmap | None = None
+        self._pid: int | None = None
+        self._lock = threading.Lock()
+
+    def _map(self) -> tuple[int, mmap.mmap]:
+        if self._mm is None or self._pid != os.getpid():
+            size = self.SLOT.size * self.max_keys
+            if self._fd is not None:
+                os.close(self._fd)
+            fd = os.open(self.path, os.O_RDWR | os.O_CREAT, 0o600)
+            if os.fstat(fd).st_size < size:
+                os.ftruncate(fd, size)
+            self._fd, self._mm, self._pid = fd, mmap.mmap(fd, size), os.getpid()
+        return self._fd, self._mm
+
+    def consume(self, key: str, rate: Rate) -> float:
+        key_hash = int.from_bytes(
+            hashlib.blake2b(key.encode(), digest_size=8).digest(), "little"
+        )
+        offset = (key_hash % self.max_keys) * self.SLOT.size
+        fd, mm = self._map()
+        now = time.time()
+
+        with self._lock:
+            fcntl.lockf(fd, fcntl.LOCK_EX, self.SLOT.size, offset)
+            try:
+                slot_hash, tokens, updated_at = self.SLOT.unpack_from(mm, offset)
+                if slot_hash != key_hash:
+                    tokens, updated_at = rate.capacity, now
+                tokens, retry_after = take_token(tokens, updated_at, rate, now)
+                self.SLOT.pack_into(mm, offset, key_hash, tokens, now)
+            finally:
+                fcntl.lockf(fd, fcntl.LOCK_UN, self.SLOT.size, offset)
+        return retry_after
+
+    def clear(self) -> None:
+        _, mm = self._map()
+        mm[:] = bytes(len(mm))
+
+
+class CacheRateLimitStore(BaseRateLimitStore):
+    """
+    Корзины в кэше Django (Redis, Memcached) - общие для нескольких хостов.
+    Чтение и запись не атомарны: при гонке несколько запросов могут пройти сверх лимита.
+    """
+
+    blocking = True
+
+    def __init__(self, max_keys: int, alias: str = "default", **options):
+        super().__init__(max_keys)
+        self.alias = alias
+
+    def consume(self, key: str, rate: Rate) -> float:
+        cache = caches[self.alias]
+        cache_key = f"tguser:ratelimit:{key}"
+        now = time.time()
+        tokens, updated_at = cache.get(cache_key, (rate.capacity, now))
+        tokens, retry_after = take_token(tokens, updated_at, rate, now)
+        # Запись живёт, пока корзина не наполнится снова
+        timeout = max(1, int((rate.capacity - tokens) / rate.refill) + 1)
+        cache.set(cache_key, (tokens, now), timeout)
+        return retry_after
+
+    def clear(self) -> None:
+        # Кэш общий с другими данными: корзины истекают сами по таймауту
+        pass
+
+
+class RateLimiter:
+    """
+    Точка доступа к хранилищу корзин, заданному в TELEGRAM_USER_RATE_LIMIT.
+    Если общее хранилище недоступно, используются корзины в памяти процесса.
+    """
+
+    BACKEND_ALIASES = {
+        "local": "telegram_user.services.rate_limit.LocalRateLimitStore",
+        "mmap": "telegram_user.services.rate_limit.MmapRateLimitStore",
+        "django": "telegram_user.services.rate_limit.CacheRateLimitStore",
+    }
+
+    _store: BaseRateLimitStore | None = None
+    _fallback: LocalRateLimitStore | None = None
+
+    @classmethod
+    def store(cls) -> BaseRateLimitStore:
+        if cls._store is None:
+            config = settings.TELEGRAM_USER_RATE_LIMIT
+            backend = config["BACKEND"]
+            store_class = import_string(cls.BACKEND_ALIASES.get(backend, backend))
+            cls._fallback = LocalRateLimitStore(max_keys=config["MAX_KEYS"])
+            cls._store = store_class(
+                max_keys=config["MAX_KEYS"], **config.get("OPTIONS", {})
+            )
+        return cls._store
+
+    @classmethod
+    def consume(cls, key: str, rate: Rate) -> float:
+        store = cls.store()
+        try:
+            return store.consume(key, rate)
+        except Exception as e:
+            logger.warning("Rate limit store failed, using local buckets: %s", str(e))
+            return cls._fallback.consume(key, rate)
+
+    @classmethod
+    def check(cls, rules: list[tuple[str, Rate]]) -> float:
+        """Проверяет правила по порядку. Возвращает 0 или Retry-After первого отказа."""
+        for key, rate in rules:
+            if retry_after := cls.consume(key, rate):
+                return retry_after
+        return 0.0
+
+    @classmethod
+    def clear(cls) -> None:
+        cls.store().clear()
+        cls._fallback.clear()
+
+
+@receiver(setting_changed)
+def reset_rate_limit_store(*, setting, **kwargs):
+    if setting == "TELEGRAM_USER_RATE_LIMIT":
+        RateLimiter._store = None
@@ -0,0 +1,216 @@
+import hashlib
+import logging
+import math
+import threading
+import time
+
+from django.conf import settings
+from django.core.signals import setting_changed
+from django.dispatch import receiver
+from django.utils import timezone
+from django.utils.module_loading import import_string
+from rest_framework_simplejwt.utils import datetime_from_epoch
+
+from ..models import RevokedToken
+
+logger = logging.getLogger("telegram_user")
+
+
+class BloomFilter:
+    """Фильтр Блума для быстрого отрицательного ответа "jti точно не отозван"."""
+
+    def __init__(self, capacity: int, error_rate: float):
+        self.size = max(
+            8, math.ceil(-capacity * math.log(error_rate) / math.log(2) ** 2)
+        )
+        self.hash_count = max(1, round(self.size / capacity * math.log(2)))
+        self.bits = bytearray((self.size + 7) // 8)
+
+    def _positions(self, item: str):
+        digest = hashlib.blake2b(item.encode(), digest_size=16).digest()
+        h1 = int.from_bytes(digest[:8], "little")
+        h2 = int.from_bytes(digest[8:], "little") | 1
+        return ((h1 + i * h2) % self.size for i in range(self.hash_count))
+
+    def add(self, item: str) -> None:
+        for pos in self._positions(item):
+            self.bits[pos >> 3] |= 1 << (pos & 7)
+
+    def __contains__(self, item: str) -> bool:
+        return all(
+            self.bits[pos >> 3] & (1 << (pos & 7)) for pos in self._positions(item)
+        )
+
+
+class BaseRevocationStore:
+    """Хранилище отозванных refresh-токенов (по jti)."""
+
+    def __init__(self, capacity: int, error_rate: float, **options):
+        self.capacity = capacity
+        self.error_rate = error_rate
+
+    def is_revoked(self, jti: str, exp: int | None = None) -> bool:
+        raise NotImplementedError
+
+    def revoke(self, jti: str, exp: int, token: str = "") -> None:
+        raise NotImplementedError
+
+    def clear(self) -> None:
+        raise NotImplementedError
+
+
+class LocalRevocationStore(BaseRevocationStore):
+    """Хранилище в памяти процесса (для тестов и одиночного процесса)."""
+
+    def __init__(self, capacity: int, error_rate: float, **options):
+        super().__init__(capacity, error_rate)
+        self._lock = threading.Lock()
+        self.clear()
+
+    def is_revoked(self, jti: str, exp: int | None = None) -> bool:
+        if jti not in self._filter:
+            return False
+        exp = self._revoked.get(jti)
+        return exp is not None and exp > time.time()
+
+    def revoke(self, jti: str, exp: int, token: str = "") -> None:
+        with self._lock:
+            if len(self._revoked) >= self.capacity:
+                self._purge_expired()
+            self._revoked[jti] = exp
+            self._filter.add(jti)
+
+    def _purge_expired(self) -> None:
+        now = time.time()
+        self._revoked = {j: e for j, e in self._revoked.items() if e > now}
+        self._filter = BloomFilter(self.capacity, self.error_rate)
+        for jti in self._revoked:
+            self._filter.add(jti)
+
+    def clear(self) -> None:
+        with self._lock:
+            self._revoked: dict[str, int] = {}
+            self._filter = BloomFilter(self.capacity, self.error_rate)
+
+
+class DatabaseRevocationStore(BaseRevocationStore):
+    """
+    Хранилище на таблице RevokedToken с фильтром Блума в каждом воркере.
+    Фильтр раз в SYNC_INTERVAL секунд дополняется новыми записями чёрного списка,
+    раз в REBUILD_INTERVAL секунд перестраивается целиком без истёкших токенов.
+    В БД идут только jti, попавшие в фильтр.
+    Отзывы из других воркеров видны фильтру с задержкой не более SYNC_INTERVAL;
+    ротация refresh-токенов дополнительно проверяет отзыв семейства в БД
+    при захвате jti (RefreshTokenRotationManager.claim).
+    """
+
+    # Повторно читаем последние записи: транзакции могут фиксироваться не по порядку id
+    SYNC_LOOKBACK = 1000
+
+    def __init__(
+        self,
+        capacity: int,
+        error_rate: float,
+        sync_interval: float = 5.0,
+        rebuild_interval: float = 3600.0,
+        **options,
+    ):
+        super().__init__(capacity, error_rate)
+        self.sync_interval = sync_interval
+        self.rebuild_interval = rebuild_interval
+        self._lock = threading.Lock()
+        self.clear()
+
+    def _sync(self) -> None:
+        now = time.monotonic()
+        if now - self._synced_at < self.sync_interval:
+            return
+        with self._lock:
+            if now - self._synced_at < self.sync_interval:
+                return
+            if now - self._built_at >= self.rebuild_interval:
+                bloom = BloomFilter(self.capacity, self.error_rate)
+                last_id = 0
+                built_at = now
+            else:
+                bloom, last_id, built_at = self._filter, self._last_id, self._built_at
+
+            rows = RevokedToken.objects.filter(
+                id__gt=max(0, last_id - self.SYNC_LOOKBACK),
+                expires_at__gt=timezone.now(),
+            ).values_list("id", "jti")
+            for row_id, jti in rows.iterator():
+                bloom.add(jti)
+                last_id = max(last_id, row_id)
+
+            self._filter, self._last_id, self._built_at = bloom, last_id, built_at
+            self._synced_at = now
+            if built_at == now:
+                logger.debug("Revocation filter rebuilt up to id=%d", last_id)
+
+    def is_revoked(self, jti: str, exp: int | None = None) -> bool:
+        self._sync()
+        if jti not in self._filter:
+            return False
+        revoked = RevokedToken.objects.filter(jti=jti)
+        if exp is not None:
+            # Известный exp позволяет PostgreSQL читать только одну секцию
+            revoked = revoked.filter(expires_at=datetime_from_epoch(exp))
+        return revoked.exists()
+
+    def revoke(self, jti: str, exp: int, token: str = "") -> None:
+        RevokedToken.objects.bulk_create(
+            [
+                RevokedToken(
+                    jti=jti,
+                    expires_at=datetime_from_epoch(exp),
+                    revoked_at=timezone.now(),
+                )
+            ],
+            ignore_conflicts=True,
+        )
+        self._filter.add(jti)
+
+    def clear(self) -> None:
+        with self._lock:
+            self._filter = BloomFilter(self.capacity, self.error_rate)
+            self._last_id = 0
+            self._built_at = self._synced_at = -math.inf
+
+
+class RevocationStore:
+    """Точка доступа к хранилищу отозванных токенов, заданному в TELEGRAM_USER_REVOCATION."""
+
+    BACKEND_ALIASES = {
+        "local": "telegram_user.services.revocation.LocalRevocationStore",
+        "database": "telegram_user.services.revocation.DatabaseRevocationStore",
+    }
+
+    _store: BaseRevocationStore | None = None
+
+    @classmethod
+    def store(cls) -> BaseRevocationStore:
+        if cls._store is None:
+            config = settings.TELEGRAM_USER_REVOCATION
+            backend = config["BACKEND"]
+            store_class = import_string(cls.BACKEND_ALIASES.get(backend, backend))
+            cls._store = store_class(
+                capacity=config["BLOOM_CAPACITY"],
+                error_rate=config["BLOOM_ERROR_RATE"],
+                **config.get("OPTIONS", {}),
+            )
+        return cls._store
+
+    @classmethod
+    def is_revoked(cls, jti: str, exp: int | None = None) -> bool:
+        return cls.store().is_revoked(jti, exp)
+
+    @classmethod
+    def revoke(cls, jti: str, exp: int, token: str = "") -> None:
+        cls.store().revoke(jti, exp, token)
+
+
+@receiver(setting_changed)
+def reset_revocation_store(*, setting, **kwargs):
+    if setting == "TELEGRAM_USER_REVOCATION":
+        RevocationStore._store = None
@@ -0,0 +1,66 @@
+import time
+import zlib
+from contextlib import contextmanager
+
+from django.db import DEFAULT_DB_ALIAS, connections
+from django.db.migrations.executor import MigrationExecutor
+
+
+class SchemaState:
+    """
+    Состояние схемы БД относительно миграций проекта. Миграции применяет
+    одноразовое задание (migrate_locked) под advisory-блокировкой PostgreSQL,
+    при старте сервиса только проверяется, что неприменённых миграций нет.
+    """
+
+    # Ключ pg_advisory_lock, общий для всех экземпляров сервиса
+    LOCK_KEY = zlib.crc32(b"auth_service.migrate")
+
+    @staticmethod
+    def pending(using: str = DEFAULT_DB_ALIAS) -> list[str]:
+        """Неприменённые миграции вида "app.name" (один запрос к django_migrations)."""
+        executor = MigrationExecutor(connections[using])
+        plan = executor.migration_plan(executor.loader.graph.leaf_nodes())
+        return [f"{migration.app_label}.{migration.name}" for migration, _ in plan]
+
+    @classmethod
+    def wait_until_current(
+        cls, timeout: float, interval: float = 1.0, using: str = DEFAULT_DB_ALIAS
+    ) -> list[str]:
+        """Ждёт до timeout секунд, пока миграции не будут применены; возвращает оставшиеся."""
+        deadline = time.monotonic() + timeout
+        while (pending := cls.pending(using)) and time.monotonic() < deadline:
+            time.sleep(interval)
+        return pending
+
+    @classmethod
+    @contextmanager
+    def migration_lock(
+        cls, timeout: float, interval: float = 1.0, using: str = DEFAULT_DB_ALIAS
+    ):
+        """
+        Сессионная advisory-блокировка на время миграций: одновременно
+        запущенные задания выполняются по очереди. TimeoutError, если блокировку
+        не удалось получить за timeout секунд. Вне PostgreSQL не блокирует.
+        """
+        connection = connections[using]
+        if connection.vendor != "postgresql":
+            yield
+            return
+
+        deadline = time.monotonic() + timeout
+        with connection.cursor() as cursor:
+            while True:
+                cursor.execute("SELECT pg_try_advisory_lock(%s)", [cls.LOCK_KEY])
+                if cursor.fetchone()[0]:
+                    break
+                if time.monotonic() >= deadline:
+                    raise TimeoutError(
+                        f"Migration lock is held by another process for {timeout}s"
+                    )
+                time.sleep(interval)
+        try:
+            yield
+        finally:
+            with connection.cursor() as cursor:
+                cursor.execute("SELECT pg_advisory_unlock(%s)", [cls.LOCK_KEY])
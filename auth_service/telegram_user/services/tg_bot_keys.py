@@ -0,0 +1,81 @@
+import hashlib
+import hmac
+import logging
+
+from django.conf import settings
+from django.core.exceptions import ImproperlyConfigured
+from django.core.signals import setting_changed
+from django.dispatch import receiver
+
+logger = logging.getLogger("telegram_user")
+
+
+class TelegramBotKeyRegistry:
+    """
+    Реестр секретных ключей для проверки WebAppInitData.
+    Ключ HMAC("WebAppData", bot_token) вычисляется один раз при загрузке,
+    а не на каждый запрос. Поддерживает несколько ботов, ключ выбирается по bot_id.
+    """
+
+    _keys: dict[int, bytes] | None = None
+    _all_keys: tuple[bytes, ...] = ()
+
+    @staticmethod
+    def derive_secret_key(bot_token: str) -> bytes:
+        """Вычисляет секретный ключ для проверки хэша WebAppInitData."""
+        return hmac.new(
+            key=b"WebAppData", msg=bot_token.encode(), digestmod=hashlib.sha256
+        ).digest()
+
+    @staticmethod
+    def parse_bot_id(bot_token: str) -> int:
+        """Извлекает bot_id из токена вида '<bot_id>:<secret>'."""
+        bot_id, sep, secret = bot_token.partition(":")
+        if not sep or not secret or not bot_id.isdigit():
+            raise ImproperlyConfigured("Invalid BOT_TOKEN format")
+        return int(bot_id)
+
+    @classmethod
+    def load(cls, bot_tokens: list[str] | None = None) -> None:
+        """(Пере)загружает реестр из переданных токенов или TELEGRAM_BOT_TOKENS."""
+        if bot_tokens is None:
+            bot_tokens = getattr(settings, "TELEGRAM_BOT_TOKENS", [])
+
+        keys = {
+            cls.parse_bot_id(token): cls.derive_secret_key(token)
+            for token in bot_tokens
+        }
+        cls._all_keys = tuple(keys.values())
+        cls._keys = keys
+
+        if not keys:
+            logger.critical("BOT_TOKEN is not configured")
+
+    @classmethod
+    def secret_keys(cls, bot_id: int | None = None) -> tuple[bytes, ...]:
+        """
+        Возвращает секретные ключи для проверки хэша.
+        Если bot_id указан - только ключ этого бота, иначе ключи всех ботов.
+        """
+        if cls._keys is None:
+            cls.load()
+
+        if bot_id is None:
+            return cls._all_keys
+        if (key := cls._keys.get(bot_id)) is None:
+            return ()
+        return (key,)
+
+    @classmethod
+    def bot_ids(cls) -> tuple[int, ...]:
+        """Возвращает идентификаторы всех настроенных ботов."""
+        if cls._keys is None:
+            cls.load()
+        return tuple(cls._keys)
+
+
+@receiver(setting_changed)
+def reload_bot_keys(*, setting, **kwargs):
+    """Перезагружает реестр при изменении TELEGRAM_BOT_TOKENS (например, в тестах)."""
+    if setting == "TELEGRAM_BOT_TOKENS":
+        TelegramBotKeyRegistry.load()
@@ -1,97 +1,146 @@
 import hashlib
 import hmac
 import json
-import logging
-import os
-from datetime import datetime, timedelta
-from urllib.parse import parse_qs
+import time
+from datetime import timedelta
+from urllib.parse import unquote_plus
 
 from django.core.exceptions import ValidationError
-from dotenv import load_dotenv
 
-load_dotenv()
-logger = logging.getLogger("telegram_user")
+from ..metrics import Metrics
+from .tg_bot_keys import TelegramBotKeyRegistry
 
 
 class TelegramDataParser:
-    """Класс для валидации и парсинга данных WebAppInitData из Telegram Mini App."""
+    """
+    Класс для валидации и парсинга данных WebAppInitData из Telegram Mini App.
+    Ошибки не логируются: о неудачном входе один раз сообщает вызывающий сервис.
+    """
 
     INITDATA_MAX_AGE = timedelta(hours=1)
+    INITDATA_MAX_LENGTH = 4096
+    INITDATA_FIELDS = frozenset(
+        {
+            "query_id",
+            "user",
+            "receiver",
+            "chat",
+            "chat_type",
+            "chat_instance",
+            "start_param",
+            "can_send_after",
+            "auth_date",
+            "hash",
+            "signature",
+        }
+    )
 
     @classmethod
-    def _check_hash(cls, parsedData: dict, bot_token: str) -> bool:
-        """Проверяет наличие и подлинность хэша в WebAppInitData Telegram Mini App."""
+    def _parse_fields(cls, initData: str) -> dict:
+        """
+        Разбирает строку WebAppInitData за один проход.
+        Отклоняет слишком длинные строки, неизвестные и повторяющиеся поля.
+        """
+        if len(initData) > cls.INITDATA_MAX_LENGTH:
+            raise ValidationError("initData is too long", code="too_long")
+
+        parsedData = {}
+        for pair in initData.split("&"):
+            key, sep, value = pair.partition("=")
+            if not sep:
+                raise ValueError(f"malformed pair {pair[:32]!r}")
+            if key not in cls.INITDATA_FIELDS:
+                raise ValidationError(
+                    f"Unknown field: {key[:32]!r}", code="unknown_field"
+                )
+            if key in parsedData:
+                raise ValidationError(f"Duplicate field: {key}", code="duplicate_field")
+            if not value:
+                # parse_qs отбрасывал пустые значения, сохраняем это поведение
+                continue
+            if "%" in value or "+" in value:
+                value = unquote_plus(value, errors="strict")
+            parsedData[key] = value
+
+        return parsedData
+
+    @classmethod
+    def _check_hash(cls, parsedData: dict, secret_keys: tuple[bytes, ...]) -> bool:
+        """
+        Проверяет наличие и подлинность хэша в WebAppInitData Telegram Mini App.
+        Строка для проверки собирается один раз, хэши сравниваются за постоянное время.
+        """
         try:
-            if "hash" not in parsedData.keys():
-                logger.error("WebAppInitData doesn't have a 'hash' field")
+            if "hash" not in parsedData:
                 raise KeyError("WebAppInitData doesn't have a 'hash' field")
 
-            received_hash = parsedData["hash"][0]
-            filtered_data = {k: v[0] for k, v in parsedData.items() if k != "hash"}
+            received_hash = parsedData["hash"]
+            if len(received_hash) != 64:
+                return False
+
             data_check_string = "\n".join(
-                f"{k}={v}" for k, v in sorted(filtered_data.items())
+                f"{k}={v}" for k, v in sorted(parsedData.items()) if k != "hash"
+            ).encode()
+
+            return any(
+                hmac.compare_digest(
+                    hmac.new(key, data_check_string, hashlib.sha256).hexdigest(),
+                    received_hash,
+                )
+                for key in secret_keys
             )
-
-            secret_key = hmac.new(
-                key=b"WebAppData", msg=bot_token.encode(), digestmod=hashlib.sha256
-            ).digest()
-
-            computed_hash = hmac.new(
-                key=secret_key, msg=data_check_string.encode(), digestmod=hashlib.sha256
-            ).hexdigest()
-
-            return computed_hash == received_hash
-        except (IndexError, AttributeError) as e:
-            logger.error(f"Invalid hash data format: {e}")
+        except (AttributeError, TypeError) as e:
             raise ValidationError(f"Invalid hash data format: {e}")
-        except (UnicodeEncodeError, TypeError) as e:
-            logger.error(f"Encoding error during hash validation: {e}")
+        except UnicodeEncodeError as e:
             raise ValidationError(f"Encoding error during hash validation: {e}")
 
     @classmethod
-    def _validate_and_parse(cls, initData: str) -> dict:
-        """Общая валидация WebAppInitData для всех методов парсинга."""
+    def _validate_and_parse(cls, initData: str, bot_id: int | None = None) -> dict:
+        """
+        Общая валидация WebAppInitData для всех методов парсинга.
+        Дешёвые проверки (размер, поля, auth_date) выполняются до вычисления HMAC.
+        Если bot_id не указан, хэш проверяется ключами всех настроенных ботов.
+        """
         try:
-            bot_token = os.getenv("BOT_TOKEN")
-            if not bot_token:
-                logger.critical("BOT_TOKEN is not configured")
-                raise ValidationError("BOT_TOKEN is not configured")
-
-            parsedData = parse_qs(initData)
-
-            auth_date = int(parsedData.get("auth_date")[0])
-            if (
-                datetime.now() - datetime.fromtimestamp(auth_date)
-                > cls.INITDATA_MAX_AGE
-            ):
-                logger.warning("initData is too old")
-                raise ValidationError("initData is too old")
-
-            if not cls._check_hash(parsedData, bot_token):
-                logger.warning("Invalid hash signature received")
-                raise ValidationError("Invalid hash signature")
+            secret_keys = TelegramBotKeyRegistry.secret_keys(bot_id)
+            if not secret_keys:
+                if bot_id is not None:
+                    raise ValidationError(
+                        f"Unknown bot_id: {bot_id}", code="unknown_bot"
+                    )
+                raise ValidationError(
+                    "BOT_TOKEN is not configured", code="not_configured"
+                )
+
+            parsedData = cls._parse_fields(initData)
+
+            auth_date = int(parsedData["auth_date"])
+            if time.time() - auth_date > cls.INITDATA_MAX_AGE.total_seconds():
+                raise ValidationError("initData is too old", code="expired")
+
+            with Metrics.timer("check_hash"):
+                valid = cls._check_hash(parsedData, secret_keys)
+            if not valid:
+                raise ValidationError("Invalid hash signature", code="invalid_hash")
 
             return parsedData
         except KeyError as e:
-            logger.error(f"Missing required field: {e}")
-            raise ValidationError(f"Missing required field: {e}")
+            raise ValidationError(f"Missing required field: {e}", code="missing_field")
         except ValueError as e:
-            logger.error(f"Invalid data format: {e}")
             raise ValidationError(f"Invalid data format: {e}")
-        except AttributeError as e:
-            logger.error(f"Invalid input data: {e}")
+        except (AttributeError, TypeError) as e:
             raise ValidationError(f"Invalid input data: {e}")
 
     @classmethod
-    def parse_userData(cls, initData: str) -> dict:
+    def parse_userData(cls, initData: str, bot_id: int | None = None) -> dict:
         """
         Парсит и валидирует WebAppUser Telegram Mini App.
         Возвращает словарь с данными о telegram пользователе.
         """
         try:
-            parsedData = cls._validate_and_parse(initData)
+            parsedData = cls._validate_and_parse(initData, bot_id)
 
-            userData = json.loads(parsedData["user"][0])
+            userData = json.loads(parsedData["user"])
 
             return {
                 "telegram_id": userData["id"],
@@ -100,11 +149,8 @@ class TelegramDataParser:
                 "username": userData.get("username", ""),
             }
         except json.JSONDecodeError as e:
-            logger.error(f"Invalid user data JSON: {e}")
             raise ValidationError(f"Invalid user data JSON: {e}")
-        except IndexError as e:
-            logger.error(f"Invalid user data format: {e}")
+        except (TypeError, AttributeError) as e:
             raise ValidationError(f"Invalid user data format: {e}")
         except KeyError as e:
-            logger.error(f"Missing required user field: {e}")
             raise ValidationError(f"Missing required user field: {e}")
@@ -0,0 +1,53 @@
+import hashlib
+import hmac
+import json
+import time
+from urllib.parse import quote
+
+from .tg_bot_keys import TelegramBotKeyRegistry
+
+
+class TelegramDataSigner:
+    """
+    Формирует подписанные строки WebAppInitData так же, как это делает Telegram.
+    Используется для тестов, бенчмарков и нагрузочного тестирования.
+    """
+
+    @classmethod
+    def sign(cls, fields: dict, bot_token: str) -> str:
+        """Подписывает поля initData токеном бота и возвращает строку initData."""
+        secret_key = TelegramBotKeyRegistry.derive_secret_key(bot_token)
+        data_check_string = "\n".join(f"{k}={v}" for k, v in sorted(fields.items()))
+        fields = dict(
+            fields,
+            hash=hmac.new(
+                secret_key, data_check_string.encode(), hashlib.sha256
+            ).hexdigest(),
+        )
+        return "&".join(f"{k}={quote(str(v), safe='')}" for k, v in fields.items())
+
+    @classmethod
+    def build_init_data(
+        cls,
+        bot_token: str,
+        telegram_id: int,
+        first_name: str = "",
+        last_name: str = "",
+        username: str = "",
+        auth_date: int | None = None,
+    ) -> str:
+        """Формирует подписанную initData для пользователя с указанными данными."""
+        user = {"id": telegram_id, "first_name": first_name}
+        if last_name:
+            user["last_name"] = last_name
+        if username:
+            user["username"] = username
+
+        return cls.sign(
+            {
+                "query_id": f"AAH{telegram_id}",
+                "user": json.dumps(user, separators=(",", ":"), ensure_ascii=False),
+                "auth_date": int(time.time()) if auth_date is None else auth_date,
+            },
+            bot_token,
+        )
@@ -1,13 +1,25 @@
+import asyncio
 import logging
+from contextlib import contextmanager
+from datetime import datetime
+from uuid import uuid4
 
+from asgiref.sync import sync_to_async
 from django.core.exceptions import ValidationError
 from django.db import DatabaseError, IntegrityError
 from rest_framework.exceptions import AuthenticationFailed
 from rest_framework_simplejwt.exceptions import InvalidToken, TokenError
-from rest_framework_simplejwt.tokens import RefreshToken
+from rest_framework_simplejwt.utils import datetime_from_epoch
 
-from ..models import TelegramUser
+from ..db_router import ReplicaRouter, primary_reads
+from ..metrics import Metrics
+from ..models import RefreshClaim, RefreshTokenRotation, TelegramUser
+from .jwt_keys import JWTKeyRing
+from .profile_buffer import ProfileWriteBuffer
 from .tg_parser import TelegramDataParser
+from .token_minter import TokenMinter
+from .tokens import TelegramRefreshToken
+from .user_cache import UserSummaryCache
 
 logger = logging.getLogger("telegram_user")
 
@@ -15,76 +27,360 @@ logger = logging.getLogger("telegram_user")
 class TelegramUserAuthService:
     """Класс для аутентификации Telegram пользователей и управления JWT токенами."""
 
-    @classmethod
-    def authenticate(cls, initData: str) -> tuple:
-        """Валидация initData и получение данных пользователя или его создание/изменение"""
+    @staticmethod
+    @contextmanager
+    def _authentication_errors(bot_id: int | None = None):
+        """
+        Преобразует ошибки входа в AuthenticationFailed и логирует их один раз.
+        Аргументы передаются строками, чтобы SamplingFilter узнавал повторы.
+        """
         try:
-            userData = TelegramDataParser.parse_userData(initData)
-
-            user, _ = TelegramUser.objects.update_or_create(
-                telegram_id=userData["telegram_id"],
-                defaults={
-                    "first_name": userData["first_name"],
-                    "last_name": userData["last_name"],
-                    "username": userData["username"],
-                },
-            )
-
-            tokens = cls._generate_jwt_token(user)
-
-            return (user, tokens)
+            yield
         except ValidationError as e:
-            logger.error(f"Telegram data validation failed: {e}")
-            raise AuthenticationFailed(f"Telegram data validation failed: {e}")
+            reason = "; ".join(e.messages)
+            Metrics.increment(
+                "auth_login_total", result=e.error_list[0].code or "invalid"
+            )
+            logger.warning(
+                "Login failed: %s",
+                reason,
+                extra={"event": "login_failed", "bot_id": bot_id},
+            )
+            raise AuthenticationFailed(f"Telegram data validation failed: {reason}")
         except IntegrityError as e:
-            logger.error(f"Database integrity error: {e}")
+            Metrics.increment("auth_login_total", result="db_error")
+            logger.error(
+                "Database integrity error: %s",
+                str(e),
+                extra={"event": "login_db_error", "bot_id": bot_id},
+            )
             raise AuthenticationFailed(f"Database integrity error: {e}")
         except DatabaseError as e:
-            logger.error(f"Database operation failed: {e}")
+            Metrics.increment("auth_login_total", result="db_error")
+            logger.error(
+                "Database operation failed: %s",
+                str(e),
+                extra={"event": "login_db_error", "bot_id": bot_id},
+            )
             raise AuthenticationFailed(f"Database operation failed: {e}")
 
+    @staticmethod
+    @contextmanager
+    def _refresh_errors():
+        """Преобразует ошибки обновления токенов в AuthenticationFailed и логирует их."""
+        try:
+            yield
+        except InvalidToken as e:
+            Metrics.increment("auth_refresh_total", result="invalid_token")
+            logger.warning(
+                "Invalid refresh token: %s", str(e), extra={"event": "refresh_failed"}
+            )
+            raise AuthenticationFailed("Invalid or expired refresh token")
+        except TelegramUser.DoesNotExist as e:
+            Metrics.increment("auth_refresh_total", result="user_not_found")
+            logger.warning(
+                "User not found: %s", str(e), extra={"event": "refresh_failed"}
+            )
+            raise AuthenticationFailed("User not found")
+        except TokenError as e:
+            Metrics.increment("auth_refresh_total", result="token_error")
+            logger.warning(
+                "Refresh token processing failed: %s",
+                str(e),
+                extra={"event": "refresh_failed"},
+            )
+            raise AuthenticationFailed("Token processing error")
+
+    @classmethod
+    def authenticate(cls, initData: str, bot_id: int | None = None) -> tuple:
+        """Валидация initData и получение данных пользователя или его создание/изменение"""
+        with cls._authentication_errors(bot_id):
+            userData = TelegramDataParser.parse_userData(initData, bot_id)
+
+            with Metrics.timer("upsert_profile"):
+                if ProfileWriteBuffer.enabled():
+                    user = cls._save_profile_write_behind(userData)
+                else:
+                    user = TelegramUser.objects.upsert_profile(**userData)
+            UserSummaryCache.set_user(user)
+
+            tokens = cls._generate_jwt_token(user)
+
+            Metrics.increment("auth_login_total", result="success")
+            return (user, tokens)
+
+    @classmethod
+    async def aauthenticate(cls, initData: str, bot_id: int | None = None) -> tuple:
+        """
+        Асинхронная версия authenticate для ASGI.
+        Проверка HMAC занимает микросекунды и выполняется прямо в цикле событий.
+        """
+        with cls._authentication_errors(bot_id):
+            userData = TelegramDataParser.parse_userData(initData, bot_id)
+
+            with Metrics.timer("upsert_profile"):
+                if ProfileWriteBuffer.enabled():
+                    user = await cls._asave_profile_write_behind(userData)
+                else:
+                    user = await TelegramUser.objects.aupsert_profile(**userData)
+            await UserSummaryCache.aset_user(user)
+
+            tokens = await cls._agenerate_jwt_token(user)
+
+            Metrics.increment("auth_login_total", result="success")
+            return (user, tokens)
+
+    @classmethod
+    def authenticate_batch(
+        cls, initDataList: list[str], bot_id: int | None = None
+    ) -> list[dict]:
+        """
+        Проверяет пачку initData и сохраняет профили всех валидных пользователей
+        одним bulk-запросом. Возвращает результат для каждого элемента в исходном порядке:
+        {"valid": True, "user": TelegramUser} или {"valid": False, "error": str}.
+        """
+        results, profiles = [], []
+        for initData in initDataList:
+            try:
+                userData = TelegramDataParser.parse_userData(initData, bot_id)
+            except ValidationError as e:
+                results.append({"valid": False, "error": "; ".join(e.messages)})
+                continue
+            profiles.append(userData)
+            results.append({"valid": True, "telegram_id": userData["telegram_id"]})
+
+        with cls._authentication_errors(bot_id):
+            users = {
+                user.telegram_id: user
+                for user in TelegramUser.objects.bulk_upsert_profiles(profiles)
+            }
+        for user in users.values():
+            UserSummaryCache.set_user(user)
+        for result in results:
+            if result["valid"]:
+                result["user"] = users[result.pop("telegram_id")]
+
+        logger.info(
+            "Batch verification: %d/%d valid",
+            len(profiles),
+            len(results),
+            extra={"event": "batch_verified", "bot_id": bot_id},
+        )
+        return results
+
+    @classmethod
+    def _save_profile_write_behind(cls, userData: dict) -> TelegramUser:
+        """
+        Новый пользователь создаётся сразу, изменения профиля существующего
+        пользователя откладываются в ProfileWriteBuffer.
+        """
+        user = TelegramUser.objects.filter(telegram_id=userData["telegram_id"]).first()
+        if user is None:
+            return TelegramUser.objects.upsert_profile(**userData)
+
+        if cls._apply_profile(user, userData):
+            ProfileWriteBuffer.add(userData)
+
+        return user
+
     @classmethod
-    def _generate_jwt_token(cls, user: TelegramUser) -> dict:
-        """Генерация JWT пары (access + refresh)"""
+    async def _asave_profile_write_behind(cls, userData: dict) -> TelegramUser:
+        """Асинхронная версия _save_profile_write_behind."""
+        user = await TelegramUser.objects.filter(
+            telegram_id=userData["telegram_id"]
+        ).afirst()
+        if user is None:
+            return await TelegramUser.objects.aupsert_profile(**userData)
+
+        if cls._apply_profile(user, userData):
+            # При переполнении буфер может сбрасываться синхронно
+            await sync_to_async(ProfileWriteBuffer.add)(userData)
+
+        return user
+
+    @staticmethod
+    def _apply_profile(user: TelegramUser, userData: dict) -> bool:
+        """Переносит профиль в объект пользователя. Возвращает True, если он изменился."""
+        changed = False
+        for field in TelegramUser.objects.PROFILE_FIELDS:
+            if getattr(user, field) != userData[field]:
+                setattr(user, field, userData[field])
+                changed = True
+        return changed
+
+    @classmethod
+    def _generate_jwt_token(cls, user: TelegramUser, family: str | None = None) -> dict:
+        """
+        Генерация JWT пары (access + refresh). Refresh-токен входит в семейство
+        family (новое при входе, прежнее при ротации).
+        """
         if not isinstance(user, TelegramUser):
-            logger.error(f"Expected TelegramUser, got {type(user)}")
+            logger.error("Expected TelegramUser, got %s", type(user))
             raise TypeError("user must be a TelegramUser")
 
-        refresh = RefreshToken()
+        with Metrics.timer("sign_tokens"):
+            return TokenMinter.mint_pair(
+                {"telegram_id": user.telegram_id},
+                refresh_claims={
+                    TelegramRefreshToken.family_claim: family or uuid4().hex
+                },
+            )
 
-        refresh.access_token["telegram_id"] = user.telegram_id
-        refresh["telegram_id"] = user.telegram_id
+    @classmethod
+    async def _agenerate_jwt_token(
+        cls, user: TelegramUser, family: str | None = None
+    ) -> dict:
+        """
+        Асинхронная генерация JWT пары.
+        Подпись HMAC (HS*) дешёвая и выполняется в цикле событий,
+        асимметричная подпись выносится в поток.
+        """
+        if not JWTKeyRing.asymmetric():
+            return cls._generate_jwt_token(user, family)
+        return await asyncio.to_thread(cls._generate_jwt_token, user, family)
 
-        return {"access": str(refresh.access_token), "refresh": str(refresh)}
+    @staticmethod
+    def _decode_refresh_token(
+        refresh_token: str,
+    ) -> tuple[str, str, int, datetime, int]:
+        """
+        Проверяет refresh-токен (в том числе отзыв его семейства) и возвращает
+        jti, семейство, telegram_id, срок действия и время выпуска (iat).
+        """
+        refresh = TelegramRefreshToken(refresh_token)
+        if refresh.token_type != "refresh":
+            raise InvalidToken("Invalid token type")
+        tg_id = refresh.get("telegram_id")
+        if not isinstance(tg_id, int):
+            raise InvalidToken(
+                f"Field 'telegram_id' expected a number but got {type(tg_id)}"
+            )
+        return (
+            refresh["jti"],
+            refresh.family,
+            tg_id,
+            datetime_from_epoch(refresh["exp"]),
+            refresh.get("iat"),
+        )
+
+    @staticmethod
+    def _reject_claim(claim: RefreshClaim, jti: str, family: str, tg_id: int) -> None:
+        """
+        Токен не захвачен. Токен отозванного семейства (отзыв в другом воркере,
+        ещё не попавший в его фильтр Блума) и токен без пользователя
+        не расходуются. Повторное предъявление токена означает, что он мог быть
+        украден: отзывается всё семейство, включая уже выданный ротацией токен.
+        """
+        if claim.revoked:
+            raise TokenError("Token is blacklisted")
+        if not claim.user_exists:
+            # Запись кэша могла остаться в других воркерах
+            UserSummaryCache.delete(tg_id)
+            raise TelegramUser.DoesNotExist(f"telegram_id={tg_id}")
+        TelegramRefreshToken.revoke_family(family)
+        Metrics.increment("auth_refresh_total", result="reused")
+        logger.warning(
+            "Refresh token reuse detected, token family revoked",
+            extra={
+                "event": "refresh_token_reuse",
+                "jti": jti,
+                "family": family,
+                "tg_id": tg_id,
+            },
+        )
+        raise AuthenticationFailed("Refresh token has already been used")
 
     @classmethod
     def refresh_user_token(cls, refresh_token: str) -> tuple:
-        try:
-            refresh = RefreshToken(refresh_token)
-            if refresh.token_type != "refresh":
-                raise InvalidToken("Invalid token type")
-            tg_id = refresh.get("telegram_id")
-            if not isinstance(tg_id, int):
-                raise InvalidToken(
-                    f"Field 'telegram_id' expected a number but got {type(tg_id)}"
+        """
+        Ротация refresh-токена. Использование jti фиксируется одним
+        INSERT ... ON CONFLICT DO NOTHING, поэтому из нескольких одновременных
+        запросов с одним токеном успешен только один, а повторное использование
+        отзывает семейство токена. Токен пользователя, которого нет на основной
+        БД, не захватывается (в том числе при попадании в кэш пользователей).
+        Отзыв семейства проверяется в том же запросе по таблице отзывов: фильтр
+        Блума при декодировании - только быстрый отрицательный ответ.
+        Пользователь читается с реплики, если токен выпущен не только что
+        (ReplicaRouter.recently_written).
+        """
+        with cls._refresh_errors():
+            with Metrics.timer("decode_refresh"):
+                jti, family, tg_id, expires_at, issued_at = cls._decode_refresh_token(
+                    refresh_token
                 )
 
-            user = TelegramUser.objects.get(telegram_id=tg_id)
+            with (
+                Metrics.timer("claim_refresh"),
+                primary_reads(ReplicaRouter.recently_written(issued_at)),
+            ):
+                user = UserSummaryCache.get_user(tg_id)
+                if user is not None:
+                    claim = RefreshTokenRotation.objects.claim(
+                        jti, tg_id, expires_at, family
+                    )
+                else:
+                    claim, user = RefreshTokenRotation.objects.claim_and_get_user(
+                        jti, tg_id, expires_at, family
+                    )
+                    if user is not None:
+                        UserSummaryCache.set_user(user)
 
-            refresh.blacklist()
+            if not claim.claimed:
+                cls._reject_claim(claim, jti, family, tg_id)
 
-            new_tokens = cls._generate_jwt_token(user)
+            new_tokens = cls._generate_jwt_token(user, family)
 
+            Metrics.increment("auth_refresh_total", result="success")
             return (user, new_tokens)
-        except InvalidToken as e:
-            logger.error(f"Invalid refresh token: {e}")
-            raise AuthenticationFailed("Invalid or expired refresh token")
-        except TelegramUser.DoesNotExist:
-            logger.error(f"User with telegram_id={tg_id} not found")
-            raise AuthenticationFailed("User not found")
-        except TokenError as e:
-            logger.error(f"Refresh token processing failed: {e}")
-            raise AuthenticationFailed("Token processing error")
+
+    @classmethod
+    async def arefresh_user_token(cls, refresh_token: str) -> tuple:
+        """
+        Асинхронная версия refresh_user_token для ASGI.
+        Проверка токена выполняется в потоке: хранилище отзывов может обращаться к БД.
+        """
+        with cls._refresh_errors():
+            with Metrics.timer("decode_refresh"):
+                jti, family, tg_id, expires_at, issued_at = await sync_to_async(
+                    cls._decode_refresh_token
+                )(refresh_token)
+
+            with (
+                Metrics.timer("claim_refresh"),
+                primary_reads(ReplicaRouter.recently_written(issued_at)),
+            ):
+                user = await UserSummaryCache.aget_user(tg_id)
+                if user is not None:
+                    claim = await RefreshTokenRotation.objects.aclaim(
+                        jti, tg_id, expires_at, family
+                    )
+                else:
+                    claim, user = (
+                        await RefreshTokenRotation.objects.aclaim_and_get_user(
+                            jti, tg_id, expires_at, family
+                        )
+                    )
+                    if user is not None:
+                        await UserSummaryCache.aset_user(user)
+
+            if not claim.claimed:
+                await sync_to_async(cls._reject_claim)(claim, jti, family, tg_id)
+
+            new_tokens = await cls._agenerate_jwt_token(user, family)
+
+            Metrics.increment("auth_refresh_total", result="success")
+            return (user, new_tokens)
+
+    @classmethod
+    def logout(cls, refresh_token: str) -> None:
+        """Выход: отзывает семейство refresh-токена, ротация его токенов больше невозможна."""
+        with cls._refresh_errors():
+            _, family, tg_id, _, _ = cls._decode_refresh_token(refresh_token)
+            TelegramRefreshToken.revoke_family(family)
+            logger.info(
+                "Refresh token family revoked on logout",
+                extra={"event": "logout", "family": family, "tg_id": tg_id},
+            )
 
 
 # @classmethod
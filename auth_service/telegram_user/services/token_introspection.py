@@ -0,0 +1,105 @@
+import hashlib
+import logging
+import threading
+import time
+from collections import OrderedDict
+
+from django.conf import settings
+from django.core.signals import setting_changed
+from django.dispatch import receiver
+from rest_framework_simplejwt.exceptions import TokenError
+
+from ..metrics import Metrics
+from .tokens import TelegramAccessToken
+
+logger = logging.getLogger("telegram_user")
+
+INTROSPECTED_CLAIMS = ("token_type", "telegram_id", "exp", "iat", "jti")
+
+
+class TokenIntrospector:
+    """
+    Проверка access-токенов для сервисов, которые не проверяют JWT сами.
+    Проверенные claims хранятся в LRU по SHA-256 токена до истечения exp,
+    поэтому повторная проверка того же токена обходится без проверки подписи.
+    Невалидные токены не кэшируются.
+    """
+
+    _cache: OrderedDict[bytes, dict] = OrderedDict()
+    _lock = threading.Lock()
+    hits = 0
+    misses = 0
+
+    @staticmethod
+    def _digest(token: str) -> bytes:
+        return hashlib.sha256(token.encode()).digest()
+
+    @classmethod
+    def _get(cls, digest: bytes) -> dict | None:
+        with cls._lock:
+            claims = cls._cache.get(digest)
+            if claims is None:
+                cls.misses += 1
+                return None
+            cls.hits += 1
+            if claims["exp"] <= time.time():
+                # Истёкший токен больше не понадобится, подпись проверять не нужно
+                del cls._cache[digest]
+            else:
+                cls._cache.move_to_end(digest)
+            return claims
+
+    @classmethod
+    def _set(cls, digest: bytes, claims: dict) -> None:
+        max_size = settings.TELEGRAM_USER_INTROSPECTION_CACHE_SIZE
+        with cls._lock:
+            cls._cache[digest] = claims
+            cls._cache.move_to_end(digest)
+            while len(cls._cache) > max_size:
+                cls._cache.popitem(last=False)
+
+    @classmethod
+    def introspect(cls, token: str) -> dict:
+        """Возвращает {"active": True, claims...} или {"active": False}."""
+        digest = cls._digest(token)
+        if (claims := cls._get(digest)) is not None:
+            Metrics.increment("auth_introspection_cache_total", result="hit")
+            if claims["exp"] <= time.time():
+                return {"active": False}
+            return {"active": True, **claims}
+
+        Metrics.increment("auth_introspection_cache_total", result="miss")
+        try:
+            access = TelegramAccessToken(token)
+        except TokenError as e:
+            logger.info("Introspected token is inactive: %s", str(e))
+            return {"active": False}
+        if not isinstance(access.get("telegram_id"), int):
+            logger.info("Introspected token has no telegram_id")
+            return {"active": False}
+
+        claims = {claim: access[claim] for claim in INTROSPECTED_CLAIMS}
+        cls._set(digest, claims)
+        return {"active": True, **claims}
+
+    @classmethod
+    def stats(cls) -> dict:
+        with cls._lock:
+            return {"hits": cls.hits, "misses": cls.misses, "size": len(cls._cache)}
+
+    @classmethod
+    def clear(cls) -> None:
+        with cls._lock:
+            cls._cache.clear()
+            cls.hits = cls.misses = 0
+
+
+@receiver(setting_changed)
+def reset_introspection_cache(*, setting, **kwargs):
+    # Смена ключей подписи может сделать закэшированные токены невалидными
+    if setting in (
+        "TELEGRAM_USER_JWT_KEYS",
+        "SIMPLE_JWT",
+        "TELEGRAM_USER_INTROSPECTION_CACHE_SIZE",
+    ):
+        TokenIntrospector.clear()
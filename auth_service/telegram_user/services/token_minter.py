@@ -0,0 +1,121 @@
+import json
+from datetime import timedelta
+from typing import NamedTuple
+from uuid import uuid4
+
+import jwt
+from jwt.algorithms import Algorithm
+from jwt.utils import base64url_encode
+from rest_framework_simplejwt import settings as simplejwt_settings
+from rest_framework_simplejwt.utils import aware_utcnow, datetime_to_epoch
+
+from .jwt_keys import JWTKeyRing, KeyRingTokenBackend
+
+
+class _MintingState(NamedTuple):
+    backend: KeyRingTokenBackend
+    header_segment: bytes
+    algorithm: Algorithm
+    key: object
+    access_lifetime: timedelta
+    refresh_lifetime: timedelta
+    type_claim: str
+    jti_claim: str
+
+
+class TokenMinter:
+    """
+    Выпуск пары access/refresh без объектов токенов simplejwt.
+    Обе полезные нагрузки строятся из одного набора claims, заголовок в base64
+    и подготовленный ключ подписи вычисляются один раз на бэкенд JWTKeyRing,
+    каждый токен подписывается ровно один раз. Результат побайтно совпадает
+    с str(RefreshToken) и str(refresh.access_token) при тех же claims.
+    """
+
+    _state: _MintingState | None = None
+
+    @classmethod
+    def _prepare(cls) -> _MintingState:
+        backend = JWTKeyRing.token_backend()
+        state = cls._state
+        if state is not None and state.backend is backend:
+            return state
+
+        # Заголовок и ключ - как в PyJWS.encode (typ, alg, kid; ключи сортируются)
+        header = {"typ": "JWT", "alg": backend.algorithm}
+        if backend.active_kid is not None:
+            header["kid"] = backend.active_kid
+            key = backend.private_key
+        else:
+            key = backend.prepared_signing_key
+        algorithm = jwt.PyJWS().get_algorithm_by_name(backend.algorithm)
+        api_settings = simplejwt_settings.api_settings
+
+        state = _MintingState(
+            backend=backend,
+            header_segment=base64url_encode(
+                json.dumps(
+                    header,
+                    separators=(",", ":"),
+                    cls=backend.json_encoder,
+                    sort_keys=True,
+                ).encode()
+            ),
+            algorithm=algorithm,
+            key=algorithm.prepare_key(key),
+            access_lifetime=api_settings.ACCESS_TOKEN_LIFETIME,
+            refresh_lifetime=api_settings.REFRESH_TOKEN_LIFETIME,
+            type_claim=api_settings.TOKEN_TYPE_CLAIM,
+            jti_claim=api_settings.JTI_CLAIM,
+        )
+        cls._state = state
+        return state
+
+    @staticmethod
+    def _sign(state: _MintingState, payload: dict) -> str:
+        if state.backend.audience is not None:
+            payload["aud"] = state.backend.audience
+        if state.backend.issuer is not None:
+            payload["iss"] = state.backend.issuer
+        signing_input = (
+            state.header_segment
+            + b"."
+            + base64url_encode(
+                json.dumps(
+                    payload, separators=(",", ":"), cls=state.backend.json_encoder
+                ).encode()
+            )
+        )
+        signature = state.algorithm.sign(signing_input, state.key)
+        return (signing_input + b"." + base64url_encode(signature)).decode()
+
+    @classmethod
+    def mint_pair(cls, claims: dict, refresh_claims: dict | None = None) -> dict:
+        """
+        Выпускает пару токенов с дополнительными claims; refresh_claims
+        добавляются только в refresh-токен.
+        Порядок claims как у simplejwt: token_type, exp, iat, jti, затем claims.
+        """
+        state = cls._prepare()
+        now = aware_utcnow()
+        iat = datetime_to_epoch(now)
+
+        access = {
+            state.type_claim: "access",
+            "exp": datetime_to_epoch(now + state.access_lifetime),
+            "iat": iat,
+            state.jti_claim: uuid4().hex,
+            **claims,
+        }
+        refresh = {
+            state.type_claim: "refresh",
+            "exp": datetime_to_epoch(now + state.refresh_lifetime),
+            "iat": iat,
+            state.jti_claim: uuid4().hex,
+            **claims,
+            **(refresh_claims or {}),
+        }
+        return {
+            "access": cls._sign(state, access),
+            "refresh": cls._sign(state, refresh),
+        }
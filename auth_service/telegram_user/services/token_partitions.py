@@ -0,0 +1,202 @@
+import logging
+import re
+from datetime import UTC, date, datetime, time, timedelta
+from time import sleep
+
+from django.db import OperationalError, transaction
+
+logger = logging.getLogger("telegram_user")
+
+
+class TokenPartitionManager:
+    """
+    Управление дневными секциями таблиц токенов, секционированных по expires_at.
+    Секция <table>_pYYYYMMDD содержит токены, истекающие в этот день (UTC),
+    строки вне созданных секций попадают в секцию <table>_default.
+    """
+
+    PARTITION_RE = re.compile(r"_p(\d{8})$")
+    # Ожидание ACCESS EXCLUSIVE на родительскую таблицу при DETACH: дольше
+    # ждать нельзя, за ожидающим DETACH в очередь встают все запросы ротации
+    DETACH_LOCK_TIMEOUT_MS = 200
+    DETACH_ATTEMPTS = 10
+    DETACH_RETRY_DELAY = 1.0
+
+    @staticmethod
+    def is_partitioned(connection, table: str) -> bool:
+        if connection.vendor != "postgresql":
+            return False
+        with connection.cursor() as cursor:
+            cursor.execute(
+                "SELECT 1 FROM pg_partitioned_table WHERE partrelid = to_regclass(%s)",
+                [table],
+            )
+            return cursor.fetchone() is not None
+
+    @staticmethod
+    def has_default_partition(connection, table: str) -> bool:
+        with connection.cursor() as cursor:
+            cursor.execute(
+                "SELECT partdefid <> 0 FROM pg_partitioned_table "
+                "WHERE partrelid = to_regclass(%s)",
+                [table],
+            )
+            row = cursor.fetchone()
+            return row is not None and row[0]
+
+    @staticmethod
+    def partition_name(table: str, day: date) -> str:
+        return f"{table}_p{day:%Y%m%d}"
+
+    @staticmethod
+    def _day_start(day: date) -> datetime:
+        return datetime.combine(day, time.min, tzinfo=UTC)
+
+    @classmethod
+    def partitions(cls, connection, table: str) -> dict[date, str]:
+        """Возвращает дневные секции таблицы: {день: имя секции}."""
+        with connection.cursor() as cursor:
+            cursor.execute(
+                """
+                SELECT c.relname
+                FROM pg_inherits i JOIN pg_class c ON c.oid = i.inhrelid
+                WHERE i.inhparent = to_regclass(%s)
+                """,
+                [table],
+            )
+            names = [row[0] for row in cursor.fetchall()]
+
+        partitions = {}
+        for name in names:
+            if match := cls.PARTITION_RE.search(name):
+                partitions[datetime.strptime(match[1], "%Y%m%d").date()] = name
+        return partitions
+
+    @classmethod
+    def ensure_partitions(
+        cls, connection, table: str, start: date, days: int
+    ) -> list[str]:
+        """
+        Создаёт недостающие секции на days дней начиная со start.
+        Строки этих дней, уже попавшие в секцию по умолчанию, переносятся в новую секцию.
+        """
+        existing = cls.partitions(connection, table)
+        qn = connection.ops.quote_name
+        created = []
+        for offset in range(days):
+            day = start + timedelta(days=offset)
+            if day in existing:
+                continue
+            name = cls.partition_name(table, day)
+            bounds = [cls._day_start(day), cls._day_start(day + timedelta(days=1))]
+            with (
+                transaction.atomic(using=connection.alias),
+                connection.cursor() as cursor,
+            ):
+                cursor.execute(
+                    f"CREATE TABLE {qn(name)} "
+                    f"(LIKE {qn(table)} INCLUDING DEFAULTS INCLUDING CONSTRAINTS)"
+                )
+                cursor.execute(
+                    f"""
+                    WITH moved AS (
+                        DELETE FROM {qn(table + "_default")}
+                        WHERE {qn("expires_at")} >= %s AND {qn("expires_at")} < %s
+                        RETURNING *
+                    )
+                    INSERT INTO {qn(name)} SELECT * FROM moved
+                    """,
+                    bounds,
+                )
+                cursor.execute(
+                    f"ALTER TABLE {qn(table)} ATTACH PARTITION {qn(name)} "
+                    f"FOR VALUES FROM (%s) TO (%s)",
+                    bounds,
+                )
+            created.append(name)
+            logger.info("Created partition %s", name)
+        return created
+
+    @staticmethod
+    def delete_expired_default(
+        connection, table: str, now: datetime, limit: int
+    ) -> int:
+        """
+        Удаляет до limit истёкших строк из секции по умолчанию. Дневные секции
+        не затрагиваются: истёкшие удаляются целиком drop_expired_partitions.
+        """
+        qn = connection.ops.quote_name
+        default = qn(table + "_default")
+        with connection.cursor() as cursor:
+            cursor.execute(
+                f"""
+                DELETE FROM {default} WHERE ctid IN (
+                    SELECT ctid FROM {default} WHERE {qn("expires_at")} <= %s LIMIT %s
+                )
+                """,
+                [now, limit],
+            )
+            return cursor.rowcount
+
+    @classmethod
+    def detach_partition(cls, connection, table: str, name: str) -> bool:
+        """
+        Отсоединяет секцию, не блокируя запросы к родительской таблице надолго.
+        Без секции по умолчанию - DETACH ... CONCURRENTLY (вне транзакции).
+        С ней PostgreSQL разрешает только обычный DETACH под ACCESS EXCLUSIVE:
+        ожидание блокировки ограничено lock_timeout и повторяется.
+        Возвращает False, если блокировку получить не удалось.
+        """
+        qn = connection.ops.quote_name
+        detach = f"ALTER TABLE {qn(table)} DETACH PARTITION {qn(name)}"
+        if not (
+            connection.in_atomic_block or cls.has_default_partition(connection, table)
+        ):
+            with connection.cursor() as cursor:
+                cursor.execute(f"{detach} CONCURRENTLY")
+            return True
+
+        for attempt in range(cls.DETACH_ATTEMPTS):
+            if attempt:
+                sleep(cls.DETACH_RETRY_DELAY)
+            try:
+                with (
+                    transaction.atomic(using=connection.alias),
+                    connection.cursor() as cursor,
+                ):
+                    cursor.execute(
+                        f"SET LOCAL lock_timeout = {int(cls.DETACH_LOCK_TIMEOUT_MS)}"
+                    )
+                    cursor.execute(detach)
+                return True
+            except OperationalError as e:
+                logger.info("Partition %s is busy, retrying detach: %s", name, e)
+        return False
+
+    @classmethod
+    def drop_expired_partitions(
+        cls, connection, table: str, now: datetime
+    ) -> list[str]:
+        """
+        Удаляет секции, все токены в которых истекли к моменту now. Секция
+        сначала отсоединяется (detach_partition): DROP присоединённой секции
+        держал бы ACCESS EXCLUSIVE на родительской таблице и останавливал refresh.
+        Секция, которую не удалось отсоединить, остаётся до следующего запуска.
+        """
+        qn = connection.ops.quote_name
+        dropped = []
+        for day, name in sorted(cls.partitions(connection, table).items()):
+            if cls._day_start(day + timedelta(days=1)) > now:
+                break
+            if not cls.detach_partition(connection, table, name):
+                logger.warning(
+                    "Partition %s is still locked, it will be dropped by the next run",
+                    name,
+                    extra={"event": "partition_detach_failed"},
+                )
+                continue
+            with connection.cursor() as cursor:
+                cursor.execute(f"DROP TABLE {qn(name)}")
+            dropped.append(name)
+            logger.info("Dropped expired partition %s", name)
+        return dropped
@@ -0,0 +1,55 @@
+from django.utils.translation import gettext_lazy as _
+from rest_framework_simplejwt.exceptions import TokenError
+from rest_framework_simplejwt.settings import api_settings
+from rest_framework_simplejwt.tokens import AccessToken, RefreshToken
+from rest_framework_simplejwt.utils import aware_utcnow, datetime_to_epoch
+
+from .jwt_keys import JWTKeyRing
+from .revocation import RevocationStore
+
+
+class TelegramAccessToken(AccessToken):
+    """Access-токен, подписываемый и проверяемый ключами JWTKeyRing."""
+
+    @property
+    def token_backend(self):
+        return JWTKeyRing.token_backend()
+
+
+class TelegramRefreshToken(RefreshToken):
+    """
+    Refresh-токен, проверяемый по RevocationStore. Отзывается не отдельный jti,
+    а семейство (claim fam): все refresh-токены, полученные ротацией от одного
+    входа. Подписывается и проверяется ключами JWTKeyRing.
+    """
+
+    access_token_class = TelegramAccessToken
+    family_claim = "fam"
+
+    @property
+    def token_backend(self):
+        return JWTKeyRing.token_backend()
+
+    @property
+    def family(self) -> str:
+        """Семейство токена; у токенов без fam семейство - собственный jti."""
+        return (
+            self.payload.get(self.family_claim) or self.payload[api_settings.JTI_CLAIM]
+        )
+
+    @classmethod
+    def revoke_family(cls, family: str) -> None:
+        """
+        Отзывает семейство. Запись хранится срок жизни refresh-токена: все токены
+        семейства выпущены раньше и истекают не позже неё.
+        """
+        expires_at = aware_utcnow() + api_settings.REFRESH_TOKEN_LIFETIME
+        RevocationStore.revoke(family, datetime_to_epoch(expires_at))
+
+    def check_blacklist(self) -> None:
+        # exp записи отзыва не совпадает с exp токена, поиск идёт только по jti
+        if RevocationStore.is_revoked(self.family):
+            raise TokenError(_("Token is blacklisted"))
+
+    def blacklist(self) -> None:
+        self.revoke_family(self.family)
@@ -0,0 +1,290 @@
+import json
+import mmap
+import os
+import struct
+import tempfile
+import threading
+import time
+import zlib
+from collections import OrderedDict
+
+from django.conf import settings
+from django.core.cache import caches
+from django.core.signals import setting_changed
+from django.db.models.signals import post_delete
+from django.dispatch import receiver
+from django.utils.module_loading import import_string
+
+from ..models import TelegramUser
+
+SUMMARY_FIELDS = ("id", "telegram_id", "first_name", "last_name", "username")
+
+
+class BaseUserCacheBackend:
+    """Бэкенд кэша кратких данных пользователя."""
+
+    def get(self, telegram_id: int) -> dict | None:
+        raise NotImplementedError
+
+    def set(self, telegram_id: int, summary: dict) -> None:
+        raise NotImplementedError
+
+    def delete(self, telegram_id: int) -> None:
+        raise NotImplementedError
+
+    def clear(self) -> None:
+        raise NotImplementedError
+
+    # Локальные бэкенды не выполняют ввода-вывода и вызываются прямо из цикла событий
+    async def aget(self, telegram_id: int) -> dict | None:
+        return self.get(telegram_id)
+
+    async def aset(self, telegram_id: int, summary: dict) -> None:
+        self.set(telegram_id, summary)
+
+
+class LocMemLRUBackend(BaseUserCacheBackend):
+    """Кэш в памяти процесса: LRU с ограничением размера и TTL."""
+
+    def __init__(self, ttl: float, max_size: int):
+        self.ttl = ttl
+        self.max_size = max_size
+        self._data: OrderedDict[int, tuple[float, dict]] = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, telegram_id: int) -> dict | None:
+        with self._lock:
+            entry = self._data.get(telegram_id)
+            if entry is None:
+                return None
+            if entry[0] < time.monotonic():
+                del self._data[telegram_id]
+                return None
+            self._data.move_to_end(telegram_id)
+            return entry[1]
+
+    def set(self, telegram_id: int, summary: dict) -> None:
+        with self._lock:
+            self._data[telegram_id] = (time.monotonic() + self.ttl, summary)
+            self._data.move_to_end(telegram_id)
+            while len(self._data) > self.max_size:
+                self._data.popitem(last=False)
+
+    def delete(self, telegram_id: int) -> None:
+        with self._lock:
+            self._data.pop(telegram_id, None)
+
+    def clear(self) -> None:
+        with self._lock:
+            self._data.clear()
+
+
+class MmapBackend(BaseUserCacheBackend):
+    """
+    Общий для всех воркеров кэш в разделяемой памяти (mmap-файл, по умолчанию в /dev/shm).
+    Таблица фиксированного размера с прямой адресацией: слот = telegram_id % max_size,
+    коллизия вытесняет старую запись. Записи защищены CRC32, поэтому частично
+    записанный конкурентным воркером слот читается как промах, блокировки не нужны.
+    """
+
+    HEADER = struct.Struct("<qqdI")  # telegram_id, id, expires_at, crc32
+    FIELD_SIZE = 256
+    STRING_FIELDS = ("first_name", "last_name", "username")
+    SLOT_SIZE = HEADER.size + len(STRING_FIELDS) * (2 + FIELD_SIZE)
+
+    def __init__(self, ttl: float, max_size: int, path: str | None = None):
+        self.ttl = ttl
+        self.max_size = max_size
+        if path is None:
+            base = "/dev/shm" if os.path.isdir("/dev/shm") else tempfile.gettempdir()
+            path = os.path.join(base, "auth_service_user_cache")
+        self.path = path
+        self._mm: mmap.mmap | None = None
+        self._pid: int | None = None
+
+    def _map(self) -> mmap.mmap:
+        if self._mm is None or self._pid != os.getpid():
+            size = self.SLOT_SIZE * self.max_size
+            fd = os.open(self.path, os.O_RDWR | os.O_CREAT, 0o600)
+            try:
+                if os.fstat(fd).st_size < size:
+                    os.ftruncate(fd, size)
+                self._mm = mmap.mmap(fd, size)
+            finally:
+                os.close(fd)
+            self._pid = os.getpid()
+        return self._mm
+
+    def _offset(self, telegram_id: int) -> int:
+        return (telegram_id % self.max_size) * self.SLOT_SIZE
+
+    def get(self, telegram_id: int) -> dict | None:
+        mm = self._map()
+        offset = self._offset(telegram_id)
+        slot = mm[offset : offset + self.SLOT_SIZE]
+        cached_id, pk, expires_at, crc = self.HEADER.unpack_from(slot)
+        if cached_id != telegram_id or expires_at < time.time():
+            return None
+        body = slot[self.HEADER.size :]
+        if zlib.crc32(slot[:24] + body) != crc:
+            return None
+
+        summary = {"id": pk, "telegram_id": telegram_id}
+        for i, field in enumerate(self.STRING_FIELDS):
+            start = i * (2 + self.FIELD_SIZE)
+            (length,) = struct.unpack_from("<H", body, start)
+            summary[field] = (
+                None
+                if length == 0xFFFF
+                else body[start + 2 : start + 2 + length].decode()
+            )
+        return summary
+
+    def set(self, telegram_id: int, summary: dict) -> None:
+        body = bytearray(self.SLOT_SIZE - self.HEADER.size)
+        for i, field in enumerate(self.STRING_FIELDS):
+            start = i * (2 + self.FIELD_SIZE)
+            value = summary[field]
+            if value is None:
+                struct.pack_into("<H", body, start, 0xFFFF)
+                continue
+            encoded = value.encode()
+            if len(encoded) > self.FIELD_SIZE:
+                # Слишком длинные значения не кэшируем
+                self.delete(telegram_id)
+                return
+            struct.pack_into("<H", body, start, len(encoded))
+            body[start + 2 : start + 2 + len(encoded)] = encoded
+
+        fields = struct.pack("<qqd", telegram_id, summary["id"], time.time() + self.ttl)
+        header = fields + struct.pack("<I", zlib.crc32(fields + body))
+        offset = self._offset(telegram_id)
+        self._map()[offset : offset + self.SLOT_SIZE] = header + body
+
+    def delete(self, telegram_id: int) -> None:
+        offset = self._offset(telegram_id)
+        mm = self._map()
+        (cached_id,) = struct.unpack_from("<q", mm, offset)
+        if cached_id == telegram_id:
+            mm[offset : offset + self.HEADER.size] = bytes(self.HEADER.size)
+
+    def clear(self) -> None:
+        mm = self._map()
+        mm[:] = bytes(len(mm))
+
+
+class DjangoCacheBackend(BaseUserCacheBackend):
+    """Кэш через Django cache framework (Redis, Memcached и т.д.)."""
+
+    def __init__(self, ttl: float, max_size: int, alias: str = "default"):
+        self.ttl = ttl
+        # Размер ограничивается настройками самого кэша (MAX_ENTRIES, maxmemory)
+        self.max_size = max_size
+        self.alias = alias
+
+    @property
+    def cache(self):
+        return caches[self.alias]
+
+    @staticmethod
+    def _key(telegram_id: int) -> str:
+        return f"tguser:summary:{telegram_id}"
+
+    def get(self, telegram_id: int) -> dict | None:
+        value = self.cache.get(self._key(telegram_id))
+        return json.loads(value) if value is not None else None
+
+    def set(self, telegram_id: int, summary: dict) -> None:
+        self.cache.set(self._key(telegram_id), json.dumps(summary), self.ttl)
+
+    async def aget(self, telegram_id: int) -> dict | None:
+        value = await self.cache.aget(self._key(telegram_id))
+        return json.loads(value) if value is not None else None
+
+    async def aset(self, telegram_id: int, summary: dict) -> None:
+        await self.cache.aset(self._key(telegram_id), json.dumps(summary), self.ttl)
+
+    def delete(self, telegram_id: int) -> None:
+        self.cache.delete(self._key(telegram_id))
+
+    def clear(self) -> None:
+        # Очищает весь кэш alias: используйте отдельный alias для этого кэша
+        self.cache.clear()
+
+
+class UserSummaryCache:
+    """
+    Кэш кратких данных пользователя для пути обновления токенов.
+    Бэкенд задаётся в TELEGRAM_USER_CACHE, запись обновляется при каждом входе
+    и удаляется при удалении пользователя. Существование пользователя refresh
+    всё равно проверяет на основной БД при захвате jti.
+    """
+
+    BACKEND_ALIASES = {
+        "locmem": "telegram_user.services.user_cache.LocMemLRUBackend",
+        "mmap": "telegram_user.services.user_cache.MmapBackend",
+        "django": "telegram_user.services.user_cache.DjangoCacheBackend",
+    }
+
+    _backend = None
+
+    @classmethod
+    def backend(cls):
+        if cls._backend is None:
+            config = settings.TELEGRAM_USER_CACHE
+            backend = config["BACKEND"]
+            backend_class = import_string(cls.BACKEND_ALIASES.get(backend, backend))
+            cls._backend = backend_class(
+                ttl=config["TTL"],
+                max_size=config["MAX_SIZE"],
+                **config.get("OPTIONS", {}),
+            )
+        return cls._backend
+
+    @staticmethod
+    def _to_user(summary: dict | None) -> TelegramUser | None:
+        if summary is None:
+            return None
+        user = TelegramUser(**summary)
+        user._state.adding = False
+        return user
+
+    @staticmethod
+    def _to_summary(user: TelegramUser) -> dict:
+        return {field: getattr(user, field) for field in SUMMARY_FIELDS}
+
+    @classmethod
+    def get_user(cls, telegram_id: int) -> TelegramUser | None:
+        """Возвращает TelegramUser, собранный из кэша, или None при промахе."""
+        return cls._to_user(cls.backend().get(telegram_id))
+
+    @classmethod
+    async def aget_user(cls, telegram_id: int) -> TelegramUser | None:
+        return cls._to_user(await cls.backend().aget(telegram_id))
+
+    @classmethod
+    def set_user(cls, user: TelegramUser) -> None:
+        cls.backend().set(user.telegram_id, cls._to_summary(user))
+
+    @classmethod
+    async def aset_user(cls, user: TelegramUser) -> None:
+        await cls.backend().aset(user.telegram_id, cls._to_summary(user))
+
+    @classmethod
+    def delete(cls, telegram_id: int) -> None:
+        cls.backend().delete(telegram_id)
+
+    @classmethod
+    def clear(cls) -> None:
+        cls.backend().clear()
+
+
+@receiver(setting_changed)
+def reset_user_cache_backend(*, setting, **kwargs):
+    if setting == "TELEGRAM_USER_CACHE":
+        UserSummaryCache._backend = None
+
+
+@receiver(post_delete, sender=TelegramUser)
+def drop_deleted_user(*, instance, **kwargs):
+    UserSummaryCache.delete(instance.telegram_id)
@@ -9,12 +9,46 @@ def db_cleanup(request):
     if "django_db" in request.keywords:
         yield
         from telegram_user.models import TelegramUser
+        from telegram_user.services.user_cache import UserSummaryCache
 
         TelegramUser.objects.all().delete()
+        UserSummaryCache.clear()
     else:
         yield
 
 
+@pytest.fixture(autouse=True)
+def local_rate_limits(settings):
+    """Корзины rate limit в памяти процесса, новые для каждого теста"""
+    settings.TELEGRAM_USER_RATE_LIMIT = {
+        **settings.TELEGRAM_USER_RATE_LIMIT,
+        "BACKEND": "local",
+    }
+
+
+@pytest.fixture(autouse=True)
+def primary_only(request, settings):
+    """
+    Чтение с основной БД: тест с обычным django_db не может обращаться к
+    реплике. Тесты маршрутизации помечаются pytest.mark.replicas
+    """
+    if request.node.get_closest_marker("replicas") is None:
+        settings.TELEGRAM_USER_REPLICAS = {
+            **settings.TELEGRAM_USER_REPLICAS,
+            "ALIASES": [],
+        }
+
+
+@pytest.fixture(autouse=True)
+def metrics_dir(settings, tmp_path):
+    """Снимки метрик во временном каталоге, пустые для каждого теста"""
+    settings.TELEGRAM_USER_METRICS = {
+        **settings.TELEGRAM_USER_METRICS,
+        "DIR": str(tmp_path / "metrics"),
+    }
+    return tmp_path / "metrics"
+
+
 @pytest.fixture
 def valid_user_data():
     return {
@@ -1,8 +1,8 @@
-from datetime import datetime
 from unittest.mock import MagicMock
 from urllib.parse import parse_qs
 
 import pytest
+from telegram_user.services.tg_bot_keys import TelegramBotKeyRegistry
 
 # Fixtures
 
@@ -13,6 +13,19 @@ def bot_token():
     return "1234567890:FAKE_BOT_TOKEN"
 
 
+@pytest.fixture
+def secret_key(bot_token):
+    """Фикстура с секретным ключом, вычисленным из тестового Bot Token"""
+    return TelegramBotKeyRegistry.derive_secret_key(bot_token)
+
+
+@pytest.fixture
+def bot_registry(settings, bot_token):
+    """Фикстура, настраивающая реестр ключей на тестовый Bot Token"""
+    settings.TELEGRAM_BOT_TOKENS = [bot_token]
+    return TelegramBotKeyRegistry
+
+
 @pytest.fixture
 def valid_init_data():
     """Фикстура с тестовой строкой Telegram WebAppInitData"""
@@ -32,22 +45,20 @@ def valid_init_data():
 @pytest.fixture
 def parsed_valid_data(valid_init_data):
     """Фикстура с тестовой строкой Telegram WebAppInitData в виде словаря"""
-    return parse_qs(valid_init_data)
+    return {k: v[0] for k, v in parse_qs(valid_init_data).items()}
 
 
 @pytest.fixture
-def valid_datetime_mock():
+def valid_time_mock():
     """Фикстура с временем не позже часа от указанного в тестовой Telegram WebAppInitData"""
     mock = MagicMock()
-    mock.now.return_value = datetime.fromtimestamp(1752871138 + 1500)
-    mock.fromtimestamp.side_effect = datetime.fromtimestamp
+    mock.time.return_value = 1752871138 + 1500
     return mock
 
 
 @pytest.fixture
-def expired_datetime_mock():
+def expired_time_mock():
     """Фикстура с временем позже часа от указанного в тестовой Telegram WebAppInitData"""
     mock = MagicMock()
-    mock.now.return_value = datetime.fromtimestamp(1752871138 + 3601)
-    mock.fromtimestamp.side_effect = datetime.fromtimestamp
+    mock.time.return_value = 1752871138 + 3601
     return mock
@@ -0,0 +1,46 @@
+import pytest
+from django.db import connection
+from telegram_user.metrics import Metrics
+from telegram_user.models import TelegramUser
+from telegram_user.services.db_pools import DatabasePools
+
+pytestmark = pytest.mark.skipif(
+    not connection.settings_dict["OPTIONS"].get("pool"),
+    reason="database pool is disabled",
+)
+
+
+@pytest.mark.django_db
+def test_warm_up_opens_min_size_connections():
+    assert DatabasePools.warm_up() == []
+
+    stats = connection.pool.get_stats()
+    assert stats["pool_size"] >= connection.pool.min_size
+
+
+@pytest.mark.django_db
+def test_publish_metrics_reports_pool_state():
+    TelegramUser.objects.count()
+
+    Metrics.flush()
+    lines = Metrics.render().splitlines()
+
+    assert "# TYPE auth_db_pool_size gauge" in lines
+    assert f'auth_db_pool_max_size{{alias="default"}} {connection.pool.max_size}' in (
+        lines
+    )
+    assert any(
+        line.startswith('auth_db_pool_requests_total{alias="default"}')
+        for line in lines
+    )
+
+
+@pytest.mark.django_db(transaction=True)
+def test_close_all_closes_pool_and_next_query_reopens_it():
+    TelegramUser.objects.count()
+
+    DatabasePools.close_all()
+
+    assert DatabasePools._pool(connection) is None
+    assert TelegramUser.objects.count() == 0
+    assert DatabasePools._pool(connection) is not None
@@ -0,0 +1,112 @@
+import json
+
+import jwt
+import pytest
+from cryptography.hazmat.primitives import serialization
+from cryptography.hazmat.primitives.asymmetric import ec, ed25519
+from django.core.exceptions import ImproperlyConfigured
+from rest_framework_simplejwt.exceptions import TokenError
+from telegram_user.services.jwt_keys import JWTKeyRing
+from telegram_user.services.tg_user_auth import TelegramUserAuthService
+from telegram_user.services.tokens import TelegramAccessToken, TelegramRefreshToken
+
+pytestmark = pytest.mark.django_db
+
+
+def write_key(path, private_key, public_only=False):
+    if public_only:
+        pem = private_key.public_key().public_bytes(
+            serialization.Encoding.PEM,
+            serialization.PublicFormat.SubjectPublicKeyInfo,
+        )
+    else:
+        pem = private_key.private_bytes(
+            serialization.Encoding.PEM,
+            serialization.PrivateFormat.PKCS8,
+            serialization.NoEncryption(),
+        )
+    path.write_bytes(pem)
+    return str(path)
+
+
+@pytest.fixture
+def use_keys(settings):
+    def configure(algorithm, keys, active_kid=""):
+        settings.SIMPLE_JWT = {**settings.SIMPLE_JWT, "ALGORITHM": algorithm}
+        settings.TELEGRAM_USER_JWT_KEYS = {
+            **settings.TELEGRAM_USER_JWT_KEYS,
+            "ACTIVE_KID": active_kid,
+            "KEYS": keys,
+        }
+        return JWTKeyRing
+
+    return configure
+
+
+@pytest.mark.parametrize(
+    "algorithm, generate",
+    [
+        ("EdDSA", ed25519.Ed25519PrivateKey.generate),
+        ("ES256", lambda: ec.generate_private_key(ec.SECP256R1())),
+    ],
+)
+def test_tokens_verify_locally_with_jwks(
+    tmp_path, use_keys, valid_user_obj, algorithm, generate
+):
+    use_keys(algorithm, {"k1": write_key(tmp_path / "k1.pem", generate())})
+
+    tokens = TelegramUserAuthService._generate_jwt_token(valid_user_obj)
+
+    assert jwt.get_unverified_header(tokens["access"]) == {
+        "alg": algorithm,
+        "kid": "k1",
+        "typ": "JWT",
+    }
+    # Проверка так, как её выполняет сторонний сервис: только по опубликованному JWKS
+    (jwk,) = jwt.PyJWKSet.from_json(JWTKeyRing.jwks().decode()).keys
+    payload = jwt.decode(tokens["access"], jwk.key, algorithms=[algorithm])
+    assert payload["telegram_id"] == valid_user_obj.telegram_id
+    assert TelegramRefreshToken(tokens["refresh"])["telegram_id"] == (
+        valid_user_obj.telegram_id
+    )
+
+
+def test_overlapping_key_rotation(tmp_path, use_keys, valid_user_obj):
+    old = write_key(tmp_path / "old.pem", ed25519.Ed25519PrivateKey.generate())
+    new = write_key(tmp_path / "new.pem", ed25519.Ed25519PrivateKey.generate())
+
+    use_keys("EdDSA", {"old": old})
+    old_token = TelegramUserAuthService._generate_jwt_token(valid_user_obj)["access"]
+
+    # Новый ключ активен, старый ещё принимается и публикуется
+    use_keys("EdDSA", {"old": old, "new": new}, active_kid="new")
+    new_token = TelegramUserAuthService._generate_jwt_token(valid_user_obj)["access"]
+    assert jwt.get_unverified_header(new_token)["kid"] == "new"
+    assert TelegramAccessToken(old_token)["telegram_id"] == valid_user_obj.telegram_id
+    kids = {key["kid"] for key in json.loads(JWTKeyRing.jwks())["keys"]}
+    assert kids == {"old", "new"}
+
+    # Старый ключ удалён из набора: его токены больше не принимаются
+    use_keys("EdDSA", {"new": new})
+    with pytest.raises(TokenError):
+        TelegramAccessToken(old_token)
+
+
+def test_active_key_must_be_private(tmp_path, use_keys):
+    key = ed25519.Ed25519PrivateKey.generate()
+    ring = use_keys("EdDSA", {"k1": write_key(tmp_path / "k1.pem", key, True)})
+
+    with pytest.raises(ImproperlyConfigured):
+        ring.load()
+
+
+def test_key_type_must_match_algorithm(tmp_path, use_keys):
+    key = ed25519.Ed25519PrivateKey.generate()
+    ring = use_keys("ES256", {"k1": write_key(tmp_path / "k1.pem", key)})
+
+    with pytest.raises(ImproperlyConfigured):
+        ring.load()
+
+
+def test_hmac_publishes_no_keys():
+    assert json.loads(JWTKeyRing.jwks()) == {"keys": []}
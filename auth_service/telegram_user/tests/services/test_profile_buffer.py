@@ -0,0 +1,97 @@
+from unittest.mock import patch
+
+import pytest
+from telegram_user.models import TelegramUser
+from telegram_user.services.profile_buffer import ProfileWriteBuffer
+from telegram_user.services.tg_user_auth import TelegramUserAuthService
+
+
+@pytest.fixture
+def write_behind(settings):
+    """Фикстура с включённым write-behind без фонового потока сброса"""
+    settings.TELEGRAM_USER_WRITE_BEHIND = {
+        "ENABLED": True,
+        "FLUSH_INTERVAL": 0,
+        "MAX_SIZE": 3,
+    }
+    ProfileWriteBuffer._pid = None
+    yield ProfileWriteBuffer
+    ProfileWriteBuffer._pending = {}
+
+
+@pytest.mark.django_db
+class TestProfileWriteBuffer:
+
+    def test_flush_writes_batch_in_one_query(
+        self, write_behind, valid_user_data, django_assert_num_queries
+    ):
+        TelegramUser.objects.create(**valid_user_data)
+        ProfileWriteBuffer.add({**valid_user_data, "username": "first"})
+        ProfileWriteBuffer.add({**valid_user_data, "username": "second"})
+        ProfileWriteBuffer.add({**valid_user_data, "telegram_id": 1, "username": "x"})
+        assert ProfileWriteBuffer.pending() == 2
+
+        with django_assert_num_queries(1):
+            assert ProfileWriteBuffer.flush() == 2
+
+        assert ProfileWriteBuffer.pending() == 0
+        assert TelegramUser.objects.get(telegram_id=1).username == "x"
+        assert (
+            TelegramUser.objects.get(
+                telegram_id=valid_user_data["telegram_id"]
+            ).username
+            == "second"
+        )
+
+    def test_add_flushes_when_full(self, write_behind, valid_user_data):
+        for telegram_id in range(1, 4):
+            ProfileWriteBuffer.add({**valid_user_data, "telegram_id": telegram_id})
+
+        assert ProfileWriteBuffer.pending() == 0
+        assert TelegramUser.objects.filter(telegram_id__in=[1, 2, 3]).count() == 3
+
+    def test_authenticate_defers_profile_update(
+        self, write_behind, valid_user_data, valid_jwt_tokens
+    ):
+        TelegramUser.objects.create(**valid_user_data)
+        changed = {**valid_user_data, "username": "renamed"}
+
+        with (
+            patch(
+                "telegram_user.services.tg_parser.TelegramDataParser.parse_userData",
+                return_value=changed,
+            ),
+            patch(
+                "telegram_user.services.tg_user_auth.TelegramUserAuthService._generate_jwt_token",
+                return_value=valid_jwt_tokens,
+            ),
+        ):
+            user, _ = TelegramUserAuthService.authenticate("valid_initData")
+
+        assert user.username == "renamed"
+        assert ProfileWriteBuffer.pending() == 1
+        db_user = TelegramUser.objects.get(telegram_id=user.telegram_id)
+        assert db_user.username == valid_user_data["username"]
+
+        ProfileWriteBuffer.flush()
+        db_user.refresh_from_db()
+        assert db_user.username == "renamed"
+
+    def test_authenticate_creates_new_user_synchronously(
+        self, write_behind, valid_user_data, valid_jwt_tokens
+    ):
+        with (
+            patch(
+                "telegram_user.services.tg_parser.TelegramDataParser.parse_userData",
+                return_value=valid_user_data,
+            ),
+            patch(
+                "telegram_user.services.tg_user_auth.TelegramUserAuthService._generate_jwt_token",
+                return_value=valid_jwt_tokens,
+            ),
+        ):
+            user, _ = TelegramUserAuthService.authenticate("valid_initData")
+
+        assert user.pk is not None
+        assert ProfileWriteBuffer.pending() == 0
+        assert TelegramUser.objects.filter(telegram_id=user.telegram_id).exists()
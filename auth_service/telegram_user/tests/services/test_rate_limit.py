@@ -0,0 +1,79 @@
+from unittest.mock import patch
+
+import pytest
+from telegram_user.services.rate_limit import (
+    LocalRateLimitStore,
+    MmapRateLimitStore,
+    Rate,
+    RateLimiter,
+    take_token,
+)
+
+
+def test_rate_parse():
+    assert Rate.parse("10/s") == Rate(10, 10)
+    assert Rate.parse("30/m") == Rate(30, 0.5)
+    assert Rate.parse("3600/hour") == Rate(3600, 1)
+
+
+def test_take_token_refills_over_time():
+    rate = Rate(2, 1)
+    assert take_token(0, 100.0, rate, 100.25) == (0.25, 0.75)
+    assert take_token(0, 100.0, rate, 101.0) == (0, 0.0)
+    # Наполнение ограничено ёмкостью корзины
+    assert take_token(0, 100.0, rate, 200.0) == (1, 0.0)
+
+
+@pytest.fixture(params=["local", "mmap"])
+def make_store(request, tmp_path):
+    def make():
+        if request.param == "local":
+            return LocalRateLimitStore(max_keys=128)
+        return MmapRateLimitStore(max_keys=128, path=str(tmp_path / "buckets"))
+
+    return make
+
+
+def test_store_limits_each_key(make_store):
+    store, rate = make_store(), Rate.parse("3/m")
+
+    assert [store.consume("ip:1", rate) for _ in range(3)] == [0, 0, 0]
+    assert store.consume("ip:1", rate) == pytest.approx(20, abs=0.1)
+    assert store.consume("ip:2", rate) == 0
+
+
+def test_mmap_buckets_are_shared_between_workers(tmp_path):
+    path = str(tmp_path / "buckets")
+    first = MmapRateLimitStore(max_keys=128, path=path)
+    second = MmapRateLimitStore(max_keys=128, path=path)
+    rate = Rate.parse("2/m")
+
+    assert first.consume("ip:1", rate) == 0
+    assert second.consume("ip:1", rate) == 0
+    assert first.consume("ip:1", rate) > 0
+
+
+def test_local_store_is_bounded():
+    store, rate = LocalRateLimitStore(max_keys=2), Rate.parse("1/m")
+    for key in ("a", "b", "c"):
+        store.consume(key, rate)
+
+    # Вытесненная корзина "a" начинается заново
+    assert store.consume("a", rate) == 0
+    assert store.consume("c", rate) > 0
+
+
+def test_limiter_falls_back_to_local_buckets():
+    rate = Rate.parse("1/m")
+    with patch.object(
+        RateLimiter.store(), "consume", side_effect=OSError("store is down")
+    ):
+        assert RateLimiter.consume("ip:1", rate) == 0
+        assert RateLimiter.consume("ip:1", rate) > 0
+
+
+def test_check_returns_first_rejection():
+    rules = [("ip:1", Rate.parse("5/s")), ("path:/login/", Rate.parse("1/m"))]
+
+    assert RateLimiter.check(rules) == 0
+    assert RateLimiter.check(rules) == pytest.approx(60, abs=0.1)
@@ -0,0 +1,144 @@
+import time
+from unittest.mock import patch
+
+import pytest
+from asgiref.sync import async_to_sync
+from rest_framework.exceptions import AuthenticationFailed
+from telegram_user.models import RefreshTokenRotation, TelegramUser
+from telegram_user.services.revocation import (
+    BloomFilter,
+    DatabaseRevocationStore,
+    LocalRevocationStore,
+    RevocationStore,
+)
+from telegram_user.services.tg_user_auth import TelegramUserAuthService
+from telegram_user.services.tokens import TelegramRefreshToken
+
+
+@pytest.fixture
+def exp():
+    return int(time.time()) + 3600
+
+
+def test_bloom_filter_membership():
+    bloom = BloomFilter(capacity=1000, error_rate=0.01)
+    for i in range(1000):
+        bloom.add(f"jti-{i}")
+
+    assert all(f"jti-{i}" in bloom for i in range(1000))
+    false_positives = sum(f"other-{i}" in bloom for i in range(10000))
+    assert false_positives < 300
+
+
+def test_local_store_revoke(exp):
+    store = LocalRevocationStore(capacity=100, error_rate=0.01)
+
+    assert store.is_revoked("jti") is False
+    store.revoke("jti", exp)
+    assert store.is_revoked("jti") is True
+    store.revoke("expired", int(time.time()) - 1)
+    assert store.is_revoked("expired") is False
+
+
+@pytest.mark.django_db
+class TestDatabaseRevocationStore:
+
+    def test_not_revoked_skips_database_after_sync(
+        self, exp, django_assert_num_queries
+    ):
+        store = DatabaseRevocationStore(capacity=1000, error_rate=0.001)
+        store.revoke("revoked-jti", exp)
+
+        with django_assert_num_queries(1):
+            assert store.is_revoked("fresh-jti") is False
+        with django_assert_num_queries(0):
+            assert store.is_revoked("another-fresh-jti") is False
+        with django_assert_num_queries(1):
+            assert store.is_revoked("revoked-jti") is True
+
+    def test_sync_picks_up_other_workers_revocations(self, exp):
+        worker_a = DatabaseRevocationStore(capacity=1000, error_rate=0.001)
+        worker_b = DatabaseRevocationStore(
+            capacity=1000, error_rate=0.001, sync_interval=0
+        )
+        assert worker_b.is_revoked("jti") is False
+
+        worker_a.revoke("jti", exp)
+
+        assert worker_b.is_revoked("jti") is True
+
+
+@pytest.mark.django_db
+class TestRefreshTokenRevocation:
+
+    @pytest.fixture(params=["local", "database"])
+    def revocation_backend(self, request, settings):
+        settings.TELEGRAM_USER_REVOCATION = {
+            **settings.TELEGRAM_USER_REVOCATION,
+            "BACKEND": request.param,
+        }
+        return RevocationStore
+
+    def test_refresh_token_cannot_be_reused(
+        self, revocation_backend, valid_user_data, valid_jwt_tokens
+    ):
+        TelegramUser.objects.create(**valid_user_data)
+        token = TelegramRefreshToken()
+        token["telegram_id"] = valid_user_data["telegram_id"]
+
+        with patch(
+            "telegram_user.services.tg_user_auth.TelegramUserAuthService._generate_jwt_token",
+            return_value=valid_jwt_tokens,
+        ):
+            TelegramUserAuthService.refresh_user_token(str(token))
+            with pytest.raises(AuthenticationFailed):
+                TelegramUserAuthService.refresh_user_token(str(token))
+
+        assert RefreshTokenRotation.objects.filter(jti=token["jti"]).exists()
+        assert RevocationStore.is_revoked(token["jti"]) is True
+
+    def test_reuse_revokes_token_family(self, revocation_backend, valid_user_data):
+        user = TelegramUser.objects.create(**valid_user_data)
+        stolen = TelegramUserAuthService._generate_jwt_token(user)["refresh"]
+        _, rotated = TelegramUserAuthService.refresh_user_token(stolen)
+
+        with pytest.raises(AuthenticationFailed, match="already been used"):
+            TelegramUserAuthService.refresh_user_token(stolen)
+        with pytest.raises(AuthenticationFailed, match="Token processing error"):
+            TelegramUserAuthService.refresh_user_token(rotated["refresh"])
+
+        family = TelegramRefreshToken(rotated["refresh"], verify=False).family
+        assert family == TelegramRefreshToken(stolen, verify=False).family
+
+    def test_logout_revokes_token_family(self, revocation_backend, valid_user_data):
+        user = TelegramUser.objects.create(**valid_user_data)
+        tokens = TelegramUserAuthService._generate_jwt_token(user)
+        other_session = TelegramUserAuthService._generate_jwt_token(user)
+
+        TelegramUserAuthService.logout(tokens["refresh"])
+
+        with pytest.raises(AuthenticationFailed):
+            TelegramUserAuthService.refresh_user_token(tokens["refresh"])
+        TelegramUserAuthService.refresh_user_token(other_session["refresh"])
+
+    def test_revocation_by_other_worker_blocks_rotation(
+        self, valid_user_data, monkeypatch
+    ):
+        user = TelegramUser.objects.create(**valid_user_data)
+        tokens = TelegramUserAuthService._generate_jwt_token(user)
+        # Фильтр этого воркера синхронизирован до отзыва и долго не обновится
+        monkeypatch.setattr(RevocationStore.store(), "sync_interval", 3600)
+        assert not RevocationStore.is_revoked("unrelated")
+
+        # Выход в другом воркере
+        DatabaseRevocationStore(capacity=1000, error_rate=0.001).revoke(
+            TelegramRefreshToken(tokens["refresh"]).family, int(time.time()) + 86400
+        )
+
+        with pytest.raises(AuthenticationFailed, match="Token processing error"):
+            TelegramUserAuthService.refresh_user_token(tokens["refresh"])
+        with pytest.raises(AuthenticationFailed, match="Token processing error"):
+            async_to_sync(TelegramUserAuthService.arefresh_user_token)(
+                tokens["refresh"]
+            )
+        assert not RefreshTokenRotation.objects.exists()
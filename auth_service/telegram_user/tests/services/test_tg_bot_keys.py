@@ -0,0 +1,33 @@
+import hashlib
+import hmac
+
+import pytest
+from django.core.exceptions import ImproperlyConfigured
+from telegram_user.services.tg_bot_keys import TelegramBotKeyRegistry
+
+
+def test_derive_secret_key(bot_token):
+    expected = hmac.new(b"WebAppData", bot_token.encode(), hashlib.sha256).digest()
+    assert TelegramBotKeyRegistry.derive_secret_key(bot_token) == expected
+
+
+def test_secret_keys_by_bot_id(settings, bot_token, secret_key):
+    settings.TELEGRAM_BOT_TOKENS = [bot_token, "42:ANOTHER_BOT_TOKEN"]
+
+    assert TelegramBotKeyRegistry.bot_ids() == (1234567890, 42)
+    assert TelegramBotKeyRegistry.secret_keys(1234567890) == (secret_key,)
+    assert TelegramBotKeyRegistry.secret_keys(7) == ()
+    assert len(TelegramBotKeyRegistry.secret_keys()) == 2
+
+
+def test_load_replaces_keys(bot_registry, secret_key):
+    assert TelegramBotKeyRegistry.secret_keys() == (secret_key,)
+
+    TelegramBotKeyRegistry.load(["42:ANOTHER_BOT_TOKEN"])
+
+    assert TelegramBotKeyRegistry.bot_ids() == (42,)
+
+
+def test_load_invalid_token():
+    with pytest.raises(ImproperlyConfigured, match="Invalid BOT_TOKEN format"):
+        TelegramBotKeyRegistry.load(["not-a-bot-token"])
@@ -3,62 +3,120 @@ from unittest.mock import patch
 import pytest
 from django.core.exceptions import ValidationError
 from telegram_user.services.tg_parser import TelegramDataParser
+from telegram_user.services.tg_signer import TelegramDataSigner
 
 
-def test_check_hash_valid(parsed_valid_data, bot_token):
-    result = TelegramDataParser._check_hash(parsed_valid_data, bot_token)
+def test_check_hash_valid(parsed_valid_data, secret_key):
+    result = TelegramDataParser._check_hash(parsed_valid_data, (secret_key,))
     assert result is True
 
 
-def test_check_hash_invalid(parsed_valid_data, bot_token):
-    parsed_valid_data["hash"] = ["qwertyuiop123asdfghjkl456"]
-    result = TelegramDataParser._check_hash(parsed_valid_data, bot_token)
+def test_check_hash_invalid(parsed_valid_data, secret_key):
+    parsed_valid_data["hash"] = "qwertyuiop123asdfghjkl456"
+    result = TelegramDataParser._check_hash(parsed_valid_data, (secret_key,))
     assert result is False
 
 
-def test_check_hash_missing_hash(parsed_valid_data, bot_token):
+def test_check_hash_tampered(parsed_valid_data, secret_key):
+    parsed_valid_data["auth_date"] = "1752871139"
+    result = TelegramDataParser._check_hash(parsed_valid_data, (secret_key,))
+    assert result is False
+
+
+def test_check_hash_missing_hash(parsed_valid_data, secret_key):
     del parsed_valid_data["hash"]
     with pytest.raises(KeyError, match="WebAppInitData doesn't have a 'hash' field"):
-        TelegramDataParser._check_hash(parsed_valid_data, bot_token)
+        TelegramDataParser._check_hash(parsed_valid_data, (secret_key,))
 
 
 def test_validate_and_parse_valid(
-    valid_init_data, bot_token, parsed_valid_data, valid_datetime_mock
+    valid_init_data, bot_registry, parsed_valid_data, valid_time_mock
 ):
-    with patch("os.getenv", return_value=bot_token):
-        with patch("telegram_user.services.tg_parser.datetime", valid_datetime_mock):
-            with patch(
-                "telegram_user.services.tg_parser.TelegramDataParser._check_hash",
-                return_value=True,
-            ):
-                result = TelegramDataParser._validate_and_parse(valid_init_data)
-                assert result == parsed_valid_data
+    with patch("telegram_user.services.tg_parser.time", valid_time_mock):
+        result = TelegramDataParser._validate_and_parse(valid_init_data)
+        assert result == parsed_valid_data
 
 
-def test_validate_and_parse_no_bot_token(valid_init_data):
-    with patch("os.getenv", return_value=None):
-        with pytest.raises(ValidationError, match="BOT_TOKEN is not configured"):
+def test_validate_and_parse_selects_bot_key(
+    valid_init_data, bot_token, settings, parsed_valid_data, valid_time_mock
+):
+    settings.TELEGRAM_BOT_TOKENS = ["987654321:OTHER_BOT_TOKEN", bot_token]
+    with patch("telegram_user.services.tg_parser.time", valid_time_mock):
+        assert (
+            TelegramDataParser._validate_and_parse(valid_init_data, 1234567890)
+            == parsed_valid_data
+        )
+        assert TelegramDataParser._validate_and_parse(valid_init_data) == (
+            parsed_valid_data
+        )
+        with pytest.raises(ValidationError, match="Invalid hash signature"):
+            TelegramDataParser._validate_and_parse(valid_init_data, 987654321)
+
+
+def test_validate_and_parse_unknown_bot(valid_init_data, bot_registry):
+    with pytest.raises(ValidationError, match="Unknown bot_id: 42"):
+        TelegramDataParser._validate_and_parse(valid_init_data, 42)
+
+
+def test_validate_and_parse_no_bot_token(valid_init_data, settings):
+    settings.TELEGRAM_BOT_TOKENS = []
+    with pytest.raises(ValidationError, match="BOT_TOKEN is not configured"):
+        TelegramDataParser._validate_and_parse(valid_init_data)
+
+
+def test_validate_and_parse_old_date(valid_init_data, bot_registry, expired_time_mock):
+    with (
+        patch("telegram_user.services.tg_parser.time", expired_time_mock),
+        patch("telegram_user.services.tg_parser.hmac.new") as hmac_new,
+    ):
+        with pytest.raises(ValidationError, match="initData is too old"):
             TelegramDataParser._validate_and_parse(valid_init_data)
+        hmac_new.assert_not_called()
 
 
-def test_validate_and_parse_old_date(valid_init_data, bot_token, expired_datetime_mock):
-    with patch("os.getenv", return_value=bot_token):
-        with patch("telegram_user.services.tg_parser.datetime", expired_datetime_mock):
-            with pytest.raises(ValidationError, match="initData is too old"):
+def test_validate_and_parse_bad_hash(valid_init_data, bot_registry, valid_time_mock):
+    with patch(
+        "telegram_user.services.tg_parser.TelegramDataParser._check_hash",
+        return_value=False,
+    ):
+        with patch("telegram_user.services.tg_parser.time", valid_time_mock):
+            with pytest.raises(ValidationError, match="Invalid hash signature"):
                 TelegramDataParser._validate_and_parse(valid_init_data)
 
 
-def test_validate_and_parse_bad_hash(valid_init_data, bot_token, valid_datetime_mock):
-    with patch("os.getenv", return_value=bot_token):
-        with patch(
-            "telegram_user.services.tg_parser.TelegramDataParser._check_hash",
-            return_value=False,
-        ):
-            with patch(
-                "telegram_user.services.tg_parser.datetime", valid_datetime_mock
-            ):
-                with pytest.raises(ValidationError, match="Invalid hash signature"):
-                    TelegramDataParser._validate_and_parse(valid_init_data)
+@pytest.mark.parametrize(
+    "init_data, error",
+    [
+        ("a" * 5000, "initData is too long"),
+        ("auth_date=1752871138&evil=1&hash=00", "Unknown field: 'evil'"),
+        ("auth_date=1752871138&auth_date=1752871139", "Duplicate field: auth_date"),
+        ("auth_date&hash=00", "Invalid data format"),
+        ("user=%7B%7D&hash=00", "Missing required field: 'auth_date'"),
+    ],
+)
+def test_validate_and_parse_rejects_junk_before_hashing(
+    bot_registry, valid_time_mock, init_data, error
+):
+    with (
+        patch("telegram_user.services.tg_parser.time", valid_time_mock),
+        patch("telegram_user.services.tg_parser.hmac.new") as hmac_new,
+    ):
+        with pytest.raises(ValidationError, match=error):
+            TelegramDataParser._validate_and_parse(init_data)
+        hmac_new.assert_not_called()
+
+
+def test_parse_userData_signed(bot_token, bot_registry):
+    init_data = TelegramDataSigner.build_init_data(
+        bot_token, 42, first_name="Имя Фамилия", username="user+name"
+    )
+
+    assert TelegramDataParser.parse_userData(init_data) == {
+        "telegram_id": 42,
+        "first_name": "Имя Фамилия",
+        "last_name": "",
+        "username": "user+name",
+    }
 
 
 def test_parse_userData_valid(parsed_valid_data, valid_init_data, valid_user_data):
@@ -1,8 +1,14 @@
+from concurrent.futures import ThreadPoolExecutor
+from threading import Barrier
 from unittest.mock import patch
 
 import pytest
+from asgiref.sync import async_to_sync
+from django.db import connection
+from rest_framework.exceptions import AuthenticationFailed
 from rest_framework_simplejwt.tokens import AccessToken, RefreshToken
-from telegram_user.models import TelegramUser
+from telegram_user.models import RefreshTokenRotation, TelegramUser
+from telegram_user.services.tg_signer import TelegramDataSigner
 from telegram_user.services.tg_user_auth import TelegramUserAuthService
 
 
@@ -53,6 +59,53 @@ class TestTelegramUserAuthService:
                 db_user = TelegramUser.objects.get(telegram_id=user.telegram_id)
                 assert db_user.username == user.username
 
+    def test_authenticate_repeat_login_single_query(
+        self, valid_user_data, valid_jwt_tokens, django_assert_num_queries
+    ):
+        TelegramUser.objects.create(**valid_user_data)
+        with (
+            patch(
+                "telegram_user.services.tg_parser.TelegramDataParser.parse_userData",
+                return_value=valid_user_data,
+            ),
+            patch(
+                "telegram_user.services.tg_user_auth.TelegramUserAuthService._generate_jwt_token",
+                return_value=valid_jwt_tokens,
+            ),
+        ):
+            with django_assert_num_queries(1):
+                user, _ = TelegramUserAuthService.authenticate("valid_initData")
+
+            assert user.telegram_id == valid_user_data["telegram_id"]
+
+    # Tests for authenticate_batch method
+
+    def test_authenticate_batch(
+        self, bot_registry, bot_token, valid_user_data, django_assert_num_queries
+    ):
+        TelegramUser.objects.create(**valid_user_data)
+        telegram_id = valid_user_data["telegram_id"]
+        batch = [
+            TelegramDataSigner.build_init_data(bot_token, telegram_id, "Renamed"),
+            "auth_date=1&hash=invalid",
+            TelegramDataSigner.build_init_data(bot_token, 42, "New", username="new"),
+        ]
+
+        with django_assert_num_queries(1):
+            results = TelegramUserAuthService.authenticate_batch(batch)
+
+        assert [result["valid"] for result in results] == [True, False, True]
+        assert results[0]["user"].telegram_id == telegram_id
+        assert results[1]["error"] == "initData is too old"
+        assert results[2]["user"].username == "new"
+        assert TelegramUser.objects.get(telegram_id=telegram_id).first_name == "Renamed"
+        assert TelegramUser.objects.filter(telegram_id=42).exists()
+
+    def test_authenticate_batch_all_invalid(self, bot_registry):
+        results = TelegramUserAuthService.authenticate_batch(["auth_date=1&hash=x"])
+
+        assert results == [{"valid": False, "error": "initData is too old"}]
+
     # Tests for refresh_user_token method
 
     def test_refresh_user_token_success(self, valid_user_obj, valid_user_data):
@@ -74,3 +127,113 @@ class TestTelegramUserAuthService:
             assert user.telegram_id == valid_user_obj.telegram_id
             assert "access" in new_tokens
             assert "refresh" in new_tokens
+
+    def test_refresh_user_token_single_round_trip(
+        self, valid_user_data, valid_jwt_tokens, django_assert_num_queries, settings
+    ):
+        # Считается только захват jti: первая синхронизация фильтра отозванных
+        # токенов в хранилище database зависела бы от порядка тестов
+        settings.TELEGRAM_USER_REVOCATION = {
+            **settings.TELEGRAM_USER_REVOCATION,
+            "BACKEND": "local",
+        }
+        TelegramUser.objects.create(**valid_user_data)
+        token = RefreshToken()
+        token["telegram_id"] = valid_user_data["telegram_id"]
+
+        with (
+            patch(
+                "telegram_user.services.tg_user_auth.TelegramUserAuthService._generate_jwt_token",
+                return_value=valid_jwt_tokens,
+            ),
+            django_assert_num_queries(1),
+        ):
+            TelegramUserAuthService.refresh_user_token(str(token))
+
+    def test_refresh_user_token_reuse_rejected(self, valid_user_data):
+        TelegramUser.objects.create(**valid_user_data)
+        token = RefreshToken()
+        token["telegram_id"] = valid_user_data["telegram_id"]
+
+        TelegramUserAuthService.refresh_user_token(str(token))
+        with pytest.raises(AuthenticationFailed):
+            TelegramUserAuthService.refresh_user_token(str(token))
+
+    def test_refresh_user_token_unknown_user_keeps_token(self, valid_user_data):
+        token = RefreshToken()
+        token["telegram_id"] = valid_user_data["telegram_id"]
+
+        with pytest.raises(AuthenticationFailed, match="User not found"):
+            TelegramUserAuthService.refresh_user_token(str(token))
+
+        # Токен не израсходован: после появления пользователя refresh проходит
+        assert not RefreshTokenRotation.objects.exists()
+        TelegramUser.objects.create(**valid_user_data)
+        user, _ = TelegramUserAuthService.refresh_user_token(str(token))
+        assert user.telegram_id == valid_user_data["telegram_id"]
+
+
+@pytest.mark.django_db(transaction=True)
+def test_refresh_user_token_concurrent_reuse(valid_user_data, settings):
+    """Параллельные обновления одним токеном: успешно ровно одно"""
+    settings.TELEGRAM_USER_REVOCATION = {
+        **settings.TELEGRAM_USER_REVOCATION,
+        "BACKEND": "local",
+    }
+    TelegramUser.objects.create(**valid_user_data)
+    token = RefreshToken()
+    token["telegram_id"] = valid_user_data["telegram_id"]
+    workers = 8
+    barrier = Barrier(workers)
+
+    def refresh():
+        try:
+            barrier.wait()
+            TelegramUserAuthService.refresh_user_token(str(token))
+            return True
+        except AuthenticationFailed:
+            return False
+        finally:
+            connection.close()
+
+    with ThreadPoolExecutor(max_workers=workers) as pool:
+        results = list(pool.map(lambda _: refresh(), range(workers)))
+
+    assert results.count(True) == 1
+
+
+@pytest.mark.django_db
+class TestTelegramUserAuthServiceAsync:
+
+    def test_aauthenticate_success(self, valid_user_data):
+        with patch(
+            "telegram_user.services.tg_parser.TelegramDataParser.parse_userData",
+            return_value=valid_user_data,
+        ):
+            user, tokens = async_to_sync(TelegramUserAuthService.aauthenticate)(
+                "valid_initData"
+            )
+
+        assert user.telegram_id == valid_user_data["telegram_id"]
+        assert RefreshToken(tokens["refresh"])["telegram_id"] == user.telegram_id
+        assert TelegramUser.objects.filter(telegram_id=user.telegram_id).exists()
+
+    def test_arefresh_user_token_rotates_once(self, valid_user_data):
+        TelegramUser.objects.create(**valid_user_data)
+        token = RefreshToken()
+        token["telegram_id"] = valid_user_data["telegram_id"]
+        refresh = async_to_sync(TelegramUserAuthService.arefresh_user_token)
+
+        user, new_tokens = refresh(str(token))
+
+        assert user.telegram_id == valid_user_data["telegram_id"]
+        assert AccessToken(new_tokens["access"])["telegram_id"] == user.telegram_id
+        with pytest.raises(AuthenticationFailed):
+            refresh(str(token))
+
+    def test_arefresh_user_token_unknown_user(self):
+        token = RefreshToken()
+        token["telegram_id"] = 1
+
+        with pytest.raises(AuthenticationFailed, match="User not found"):
+            async_to_sync(TelegramUserAuthService.arefresh_user_token)(str(token))
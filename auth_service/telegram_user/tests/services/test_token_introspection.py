@@ -0,0 +1,70 @@
+from unittest.mock import patch
+
+import pytest
+from telegram_user.services.tg_user_auth import TelegramUserAuthService
+from telegram_user.services.token_introspection import TokenIntrospector
+from telegram_user.services.tokens import TelegramAccessToken
+
+pytestmark = pytest.mark.django_db
+
+
+@pytest.fixture(autouse=True)
+def clear_introspection_cache():
+    TokenIntrospector.clear()
+    yield
+    TokenIntrospector.clear()
+
+
+def test_repeated_introspection_skips_verification(valid_user_obj):
+    access = TelegramUserAuthService._generate_jwt_token(valid_user_obj)["access"]
+
+    first = TokenIntrospector.introspect(access)
+    with patch(
+        "telegram_user.services.token_introspection.TelegramAccessToken"
+    ) as token_class:
+        second = TokenIntrospector.introspect(access)
+
+    token_class.assert_not_called()
+    assert first == second
+    assert first["active"] is True
+    assert first["telegram_id"] == valid_user_obj.telegram_id
+    assert first["token_type"] == "access"
+    assert TokenIntrospector.stats() == {"hits": 1, "misses": 1, "size": 1}
+
+
+def test_cached_token_expires_with_exp(valid_user_obj):
+    access = TelegramUserAuthService._generate_jwt_token(valid_user_obj)["access"]
+    exp = TokenIntrospector.introspect(access)["exp"]
+
+    with patch("telegram_user.services.token_introspection.time.time") as now:
+        now.return_value = exp
+        assert TokenIntrospector.introspect(access) == {"active": False}
+
+    assert TokenIntrospector.stats()["size"] == 0
+
+
+@pytest.mark.parametrize("token_name", ["refresh", "garbage"])
+def test_invalid_tokens_are_inactive_and_not_cached(valid_user_obj, token_name):
+    tokens = TelegramUserAuthService._generate_jwt_token(valid_user_obj)
+    token = tokens.get(token_name, "not-a-jwt")
+
+    assert TokenIntrospector.introspect(token) == {"active": False}
+    assert TokenIntrospector.stats()["size"] == 0
+
+
+def test_token_without_telegram_id_is_inactive():
+    assert TokenIntrospector.introspect(str(TelegramAccessToken())) == {"active": False}
+
+
+def test_cache_is_bounded(settings):
+    settings.TELEGRAM_USER_INTROSPECTION_CACHE_SIZE = 2
+    tokens = []
+    for telegram_id in range(3):
+        token = TelegramAccessToken()
+        token["telegram_id"] = telegram_id
+        tokens.append(str(token))
+        TokenIntrospector.introspect(tokens[-1])
+
+    assert TokenIntrospector.stats()["size"] == 2
+    TokenIntrospector.introspect(tokens[0])
+    assert TokenIntrospector.stats()["hits"] == 0
@@ -0,0 +1,84 @@
+import jwt
+import pytest
+from cryptography.hazmat.primitives import serialization
+from cryptography.hazmat.primitives.asymmetric import ed25519
+from telegram_user.services.jwt_keys import JWTKeyRing
+from telegram_user.services.token_minter import TokenMinter
+from telegram_user.services.tokens import TelegramAccessToken, TelegramRefreshToken
+
+pytestmark = pytest.mark.django_db
+
+
+def unverified_payload(token):
+    return jwt.decode(token, options={"verify_signature": False})
+
+
+@pytest.fixture
+def eddsa_keys(settings, tmp_path):
+    path = tmp_path / "k1.pem"
+    path.write_bytes(
+        ed25519.Ed25519PrivateKey.generate().private_bytes(
+            serialization.Encoding.PEM,
+            serialization.PrivateFormat.PKCS8,
+            serialization.NoEncryption(),
+        )
+    )
+    settings.SIMPLE_JWT = {**settings.SIMPLE_JWT, "ALGORITHM": "EdDSA"}
+    settings.TELEGRAM_USER_JWT_KEYS = {
+        **settings.TELEGRAM_USER_JWT_KEYS,
+        "KEYS": {"k1": str(path)},
+    }
+
+
+@pytest.mark.parametrize("algorithm", ["HS256", "EdDSA"])
+def test_tokens_are_byte_compatible_with_simplejwt(request, algorithm):
+    if algorithm == "EdDSA":
+        request.getfixturevalue("eddsa_keys")
+
+    tokens = TokenMinter.mint_pair({"telegram_id": 123456789})
+
+    # Подпись HS256 и EdDSA детерминирована: simplejwt даёт те же байты
+    backend = JWTKeyRing.token_backend()
+    for token in tokens.values():
+        assert backend.encode(unverified_payload(token)) == token
+    assert TelegramAccessToken(tokens["access"])["telegram_id"] == 123456789
+    assert TelegramRefreshToken(tokens["refresh"])["telegram_id"] == 123456789
+
+
+def test_claims_match_simplejwt_pair():
+    refresh = TelegramRefreshToken()
+    refresh["telegram_id"] = 123456789
+    expected = {"access": refresh.access_token.payload, "refresh": refresh.payload}
+
+    tokens = TokenMinter.mint_pair({"telegram_id": 123456789})
+
+    for name, token in tokens.items():
+        payload = unverified_payload(token)
+        assert list(payload) == list(expected[name])
+        assert payload["token_type"] == name
+        assert abs(payload["exp"] - expected[name]["exp"]) <= 1
+    access, refresh = map(unverified_payload, tokens.values())
+    assert access["iat"] == refresh["iat"]
+    assert access["jti"] != refresh["jti"]
+
+
+def test_refresh_claims_only_in_refresh_token():
+    tokens = TokenMinter.mint_pair({"telegram_id": 1}, refresh_claims={"fam": "f1"})
+
+    assert "fam" not in unverified_payload(tokens["access"])
+    assert TelegramRefreshToken(tokens["refresh"]).family == "f1"
+
+
+def test_state_is_rebuilt_when_keys_change(request):
+    hs_token = TokenMinter.mint_pair({"telegram_id": 1})["access"]
+    assert "kid" not in jwt.get_unverified_header(hs_token)
+
+    request.getfixturevalue("eddsa_keys")
+    eddsa_token = TokenMinter.mint_pair({"telegram_id": 1})["access"]
+
+    assert jwt.get_unverified_header(eddsa_token) == {
+        "alg": "EdDSA",
+        "kid": "k1",
+        "typ": "JWT",
+    }
+    assert TelegramAccessToken(eddsa_token)["telegram_id"] == 1
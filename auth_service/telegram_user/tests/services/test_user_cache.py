@@ -0,0 +1,145 @@
+from unittest.mock import patch
+
+import pytest
+from django.core.cache import caches
+from rest_framework.exceptions import AuthenticationFailed
+from rest_framework_simplejwt.tokens import RefreshToken
+from telegram_user.models import RefreshTokenRotation, TelegramUser
+from telegram_user.services.tg_user_auth import TelegramUserAuthService
+from telegram_user.services.user_cache import (
+    DjangoCacheBackend,
+    LocMemLRUBackend,
+    MmapBackend,
+    UserSummaryCache,
+)
+
+
+@pytest.fixture
+def summary(valid_user_data):
+    return {"id": 1, **valid_user_data}
+
+
+@pytest.fixture(params=["locmem", "mmap", "django"])
+def backend(request, tmp_path):
+    """Фикстура с каждым из бэкендов кэша"""
+    if request.param == "locmem":
+        return LocMemLRUBackend(ttl=60, max_size=2)
+    if request.param == "mmap":
+        return MmapBackend(ttl=60, max_size=2, path=str(tmp_path / "user_cache"))
+    caches["default"].clear()
+    return DjangoCacheBackend(ttl=60, max_size=2)
+
+
+def test_backend_roundtrip(backend, summary):
+    assert backend.get(summary["telegram_id"]) is None
+
+    backend.set(summary["telegram_id"], summary)
+    assert backend.get(summary["telegram_id"]) == summary
+
+    backend.delete(summary["telegram_id"])
+    assert backend.get(summary["telegram_id"]) is None
+
+
+def test_backend_expiry(backend, summary):
+    backend.ttl = -1
+    backend.set(summary["telegram_id"], summary)
+    assert backend.get(summary["telegram_id"]) is None
+
+
+def test_locmem_evicts_least_recently_used(summary):
+    backend = LocMemLRUBackend(ttl=60, max_size=2)
+    for telegram_id in (1, 2):
+        backend.set(telegram_id, {**summary, "telegram_id": telegram_id})
+    backend.get(1)
+    backend.set(3, {**summary, "telegram_id": 3})
+
+    assert backend.get(1) is not None
+    assert backend.get(2) is None
+
+
+def test_mmap_shared_between_instances_and_null_fields(tmp_path, summary):
+    path = str(tmp_path / "user_cache")
+    writer = MmapBackend(ttl=60, max_size=16, path=path)
+    reader = MmapBackend(ttl=60, max_size=16, path=path)
+
+    writer.set(summary["telegram_id"], {**summary, "last_name": None, "username": "ю"})
+
+    assert reader.get(summary["telegram_id"]) == {
+        **summary,
+        "last_name": None,
+        "username": "ю",
+    }
+
+
+def test_mmap_detects_corrupted_slot(tmp_path, summary):
+    backend = MmapBackend(ttl=60, max_size=4, path=str(tmp_path / "user_cache"))
+    backend.set(summary["telegram_id"], summary)
+    offset = backend._offset(summary["telegram_id"]) + backend.HEADER.size + 5
+    backend._map()[offset] ^= 0xFF
+
+    assert backend.get(summary["telegram_id"]) is None
+
+
+@pytest.mark.django_db
+class TestRefreshUsesUserCache:
+
+    def test_refresh_user_token_hits_cache(self, valid_user_data, valid_jwt_tokens):
+        user = TelegramUser.objects.create(**valid_user_data)
+        UserSummaryCache.set_user(user)
+        token = RefreshToken()
+        token["telegram_id"] = user.telegram_id
+
+        with (
+            patch(
+                "telegram_user.services.tg_user_auth.TelegramUserAuthService._generate_jwt_token",
+                return_value=valid_jwt_tokens,
+            ),
+            patch.object(TelegramUser.objects, "get") as db_get,
+        ):
+            cached_user, _ = TelegramUserAuthService.refresh_user_token(str(token))
+
+        db_get.assert_not_called()
+        assert isinstance(cached_user, TelegramUser)
+        assert cached_user.pk == user.pk
+        assert cached_user.username == user.username
+
+    def test_authenticate_refreshes_cache(self, valid_user_data, valid_jwt_tokens):
+        TelegramUser.objects.create(**valid_user_data)
+        UserSummaryCache.set_user(TelegramUser.objects.get())
+
+        with (
+            patch(
+                "telegram_user.services.tg_parser.TelegramDataParser.parse_userData",
+                return_value={**valid_user_data, "username": "renamed"},
+            ),
+            patch(
+                "telegram_user.services.tg_user_auth.TelegramUserAuthService._generate_jwt_token",
+                return_value=valid_jwt_tokens,
+            ),
+        ):
+            TelegramUserAuthService.authenticate("valid_initData")
+
+        cached = UserSummaryCache.get_user(valid_user_data["telegram_id"])
+        assert cached.username == "renamed"
+
+    def test_deleting_user_drops_cache_entry(self, valid_user_data):
+        user = TelegramUser.objects.create(**valid_user_data)
+        UserSummaryCache.set_user(user)
+
+        user.delete()
+
+        assert UserSummaryCache.get_user(valid_user_data["telegram_id"]) is None
+
+    def test_refresh_rejects_deleted_user_on_cache_hit(self, valid_user_data):
+        user = TelegramUser.objects.create(**valid_user_data)
+        UserSummaryCache.set_user(user)
+        token = RefreshToken()
+        token["telegram_id"] = user.telegram_id
+        # Удаление без сигналов: запись кэша осталась, как в кэше другого воркера
+        TelegramUser.objects.filter(pk=user.pk)._raw_delete(using="default")
+
+        with pytest.raises(AuthenticationFailed, match="User not found"):
+            TelegramUserAuthService.refresh_user_token(str(token))
+
+        assert UserSummaryCache.get_user(user.telegram_id) is None
+        assert not RefreshTokenRotation.objects.exists()
@@ -0,0 +1,63 @@
+import pytest
+from rest_framework.test import APIRequestFactory
+from rest_framework_simplejwt.exceptions import InvalidToken
+
+from telegram_user.authentication import TelegramJWTAuthentication, TelegramPrincipal
+from telegram_user.models import TelegramUser
+from telegram_user.services.tg_user_auth import TelegramUserAuthService
+from telegram_user.services.tokens import TelegramAccessToken
+from telegram_user.services.user_cache import UserSummaryCache
+
+
+def auth_request(token):
+    return APIRequestFactory().get("/", HTTP_AUTHORIZATION=f"Bearer {token}")
+
+
+@pytest.mark.django_db
+class TestTelegramJWTAuthentication:
+
+    def test_principal_built_without_queries(
+        self, valid_user_obj, django_assert_num_queries
+    ):
+        tokens = TelegramUserAuthService._generate_jwt_token(valid_user_obj)
+
+        with django_assert_num_queries(0):
+            principal, token = TelegramJWTAuthentication().authenticate(
+                auth_request(tokens["access"])
+            )
+
+        assert isinstance(principal, TelegramPrincipal)
+        assert principal.telegram_id == valid_user_obj.telegram_id
+        assert principal.is_authenticated
+        assert token["telegram_id"] == valid_user_obj.telegram_id
+        assert not hasattr(principal, "__dict__")
+
+    def test_user_is_loaded_lazily_once(
+        self, valid_user_data, django_assert_num_queries
+    ):
+        TelegramUser.objects.create(**valid_user_data)
+        principal = TelegramPrincipal(valid_user_data["telegram_id"], None)
+
+        with django_assert_num_queries(1):
+            assert principal.user.username == valid_user_data["username"]
+            assert principal.user.username == valid_user_data["username"]
+
+        # Следующий запрос берёт пользователя из кэша
+        with django_assert_num_queries(0):
+            assert TelegramPrincipal(valid_user_data["telegram_id"], None).user
+        assert UserSummaryCache.get_user(valid_user_data["telegram_id"])
+
+    def test_deleted_user_loads_as_none(self):
+        assert TelegramPrincipal(1, None).user is None
+
+    def test_refresh_token_is_rejected(self, valid_user_obj):
+        tokens = TelegramUserAuthService._generate_jwt_token(valid_user_obj)
+
+        with pytest.raises(InvalidToken):
+            TelegramJWTAuthentication().authenticate(auth_request(tokens["refresh"]))
+
+    def test_token_without_telegram_id_is_rejected(self):
+        with pytest.raises(InvalidToken):
+            TelegramJWTAuthentication().authenticate(
+                auth_request(str(TelegramAccessToken()))
+            )
@@ -0,0 +1,263 @@
+import cProfile
+import json
+from datetime import timedelta
+from io import StringIO
+from unittest.mock import patch
+
+import pytest
+from django.core.management import CommandError, call_command
+from django.db import connection, connections
+from django.test.utils import CaptureQueriesContext
+from django.utils import timezone
+from rest_framework_simplejwt.token_blacklist.models import (
+    BlacklistedToken,
+    OutstandingToken,
+)
+
+from telegram_user.models import RefreshTokenRotation, RevokedToken, TelegramUser
+from telegram_user.services.profiling import ProfileStore
+from telegram_user.services.schema import SchemaState
+from telegram_user.services.token_partitions import TokenPartitionManager
+
+
+def make_tokens(model, expires_at, count, prefix):
+    fields = (
+        {"telegram_id": 1, "rotated_at": timezone.now()}
+        if model is RefreshTokenRotation
+        else {"revoked_at": timezone.now()}
+    )
+    model.objects.bulk_create(
+        model(jti=f"{prefix}-{i}", expires_at=expires_at, **fields)
+        for i in range(count)
+    )
+
+
+@pytest.mark.django_db
+class TestPurgeExpiredTokens:
+
+    @pytest.mark.parametrize("model", [RefreshTokenRotation, RevokedToken])
+    def test_expired_rows_are_purged_in_batches(self, model):
+        now = timezone.now()
+        # Дней без секций: при секционировании строки лежат в секции по умолчанию
+        make_tokens(model, now - timedelta(days=30), 7, "expired")
+        make_tokens(model, now + timedelta(hours=1), 3, "fresh")
+
+        call_command("purge_expired_tokens", batch_size=2, stdout=StringIO())
+
+        assert set(model.objects.values_list("jti", flat=True)) == {
+            "fresh-0",
+            "fresh-1",
+            "fresh-2",
+        }
+
+    def test_partitions_created_ahead_and_expired_dropped(self):
+        table = RevokedToken._meta.db_table
+        if not TokenPartitionManager.is_partitioned(connection, table):
+            pytest.skip("table is not partitioned on this backend")
+
+        now = timezone.now()
+        make_tokens(RevokedToken, now + timedelta(days=1), 2, "default")
+        old_day = (now - timedelta(days=3)).date()
+        TokenPartitionManager.ensure_partitions(connection, table, old_day, 1)
+        make_tokens(RevokedToken, now - timedelta(days=3), 2, "old")
+
+        call_command("purge_expired_tokens", days_ahead=3, stdout=StringIO())
+
+        partitions = TokenPartitionManager.partitions(connection, table)
+        assert old_day not in partitions
+        assert {now.date() + timedelta(days=i) for i in range(3)} <= set(partitions)
+        # Строки, попавшие в секцию по умолчанию, перенесены в новую секцию
+        with connection.cursor() as cursor:
+            cursor.execute(f"SELECT count(*) FROM {table}_default")
+            assert cursor.fetchone()[0] == 0
+        assert RevokedToken.objects.count() == 2
+
+    def test_live_partitions_are_not_scanned(self):
+        table = RevokedToken._meta.db_table
+        if not TokenPartitionManager.is_partitioned(connection, table):
+            pytest.skip("table is not partitioned on this backend")
+
+        now = timezone.now()
+        TokenPartitionManager.ensure_partitions(connection, table, now.date(), 1)
+        day_start = now.replace(hour=0, minute=0, second=0, microsecond=0)
+        make_tokens(RevokedToken, day_start, 2, "today")
+
+        call_command("purge_expired_tokens", stdout=StringIO())
+
+        # Истёкшие строки сегодняшней секции удалятся вместе с секцией
+        assert RevokedToken.objects.filter(jti__startswith="today").count() == 2
+
+    def test_locked_partition_is_left_for_next_run(self, monkeypatch):
+        table = RevokedToken._meta.db_table
+        if not TokenPartitionManager.is_partitioned(connection, table):
+            pytest.skip("table is not partitioned on this backend")
+        monkeypatch.setattr(TokenPartitionManager, "DETACH_ATTEMPTS", 2)
+        monkeypatch.setattr(TokenPartitionManager, "DETACH_RETRY_DELAY", 0)
+        now = timezone.now()
+        old_day = (now - timedelta(days=3)).date()
+        TokenPartitionManager.ensure_partitions(connection, table, old_day, 1)
+
+        # Долгий запрос ротации держит блокировку родительской таблицы
+        other = connections.create_connection("default")
+        try:
+            other.set_autocommit(False)
+            with other.cursor() as cursor:
+                cursor.execute(f"LOCK TABLE ONLY {table} IN ACCESS SHARE MODE")
+            assert (
+                TokenPartitionManager.drop_expired_partitions(connection, table, now)
+                == []
+            )
+            assert old_day in TokenPartitionManager.partitions(connection, table)
+            other.rollback()
+        finally:
+            other.close()
+
+        dropped = TokenPartitionManager.drop_expired_partitions(connection, table, now)
+        assert dropped == [TokenPartitionManager.partition_name(table, old_day)]
+
+    def test_legacy_blacklist_rows_are_purged(self):
+        now = timezone.now()
+        expired = OutstandingToken.objects.create(
+            jti="expired", token="", created_at=now, expires_at=now - timedelta(1)
+        )
+        fresh = OutstandingToken.objects.create(
+            jti="fresh", token="", created_at=now, expires_at=now + timedelta(1)
+        )
+        BlacklistedToken.objects.create(token=expired)
+        BlacklistedToken.objects.create(token=fresh)
+
+        call_command("purge_expired_tokens", stdout=StringIO())
+
+        assert list(OutstandingToken.objects.values_list("jti", flat=True)) == ["fresh"]
+        assert BlacklistedToken.objects.count() == 1
+
+
+@pytest.mark.django_db(transaction=True)
+class TestDetachPartition:
+
+    def test_detaches_concurrently_without_default_partition(self):
+        if connection.vendor != "postgresql":
+            pytest.skip("partitioning requires PostgreSQL")
+        with connection.cursor() as cursor:
+            cursor.execute("CREATE TABLE tmp_parts (d date) PARTITION BY RANGE (d)")
+            cursor.execute(
+                "CREATE TABLE tmp_parts_p20200101 PARTITION OF tmp_parts "
+                "FOR VALUES FROM ('2020-01-01') TO ('2020-01-02')"
+            )
+        try:
+            with CaptureQueriesContext(connection) as queries:
+                dropped = TokenPartitionManager.drop_expired_partitions(
+                    connection, "tmp_parts", timezone.now()
+                )
+        finally:
+            with connection.cursor() as cursor:
+                cursor.execute("DROP TABLE tmp_parts")
+
+        assert dropped == ["tmp_parts_p20200101"]
+        assert any("CONCURRENTLY" in query["sql"] for query in queries)
+
+
+@pytest.mark.django_db(transaction=True)
+class TestAuthLoad:
+
+    def test_drives_login_and_refresh(self, live_server, settings):
+        settings.TELEGRAM_BOT_TOKENS = ["1234567890:FAKE_BOT_TOKEN"]
+        stdout = StringIO()
+
+        call_command(
+            "authload",
+            url=live_server.url,
+            mix="new=0.5,refresh=0.3,bad_hash=0.2",
+            users=5,
+            concurrency=2,
+            requests=15,
+            seed=1,
+            stdout=stdout,
+        )
+
+        output = stdout.getvalue()
+        assert output.startswith("15 requests in")
+        lines = {line.split()[0]: line for line in output.splitlines()[2:]}
+        assert lines["new"].endswith("  -")
+        assert lines["bad_hash"].endswith("  -")
+        assert 0 < TelegramUser.objects.count() <= 5
+
+    def test_requires_bot_token(self, settings):
+        settings.TELEGRAM_BOT_TOKENS = []
+
+        with pytest.raises(CommandError):
+            call_command("authload", requests=1, stdout=StringIO())
+
+
+class TestProfileSummary:
+
+    def test_summarizes_profiles(self, tmp_path):
+        store = ProfileStore(tmp_path)
+        for view in ("telegram-login", "telegram-login", "token-refresh"):
+            profiler = cProfile.Profile()
+            profiler.runcall(sorted, range(100))
+            store.save(profiler, view)
+        stdout = StringIO()
+
+        call_command("profile_summary", dir=str(tmp_path), limit=5, stdout=stdout)
+
+        output = stdout.getvalue()
+        assert output.startswith("3 profiles: telegram-login 2, token-refresh 1")
+        assert "sorted" in output
+
+    def test_no_profiles(self, tmp_path):
+        with pytest.raises(CommandError):
+            call_command("profile_summary", dir=str(tmp_path / "missing"))
+
+
+@pytest.mark.django_db
+class TestSchemaCommands:
+
+    def test_check_schema_up_to_date(self):
+        stdout = StringIO()
+
+        call_command("check_schema", stdout=stdout)
+
+        assert stdout.getvalue().strip() == "Schema is up to date"
+
+    def test_check_schema_fails_on_pending_migrations(self):
+        with (
+            patch.object(SchemaState, "pending", return_value=["app.0002_new"]),
+            pytest.raises(CommandError, match="app.0002_new"),
+        ):
+            call_command("check_schema")
+
+    def test_migrate_locked_skips_current_schema(self):
+        stdout = StringIO()
+
+        call_command("migrate_locked", stdout=stdout)
+
+        assert stdout.getvalue().strip() == "No migrations to apply"
+
+    def test_migrate_locked_waits_for_lock(self):
+        other = connections.create_connection("default")
+        try:
+            with other.cursor() as cursor:
+                cursor.execute("SELECT pg_advisory_lock(%s)", [SchemaState.LOCK_KEY])
+
+            with pytest.raises(CommandError, match="Migration lock"):
+                call_command("migrate_locked", lock_timeout=0, stdout=StringIO())
+        finally:
+            other.close()
+
+
+class TestImportReport:
+
+    def test_reports_packages(self):
+        stdout = StringIO()
+
+        call_command("import_report", "--json", limit=3, stdout=stdout)
+
+        report = json.loads(stdout.getvalue())
+        assert report["total_ms"] > 0
+        assert report["modules"] > 100
+        assert "django" in report["packages"]
+
+    def test_failed_import_raises(self):
+        with pytest.raises(CommandError, match="Import of missing_module failed"):
+            call_command("import_report", module="missing_module")
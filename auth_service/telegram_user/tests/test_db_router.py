@@ -0,0 +1,160 @@
+import time
+
+import pytest
+from asgiref.sync import async_to_sync
+from django.conf import settings as django_settings
+from django.db import OperationalError, connections, transaction
+from django.test.utils import CaptureQueriesContext
+from rest_framework.exceptions import AuthenticationFailed
+
+from telegram_user.db_router import ReplicaRouter, primary_reads
+from telegram_user.models import RefreshTokenRotation, RevokedToken, TelegramUser
+from telegram_user.services.tg_user_auth import TelegramUserAuthService
+from telegram_user.services.token_minter import TokenMinter
+from telegram_user.services.user_cache import UserSummaryCache
+
+# Интеграционные тесты требуют реплики в настройках (в тестах - зеркало основной БД):
+# DB_REPLICAS=127.0.0.1:5432 pytest
+REPLICA = next(iter(django_settings.TELEGRAM_USER_REPLICAS["ALIASES"]), None)
+
+pytestmark = pytest.mark.replicas
+
+
+@pytest.fixture
+def replicas(settings):
+    def configure(aliases=("replica_0",), window=5.0):
+        settings.TELEGRAM_USER_REPLICAS = {
+            **settings.TELEGRAM_USER_REPLICAS,
+            "ALIASES": list(aliases),
+            "READ_YOUR_WRITES_WINDOW": window,
+        }
+
+    return configure
+
+
+class TestReplicaRouter:
+    def test_user_reads_go_to_replica(self, replicas):
+        replicas()
+        router = ReplicaRouter()
+
+        assert router.db_for_read(TelegramUser) == "replica_0"
+        assert router.db_for_write(TelegramUser) == "default"
+
+    def test_token_tables_stay_on_primary(self, replicas):
+        replicas()
+        router = ReplicaRouter()
+
+        assert router.db_for_read(RefreshTokenRotation) is None
+        assert router.db_for_read(RevokedToken) is None
+
+    def test_primary_reads_pins_context(self, replicas):
+        replicas()
+        router = ReplicaRouter()
+
+        with primary_reads():
+            assert router.db_for_read(TelegramUser) is None
+            with primary_reads(False):
+                assert router.db_for_read(TelegramUser) is None
+        with primary_reads(False):
+            assert router.db_for_read(TelegramUser) == "replica_0"
+
+    def test_without_replicas_everything_reads_primary(self, replicas):
+        replicas(aliases=())
+
+        assert ReplicaRouter().db_for_read(TelegramUser) is None
+
+    def test_recently_written(self, replicas):
+        replicas(window=5.0)
+        now = int(time.time())
+
+        assert ReplicaRouter.recently_written(now - 1)
+        assert not ReplicaRouter.recently_written(now - 60)
+        assert ReplicaRouter.recently_written(None)
+
+
+def fail_replica(execute, sql, params, many, context):
+    raise OperationalError("replica is down")
+
+
+@pytest.mark.skipif(REPLICA is None, reason="DB_REPLICAS is not configured")
+@pytest.mark.django_db(databases="__all__", transaction=True)
+class TestRefreshWithReplica:
+    # В тестах реплика - зеркало основной БД (TEST MIRROR): отдельное соединение
+    # к той же БД, незакоммиченные данные основной БД ему не видны
+
+    @pytest.fixture(autouse=True)
+    def close_replica_pool(self):
+        """Пул реплики держит соединения к тестовой БД до её удаления"""
+        yield
+        connections[REPLICA].close()
+        connections[REPLICA].close_pool()
+
+    def test_refresh_reads_user_from_replica(self, replicas, valid_user_data):
+        replicas(aliases=[REPLICA], window=0)
+        TelegramUser.objects.create(**valid_user_data)
+        refresh = TokenMinter.mint_pair({"telegram_id": valid_user_data["telegram_id"]})
+
+        user, _ = TelegramUserAuthService.refresh_user_token(refresh["refresh"])
+
+        assert user._state.db == REPLICA
+        assert RefreshTokenRotation.objects.count() == 1
+
+    def test_fresh_login_reads_user_from_primary(self, replicas, valid_user_data):
+        replicas(aliases=[REPLICA], window=60)
+        TelegramUser.objects.create(**valid_user_data)
+        refresh = TokenMinter.mint_pair({"telegram_id": valid_user_data["telegram_id"]})
+        UserSummaryCache.clear()
+
+        with CaptureQueriesContext(connections[REPLICA]) as replica_queries:
+            user, _ = TelegramUserAuthService.refresh_user_token(refresh["refresh"])
+
+        assert user._state.db == "default"
+        assert len(replica_queries) == 0
+
+    def test_replica_error_falls_back_to_primary(self, replicas, valid_user_data):
+        replicas(aliases=[REPLICA], window=0)
+        TelegramUser.objects.create(**valid_user_data)
+        refresh = TokenMinter.mint_pair({"telegram_id": valid_user_data["telegram_id"]})
+
+        with connections[REPLICA].execute_wrapper(fail_replica):
+            user, _ = TelegramUserAuthService.refresh_user_token(refresh["refresh"])
+
+        assert user._state.db == "default"
+        assert RefreshTokenRotation.objects.count() == 1
+
+    def test_async_replica_error_falls_back_to_primary(self, replicas, valid_user_data):
+        replicas(aliases=[REPLICA], window=0)
+        TelegramUser.objects.create(**valid_user_data)
+        refresh = TokenMinter.mint_pair({"telegram_id": valid_user_data["telegram_id"]})
+
+        with connections[REPLICA].execute_wrapper(fail_replica):
+            user, _ = async_to_sync(TelegramUserAuthService.arefresh_user_token)(
+                refresh["refresh"]
+            )
+
+        assert user._state.db == "default"
+        assert RefreshTokenRotation.objects.count() == 1
+
+    def test_replica_lag_falls_back_to_primary(self, replicas, valid_user_data):
+        replicas(aliases=[REPLICA], window=0)
+        refresh = TokenMinter.mint_pair({"telegram_id": valid_user_data["telegram_id"]})
+
+        # Пользователь ещё не дошёл до реплики: запись не закоммичена
+        with transaction.atomic():
+            TelegramUser.objects.create(**valid_user_data)
+            user, _ = TelegramUserAuthService.refresh_user_token(refresh["refresh"])
+
+        assert user._state.db == "default"
+        assert RefreshTokenRotation.objects.count() == 1
+
+    def test_missing_user_does_not_burn_token(self, replicas, valid_user_data):
+        replicas(aliases=[REPLICA], window=0)
+        refresh = TokenMinter.mint_pair({"telegram_id": valid_user_data["telegram_id"]})
+
+        with pytest.raises(AuthenticationFailed, match="User not found"):
+            TelegramUserAuthService.refresh_user_token(refresh["refresh"])
+
+        assert not RefreshTokenRotation.objects.exists()
+        TelegramUser.objects.create(**valid_user_data)
+        user, _ = TelegramUserAuthService.refresh_user_token(refresh["refresh"])
+        assert user.telegram_id == valid_user_data["telegram_id"]
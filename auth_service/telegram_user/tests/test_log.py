@@ -0,0 +1,129 @@
+import logging
+import os
+import queue
+from unittest.mock import patch
+
+import pytest
+from django.urls import reverse
+from rest_framework.test import APIClient
+
+from telegram_user.log import (
+    QUEUE_HANDLER,
+    LazyQueueHandler,
+    SamplingFilter,
+    StructuredFormatter,
+    start_queue_listener,
+    stop_queue_listener,
+)
+
+
+class ListHandler(logging.Handler):
+    def __init__(self):
+        super().__init__()
+        self.records = []
+
+    def emit(self, record):
+        self.records.append(record)
+
+
+@pytest.fixture
+def telegram_user_records():
+    """Записи логгера telegram_user, минуя очередь и фильтр сэмплирования"""
+    logger = logging.getLogger("telegram_user")
+    handler = ListHandler()
+    with patch.object(logger, "handlers", [handler]):
+        yield handler.records
+
+
+def make_record(msg="Login failed: %s", args=("Invalid hash signature",), **extra):
+    record = logging.LogRecord(
+        "telegram_user", logging.WARNING, __file__, 1, msg, args, None
+    )
+    record.__dict__.update(extra)
+    return record
+
+
+def test_sampling_filter_drops_repeats_and_reports_them():
+    sampling = SamplingFilter(burst=2, interval=60)
+
+    with patch("telegram_user.log.time.monotonic", return_value=0):
+        passed = [sampling.filter(make_record()) for _ in range(5)]
+        assert sampling.filter(make_record(args=("initData is too old",)))
+    assert passed == [True, True, False, False, False]
+
+    with patch("telegram_user.log.time.monotonic", return_value=61):
+        record = make_record()
+        assert sampling.filter(record)
+    assert record.suppressed == 3
+
+
+def test_sampling_filter_keeps_critical():
+    sampling = SamplingFilter(burst=1, interval=60)
+    records = [make_record() for _ in range(3)]
+    for record in records:
+        record.levelno = logging.CRITICAL
+
+    assert all(sampling.filter(record) for record in records)
+
+
+def test_structured_formatter_appends_extra_fields():
+    formatter = StructuredFormatter("{levelname} {message}", style="{")
+    record = make_record(event="login_failed", bot_id=7)
+
+    assert formatter.format(record) == (
+        "WARNING Login failed: Invalid hash signature event=login_failed bot_id=7"
+    )
+    assert formatter.format(make_record(args=("x",))) == "WARNING Login failed: x"
+
+
+def test_queue_handler_does_not_format_on_caller_thread():
+    records = queue.SimpleQueue()
+    handler = LazyQueueHandler(records)
+    record = make_record()
+
+    with patch.object(logging.Formatter, "format") as format_record:
+        handler.handle(record)
+
+    format_record.assert_not_called()
+    queued = records.get_nowait()
+    assert queued.args == ("Invalid hash signature",)
+    assert queued.getMessage() == "Login failed: Invalid hash signature"
+
+
+@pytest.mark.django_db
+def test_failed_login_is_logged_once(telegram_user_records):
+    response = APIClient().post(
+        reverse("telegram-login"), data={"initData": "user=1&hash=x"}, format="json"
+    )
+
+    assert response.status_code == 401
+    assert [record.event for record in telegram_user_records] == ["login_failed"]
+
+
+@pytest.mark.skipif(not hasattr(os, "fork"), reason="os.fork is not available")
+# Предупреждение учитывает поток слушателя, перезапущенный в родителе после fork
+@pytest.mark.filterwarnings("ignore:This process .* is multi-threaded")
+def test_queue_listener_restarted_after_fork(tmp_path):
+    """Как воркер gunicorn с preload: слушатель работает и в мастере, и после fork"""
+    listener = logging.getHandlerByName(QUEUE_HANDLER).listener
+    start_queue_listener()
+    output = logging.FileHandler(tmp_path / "records.log")
+    output.setFormatter(logging.Formatter("%(process)d %(message)s"))
+    logger = logging.getLogger("telegram_user")
+
+    with patch.object(listener, "handlers", (output,)):
+        pid = os.fork()
+        if pid == 0:
+            logger.error("from child")
+            stop_queue_listener()
+            os._exit(0)
+        os.waitpid(pid, 0)
+        logger.error("from parent")
+        stop_queue_listener()
+    start_queue_listener()
+    output.close()
+
+    assert (tmp_path / "records.log").read_text().splitlines() == [
+        f"{pid} from child",
+        f"{os.getpid()} from parent",
+    ]
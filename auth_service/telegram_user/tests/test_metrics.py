@@ -0,0 +1,165 @@
+import json
+import os
+import subprocess
+
+import pytest
+from django.urls import reverse
+from rest_framework.exceptions import AuthenticationFailed
+from rest_framework.test import APIClient
+
+from telegram_user.metrics import BUCKETS, Metrics
+from telegram_user.services.tg_user_auth import TelegramUserAuthService
+
+
+def write_snapshot(directory, pid, counters=(), histograms=()):
+    directory.mkdir(exist_ok=True)
+    (directory / f"{pid}.json").write_text(
+        json.dumps({"counters": list(counters), "histograms": list(histograms)})
+    )
+
+
+def test_render_histogram_and_counters():
+    Metrics.observe("auth_stage_duration_seconds", 0.0002, stage="check_hash")
+    Metrics.observe("auth_stage_duration_seconds", 0.003, stage="check_hash")
+    Metrics.increment("auth_login_total", result="success")
+
+    lines = Metrics.render().splitlines()
+
+    assert "# TYPE auth_stage_duration_seconds histogram" in lines
+    assert (
+        'auth_stage_duration_seconds_bucket{stage="check_hash",le="0.0001"} 0' in lines
+    )
+    assert (
+        'auth_stage_duration_seconds_bucket{stage="check_hash",le="0.00025"} 1' in lines
+    )
+    assert 'auth_stage_duration_seconds_bucket{stage="check_hash",le="+Inf"} 2' in lines
+    assert 'auth_stage_duration_seconds_count{stage="check_hash"} 2' in lines
+    assert 'auth_stage_duration_seconds_sum{stage="check_hash"} 0.0032' in lines
+    assert 'auth_login_total{result="success"} 1' in lines
+
+
+def test_collect_sums_live_workers_and_archives_dead(metrics_dir):
+    dead = subprocess.Popen(["true"])
+    dead.wait()
+    buckets = [0] * (len(BUCKETS) + 2)
+    buckets[0], buckets[-1] = 3, 0.0003
+    series = ["auth_stage_duration_seconds", 'stage="sign_tokens"', buckets]
+    write_snapshot(
+        metrics_dir,
+        os.getppid(),
+        counters=[["auth_login_total", 'result="success"', 2]],
+        histograms=[series],
+    )
+    write_snapshot(
+        metrics_dir,
+        dead.pid,
+        counters=[["auth_login_total", 'result="success"', 100]],
+    )
+    Metrics.increment("auth_login_total", result="success")
+    Metrics.observe("auth_stage_duration_seconds", 1.0, stage="sign_tokens")
+
+    counters, histograms = Metrics.collect()
+
+    assert counters[("auth_login_total", 'result="success"')] == 103
+    merged = histograms[("auth_stage_duration_seconds", 'stage="sign_tokens"')]
+    assert merged[0] == 3 and sum(merged[:-1]) == 4
+    assert not (metrics_dir / f"{dead.pid}.json").exists()
+    # Архив учитывается при каждом следующем сборе
+    counters, _ = Metrics.collect()
+    assert counters[("auth_login_total", 'result="success"')] == 103
+
+
+def test_counters_do_not_drop_when_worker_exits(metrics_dir):
+    worker = subprocess.Popen(["sleep", "60"])
+    try:
+        metrics_dir.mkdir()
+        (metrics_dir / f"{worker.pid}.json").write_text(
+            json.dumps(
+                {
+                    "counters": [["auth_login_total", 'result="success"', 5]],
+                    "gauges": [["worker_gauge", "", 2]],
+                    "histograms": [],
+                }
+            )
+        )
+        before, _ = Metrics.collect()
+    finally:
+        worker.kill()
+        worker.wait()
+
+    after, _ = Metrics.collect()
+
+    key = ("auth_login_total", 'result="success"')
+    assert before[key] == after[key] == 5
+    # Текущие значения завершившегося воркера не архивируются
+    assert ("worker_gauge", "") not in after
+
+
+def test_gauges_set_by_collectors_are_summed_across_workers(metrics_dir):
+    write_snapshot(metrics_dir, os.getppid())
+    (metrics_dir / f"{os.getppid()}.json").write_text(
+        json.dumps(
+            {
+                "counters": [],
+                "gauges": [["auth_db_pool_size", 'alias="default"', 4]],
+                "histograms": [],
+            }
+        )
+    )
+    collector = lambda: Metrics.set("auth_db_pool_size", 3, alias="default")
+    Metrics.register_collector(collector)
+    try:
+        lines = Metrics.render().splitlines()
+    finally:
+        Metrics._collectors.remove(collector)
+
+    assert "# TYPE auth_db_pool_size gauge" in lines
+    assert 'auth_db_pool_size{alias="default"} 7' in lines
+
+
+def test_disabled_metrics_record_nothing(settings, metrics_dir):
+    settings.TELEGRAM_USER_TRUSTED_SERVICE_KEYS = ["key"]
+    settings.TELEGRAM_USER_METRICS = {
+        **settings.TELEGRAM_USER_METRICS,
+        "ENABLED": False,
+    }
+
+    with Metrics.timer("check_hash"):
+        pass
+    Metrics.increment("auth_login_total", result="success")
+
+    assert not metrics_dir.exists()
+    response = APIClient().get(reverse("metrics"), headers={"X-Service-Key": "key"})
+    assert response.status_code == 404
+
+
+def test_login_failure_counted_by_reason(settings):
+    settings.TELEGRAM_BOT_TOKENS = ["1234567890:FAKE_BOT_TOKEN"]
+
+    with pytest.raises(AuthenticationFailed):
+        TelegramUserAuthService.authenticate("a" * 5000)
+
+    counters, _ = Metrics.collect()
+    logins = {
+        key: value for key, value in counters.items() if key[0] == "auth_login_total"
+    }
+    assert logins == {("auth_login_total", 'result="too_long"'): 1}
+
+
+def test_metrics_endpoint(settings):
+    settings.TELEGRAM_USER_TRUSTED_SERVICE_KEYS = ["key"]
+    Metrics.increment("auth_refresh_total", result="reused")
+
+    response = APIClient().get(reverse("metrics"), headers={"X-Service-Key": "key"})
+
+    assert response.status_code == 200
+    assert response["Content-Type"].startswith("text/plain; version=0.0.4")
+    assert 'auth_refresh_total{result="reused"} 1' in response.content.decode()
+
+
+def test_metrics_endpoint_requires_service_key(settings):
+    settings.TELEGRAM_USER_TRUSTED_SERVICE_KEYS = ["key"]
+
+    for headers in ({}, {"X-Service-Key": "wrong"}):
+        response = APIClient().get(reverse("metrics"), headers=headers)
+        assert response.status_code == 403
@@ -0,0 +1,161 @@
+import asyncio
+import json
+from datetime import timedelta
+
+import pytest
+from asgiref.sync import async_to_sync
+from django.core.exceptions import MiddlewareNotUsed
+from django.http import HttpResponse
+from django.test import AsyncRequestFactory, RequestFactory
+from django.urls import reverse
+from django.utils import timezone
+
+from telegram_user.middleware import ProfilingMiddleware, RateLimitMiddleware
+from telegram_user.models import ProfilingSwitch
+from telegram_user.services.rate_limit import CacheRateLimitStore
+from telegram_user.services.tg_signer import TelegramDataSigner
+
+
+@pytest.fixture
+def rate_limits(settings):
+    def configure(get_response=lambda request: HttpResponse("ok"), **limits):
+        settings.TELEGRAM_USER_RATE_LIMIT = {
+            **settings.TELEGRAM_USER_RATE_LIMIT,
+            "IP": "100/s",
+            "TELEGRAM_ID": "100/s",
+            "ENDPOINTS": {"telegram-login": "100/s"},
+            **limits,
+        }
+        return RateLimitMiddleware(get_response)
+
+    return configure
+
+
+def login_request(telegram_id=1, ip="10.0.0.1", factory=RequestFactory):
+    init_data = TelegramDataSigner.build_init_data("1:TOKEN", telegram_id, "Test")
+    return factory().post(
+        reverse("telegram-login"),
+        data=json.dumps({"initData": init_data}),
+        content_type="application/json",
+        REMOTE_ADDR=ip,
+    )
+
+
+def test_ip_limit_returns_429_with_retry_after(rate_limits):
+    middleware = rate_limits(IP="2/m")
+
+    assert middleware(login_request(1)).status_code == 200
+    assert middleware(login_request(2)).status_code == 200
+    response = middleware(login_request(3))
+
+    assert response.status_code == 429
+    assert response["Retry-After"] == "30"
+    assert middleware(login_request(4, ip="10.0.0.2")).status_code == 200
+
+
+def test_telegram_id_limit_spans_ips(rate_limits):
+    middleware = rate_limits(TELEGRAM_ID="1/m")
+
+    assert middleware(login_request(7, ip="10.0.0.1")).status_code == 200
+    assert middleware(login_request(7, ip="10.0.0.2")).status_code == 429
+    assert middleware(login_request(8, ip="10.0.0.3")).status_code == 200
+
+
+def test_endpoint_limit(rate_limits):
+    middleware = rate_limits(ENDPOINTS={"telegram-login": "1/s"})
+
+    assert middleware(login_request(1, ip="10.0.0.1")).status_code == 200
+    assert middleware(login_request(2, ip="10.0.0.2")).status_code == 429
+
+
+def test_other_paths_are_not_limited(rate_limits):
+    middleware = rate_limits(IP="1/m")
+
+    for _ in range(3):
+        request = RequestFactory().get(reverse("jwks"), REMOTE_ADDR="10.0.0.1")
+        assert middleware(request).status_code == 200
+
+
+def test_disabled_middleware_is_not_used(rate_limits):
+    with pytest.raises(MiddlewareNotUsed):
+        rate_limits(ENABLED=False)
+
+
+def test_async_requests_are_limited(rate_limits):
+    async def get_response(request):
+        return HttpResponse("ok")
+
+    middleware = rate_limits(get_response, IP="1/m")
+
+    request = login_request(factory=AsyncRequestFactory)
+    assert async_to_sync(middleware)(request).status_code == 200
+    request = login_request(factory=AsyncRequestFactory)
+    assert async_to_sync(middleware)(request).status_code == 429
+
+
+def test_async_cache_store_is_checked_off_event_loop(rate_limits, monkeypatch):
+    async def get_response(request):
+        return HttpResponse("ok")
+
+    loops = []
+
+    def consume(self, key, rate):
+        try:
+            loops.append(asyncio.get_running_loop())
+        except RuntimeError:
+            loops.append(None)
+        return 0.0
+
+    monkeypatch.setattr(CacheRateLimitStore, "consume", consume)
+    middleware = rate_limits(get_response, BACKEND="django")
+
+    request = login_request(factory=AsyncRequestFactory)
+    assert async_to_sync(middleware)(request).status_code == 200
+    assert loops == [None, None, None]
+
+
+@pytest.fixture
+def profiling(settings, tmp_path):
+    def configure(**options):
+        settings.TELEGRAM_USER_PROFILING = {
+            **settings.TELEGRAM_USER_PROFILING,
+            "ENABLED": True,
+            "SAMPLE_RATE": 0.0,
+            "DIR": str(tmp_path),
+            **options,
+        }
+        return ProfilingMiddleware(lambda request: HttpResponse("ok"))
+
+    return configure
+
+
+def test_profiling_disabled_is_not_installed(profiling):
+    with pytest.raises(MiddlewareNotUsed):
+        profiling(ENABLED=False)
+
+
+@pytest.mark.django_db
+def test_profiling_sampled_requests_rotate(profiling, tmp_path):
+    middleware = profiling(SAMPLE_RATE=1.0, MAX_FILES=2)
+
+    for _ in range(3):
+        assert middleware(login_request()).status_code == 200
+    middleware(RequestFactory().get("/admin/"))
+
+    files = sorted(tmp_path.iterdir())
+    assert len(files) == 2
+    assert all(path.name.endswith("-telegram-login.prof") for path in files)
+
+
+@pytest.mark.django_db
+def test_profiling_admin_switch(profiling, tmp_path):
+    switch = ProfilingSwitch.objects.create(pk=1, enabled=True, sample_rate=1.0)
+    middleware = profiling(SWITCH_CHECK_INTERVAL=0)
+
+    middleware(login_request())
+    assert len(list(tmp_path.iterdir())) == 1
+
+    switch.expires_at = timezone.now() - timedelta(minutes=1)
+    switch.save()
+    middleware(login_request())
+    assert len(list(tmp_path.iterdir())) == 1
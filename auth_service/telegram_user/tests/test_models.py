@@ -0,0 +1,187 @@
+from datetime import timedelta
+
+import pytest
+from asgiref.sync import async_to_sync
+from django.utils import timezone
+
+from telegram_user.models import (
+    RefreshClaim,
+    RefreshTokenRotation,
+    RevokedToken,
+    TelegramUser,
+)
+
+
+@pytest.mark.django_db
+class TestTelegramUserManager:
+
+    # Tests for upsert_profile method
+
+    def test_upsert_profile_creates_user(
+        self, valid_user_data, django_assert_num_queries
+    ):
+        with django_assert_num_queries(1):
+            user = TelegramUser.objects.upsert_profile(**valid_user_data)
+
+        assert user.pk is not None
+        db_user = TelegramUser.objects.get(telegram_id=valid_user_data["telegram_id"])
+        assert db_user.pk == user.pk
+        assert db_user.username == valid_user_data["username"]
+
+    def test_upsert_profile_unchanged_does_not_write(
+        self, valid_user_data, django_assert_num_queries
+    ):
+        created = TelegramUser.objects.create(**valid_user_data)
+
+        with django_assert_num_queries(1):
+            user = TelegramUser.objects.upsert_profile(**valid_user_data)
+
+        assert user.pk == created.pk
+        assert user.updated_at == created.updated_at
+        db_user = TelegramUser.objects.get(pk=created.pk)
+        assert db_user.updated_at == created.updated_at
+
+    def test_upsert_profile_updates_changed_profile(
+        self, valid_user_data, django_assert_num_queries
+    ):
+        created = TelegramUser.objects.create(**valid_user_data)
+
+        with django_assert_num_queries(1):
+            user = TelegramUser.objects.upsert_profile(
+                **{**valid_user_data, "username": "renamed"}
+            )
+
+        assert user.pk == created.pk
+        assert user.username == "renamed"
+        assert user.updated_at > created.updated_at
+        assert TelegramUser.objects.get(pk=created.pk).username == "renamed"
+
+    # Tests for bulk_upsert_profiles method
+
+    def test_bulk_upsert_profiles_writes_only_changes(
+        self, valid_user_data, django_assert_num_queries
+    ):
+        unchanged = TelegramUser.objects.create(**valid_user_data)
+        renamed = TelegramUser.objects.create(
+            **{**valid_user_data, "telegram_id": 2, "username": "old"}
+        )
+        new = {**valid_user_data, "telegram_id": 3}
+
+        with django_assert_num_queries(1):
+            users = TelegramUser.objects.bulk_upsert_profiles(
+                [
+                    valid_user_data,
+                    {**valid_user_data, "telegram_id": 2, "username": "new"},
+                    new,
+                ]
+            )
+
+        by_id = {user.telegram_id: user for user in users}
+        assert set(by_id) == {unchanged.telegram_id, 2, 3}
+        assert by_id[unchanged.telegram_id].updated_at == unchanged.updated_at
+        assert by_id[unchanged.telegram_id].created_at == unchanged.created_at
+        assert by_id[2].username == "new"
+        assert by_id[2].created_at == renamed.created_at
+        assert by_id[2].updated_at > renamed.updated_at
+        assert by_id[3].pk is not None
+        db_user = TelegramUser.objects.get(pk=unchanged.pk)
+        assert db_user.updated_at == unchanged.updated_at
+
+    def test_bulk_upsert_profiles_last_duplicate_wins(
+        self, valid_user_data, monkeypatch
+    ):
+        monkeypatch.setattr(TelegramUser.objects, "BULK_BATCH_SIZE", 1)
+        users = TelegramUser.objects.bulk_upsert_profiles(
+            [
+                {**valid_user_data, "username": "first"},
+                {**valid_user_data, "telegram_id": 2},
+                {**valid_user_data, "username": "last"},
+            ]
+        )
+
+        assert len(users) == 2
+        assert {user.telegram_id for user in users} == {
+            valid_user_data["telegram_id"],
+            2,
+        }
+        user = TelegramUser.objects.get(telegram_id=valid_user_data["telegram_id"])
+        assert user.username == "last"
+
+
+@pytest.mark.django_db
+class TestRefreshTokenRotationManager:
+
+    @pytest.fixture
+    def expires_at(self):
+        return timezone.now() + timedelta(days=1)
+
+    def test_claim_only_once(
+        self, valid_user_data, expires_at, django_assert_num_queries
+    ):
+        TelegramUser.objects.create(**valid_user_data)
+        telegram_id = valid_user_data["telegram_id"]
+
+        with django_assert_num_queries(1):
+            claim = RefreshTokenRotation.objects.claim("jti", telegram_id, expires_at)
+        assert claim == RefreshClaim(claimed=True, user_exists=True)
+        with django_assert_num_queries(1):
+            claim = RefreshTokenRotation.objects.claim("jti", telegram_id, expires_at)
+        assert claim == RefreshClaim(claimed=False, user_exists=True)
+
+    def test_claim_missing_user_keeps_token(self, expires_at):
+        claim = RefreshTokenRotation.objects.claim("jti", 1, expires_at)
+
+        assert claim == RefreshClaim(claimed=False, user_exists=False)
+        assert not RefreshTokenRotation.objects.exists()
+
+    def test_claim_revoked_family_keeps_token(self, valid_user_data, expires_at):
+        TelegramUser.objects.create(**valid_user_data)
+        RevokedToken.objects.create(
+            jti="family",
+            expires_at=expires_at + timedelta(hours=1),
+            revoked_at=timezone.now(),
+        )
+
+        claim = RefreshTokenRotation.objects.claim(
+            "jti", valid_user_data["telegram_id"], expires_at, "family"
+        )
+
+        assert claim == RefreshClaim(claimed=False, user_exists=True, revoked=True)
+        assert not RefreshTokenRotation.objects.exists()
+
+    def test_aclaim(self, valid_user_data, expires_at):
+        TelegramUser.objects.create(**valid_user_data)
+        aclaim = async_to_sync(RefreshTokenRotation.objects.aclaim)
+
+        assert aclaim("jti", valid_user_data["telegram_id"], expires_at).claimed
+        assert not aclaim("jti", valid_user_data["telegram_id"], expires_at).claimed
+        assert not aclaim("other", 1, expires_at).user_exists
+
+    def test_claim_and_get_user(
+        self, valid_user_data, expires_at, django_assert_num_queries
+    ):
+        created = TelegramUser.objects.create(**valid_user_data)
+        telegram_id = valid_user_data["telegram_id"]
+
+        with django_assert_num_queries(1):
+            claim, user = RefreshTokenRotation.objects.claim_and_get_user(
+                "jti", telegram_id, expires_at
+            )
+        assert claim == RefreshClaim(claimed=True, user_exists=True)
+        assert user.pk == created.pk
+        assert user.username == created.username
+
+        claim, user = RefreshTokenRotation.objects.claim_and_get_user(
+            "jti", telegram_id, expires_at
+        )
+        assert claim == RefreshClaim(claimed=False, user_exists=True)
+        assert user.pk == created.pk
+
+    def test_claim_and_get_user_missing_user(self, expires_at):
+        claim, user = RefreshTokenRotation.objects.claim_and_get_user(
+            "jti", 1, expires_at
+        )
+
+        assert claim == RefreshClaim(claimed=False, user_exists=False)
+        assert user is None
+        assert not RefreshTokenRotation.objects.exists()
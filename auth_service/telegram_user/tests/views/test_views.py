@@ -1,11 +1,22 @@
+import json
 from unittest.mock import patch
 
 import pytest
+from asgiref.sync import async_to_sync
 from django.core.exceptions import ValidationError
+from django.test import AsyncRequestFactory
 from django.urls import reverse
 from rest_framework import status
 from rest_framework.exceptions import AuthenticationFailed
 from rest_framework.test import APIClient
+from telegram_user.models import TelegramUser
+from telegram_user.services.tg_signer import TelegramDataSigner
+from telegram_user.services.tg_user_auth import TelegramUserAuthService
+from telegram_user.services.token_minter import TokenMinter
+from telegram_user.views import (
+    TelegramUserAsyncAuthView,
+    TelegramUserAsyncRefreshTokenView,
+)
 
 
 @pytest.fixture
@@ -54,6 +65,28 @@ class TestTelegramUserAuthView:
         response_data = response.json()
         assert response_data["error"] == "initData required"
 
+    def test_authentication_passes_bot_id(
+        self, valid_user_obj, valid_jwt_tokens, api_client
+    ):
+        with patch(
+            "telegram_user.services.tg_user_auth.TelegramUserAuthService.authenticate",
+            return_value=(valid_user_obj, valid_jwt_tokens),
+        ) as authenticate:
+            response = api_client.post(
+                self.url, data={"initData": "init_data", "botId": "42"}
+            )
+
+            assert response.status_code == status.HTTP_200_OK
+            authenticate.assert_called_once_with("init_data", 42)
+
+    def test_authentication_invalid_bot_id(self, api_client):
+        response = api_client.post(
+            self.url, data={"initData": "init_data", "botId": "bot"}
+        )
+
+        assert response.status_code == status.HTTP_400_BAD_REQUEST
+        assert response.json()["error"] == "botId must be an integer"
+
     def test_authentication_invalid_data(self, api_client):
         with patch(
             "telegram_user.services.tg_user_auth.TelegramUserAuthService.authenticate",
@@ -108,3 +141,312 @@ class TestTelegramUserRefreshTokenView:
             )
 
             assert response.status_code == status.HTTP_401_UNAUTHORIZED
+
+
+@pytest.mark.django_db
+class TestTelegramUserLogoutView:
+    url = reverse("token-logout")
+
+    def test_logout_revokes_refresh_token(self, api_client, valid_user_obj):
+        tokens = TelegramUserAuthService._generate_jwt_token(valid_user_obj)
+
+        response = api_client.post(self.url, data={"refresh_token": tokens["refresh"]})
+
+        assert response.status_code == status.HTTP_200_OK
+        assert response.json()["message"] == "Logout success!"
+        response = api_client.post(
+            reverse("token-refresh"), data={"refresh_token": tokens["refresh"]}
+        )
+        assert response.status_code == status.HTTP_401_UNAUTHORIZED
+
+    def test_logout_missing_refresh(self, api_client):
+        response = api_client.post(self.url, data={})
+
+        assert response.status_code == status.HTTP_400_BAD_REQUEST
+
+    def test_logout_invalid_refresh(self, api_client):
+        response = api_client.post(self.url, data={"refresh_token": "invalid"})
+
+        assert response.status_code == status.HTTP_401_UNAUTHORIZED
+
+
+def call_async_view(view_class, data, content_type="application/json"):
+    body = json.dumps(data) if content_type == "application/json" else data
+    request = AsyncRequestFactory().post("/", body, content_type=content_type)
+    response = async_to_sync(view_class.as_view())(request)
+    return response.status_code, json.loads(response.content)
+
+
+@pytest.mark.django_db
+class TestTelegramUserAsyncViews:
+
+    def test_login_success(self, valid_user_obj, valid_jwt_tokens):
+        with patch(
+            "telegram_user.services.tg_user_auth.TelegramUserAuthService.aauthenticate",
+            return_value=(valid_user_obj, valid_jwt_tokens),
+        ) as aauthenticate:
+            status_code, body = call_async_view(
+                TelegramUserAsyncAuthView, {"initData": "init_data", "botId": "42"}
+            )
+
+        assert status_code == status.HTTP_200_OK
+        assert body["message"] == "Authentication success!"
+        assert body["data"]["tokens"] == valid_jwt_tokens
+        aauthenticate.assert_awaited_once_with("init_data", 42)
+
+    def test_login_missing_init_data(self):
+        status_code, body = call_async_view(TelegramUserAsyncAuthView, {})
+
+        assert status_code == status.HTTP_400_BAD_REQUEST
+        assert body["error"] == "initData required"
+
+    def test_login_invalid_json(self):
+        request = AsyncRequestFactory().post(
+            "/", "not json", content_type="application/json"
+        )
+        response = async_to_sync(TelegramUserAsyncAuthView.as_view())(request)
+
+        assert response.status_code == status.HTTP_400_BAD_REQUEST
+
+    def test_refresh_success_form_encoded(self, valid_user_obj, valid_jwt_tokens):
+        with patch(
+            "telegram_user.services.tg_user_auth.TelegramUserAuthService.arefresh_user_token",
+            return_value=(valid_user_obj, valid_jwt_tokens),
+        ):
+            status_code, body = call_async_view(
+                TelegramUserAsyncRefreshTokenView,
+                "refresh_token=token",
+                content_type="application/x-www-form-urlencoded",
+            )
+
+        assert status_code == status.HTTP_200_OK
+        assert body["message"] == "Refresh tokens success!"
+
+    def test_refresh_invalid_token(self):
+        with patch(
+            "telegram_user.services.tg_user_auth.TelegramUserAuthService.arefresh_user_token",
+            side_effect=AuthenticationFailed("Invalid refresh token"),
+        ):
+            status_code, _ = call_async_view(
+                TelegramUserAsyncRefreshTokenView, {"refresh_token": "token"}
+            )
+
+        assert status_code == status.HTTP_401_UNAUTHORIZED
+
+
+@pytest.mark.django_db
+class TestTelegramUserBatchVerifyView:
+    url = reverse("telegram-verify-batch")
+
+    @pytest.fixture(autouse=True)
+    def service_key(self, settings):
+        settings.TELEGRAM_USER_TRUSTED_SERVICE_KEYS = ["service-key"]
+
+    def test_requires_service_key(self, api_client):
+        response = api_client.post(self.url, data={"initData": []}, format="json")
+        assert response.status_code == status.HTTP_403_FORBIDDEN
+
+        response = api_client.post(
+            self.url,
+            data={"initData": []},
+            format="json",
+            HTTP_X_SERVICE_KEY="wrong-key",
+        )
+        assert response.status_code == status.HTTP_403_FORBIDDEN
+
+    def test_batch_results(self, api_client, valid_user_obj):
+        results = [
+            {"valid": True, "user": valid_user_obj},
+            {"valid": False, "error": "Invalid hash signature"},
+        ]
+        with patch(
+            "telegram_user.services.tg_user_auth.TelegramUserAuthService.authenticate_batch",
+            return_value=results,
+        ) as authenticate_batch:
+            response = api_client.post(
+                self.url,
+                data={"initData": ["first", "second"], "botId": 7},
+                format="json",
+                HTTP_X_SERVICE_KEY="service-key",
+            )
+
+        assert response.status_code == status.HTTP_200_OK
+        assert response.json()["data"] == [
+            {
+                "valid": True,
+                "user": {
+                    "telegram_id": valid_user_obj.telegram_id,
+                    "username": valid_user_obj.username,
+                },
+            },
+            {"valid": False, "error": "Invalid hash signature"},
+        ]
+        authenticate_batch.assert_called_once_with(["first", "second"], 7)
+
+    @pytest.mark.parametrize("init_data", ["not a list", [1, 2], ["x"] * 3])
+    def test_invalid_batch(self, api_client, settings, init_data):
+        settings.TELEGRAM_USER_BATCH_MAX_SIZE = 2
+
+        response = api_client.post(
+            self.url,
+            data={"initData": init_data},
+            format="json",
+            HTTP_X_SERVICE_KEY="service-key",
+        )
+
+        assert response.status_code == status.HTTP_400_BAD_REQUEST
+
+
+class TestJWKSView:
+    url = reverse("jwks")
+
+    def test_jwks_cacheable(self, api_client):
+        response = api_client.get(self.url)
+
+        assert response.status_code == status.HTTP_200_OK
+        assert response.json() == {"keys": []}
+        assert "public" in response["Cache-Control"]
+        assert "max-age=300" in response["Cache-Control"]
+
+        cached = api_client.get(self.url, HTTP_IF_NONE_MATCH=response["ETag"])
+        assert cached.status_code == status.HTTP_304_NOT_MODIFIED
+
+
+@pytest.mark.django_db
+class TestTelegramUserMeView:
+    url = reverse("telegram-me")
+
+    def test_me_returns_current_user(self, api_client, valid_user_data):
+        user = TelegramUser.objects.create(**valid_user_data)
+        tokens = TelegramUserAuthService._generate_jwt_token(user)
+
+        api_client.credentials(HTTP_AUTHORIZATION=f"Bearer {tokens['access']}")
+        response = api_client.get(self.url)
+
+        assert response.status_code == status.HTTP_200_OK
+        assert response.json()["data"]["user"] == valid_user_data
+
+    def test_me_requires_token(self, api_client):
+        response = api_client.get(self.url)
+
+        assert response.status_code == status.HTTP_401_UNAUTHORIZED
+
+    def test_me_for_deleted_user(self, api_client, valid_user_obj):
+        tokens = TelegramUserAuthService._generate_jwt_token(valid_user_obj)
+
+        api_client.credentials(HTTP_AUTHORIZATION=f"Bearer {tokens['access']}")
+        response = api_client.get(self.url)
+
+        assert response.status_code == status.HTTP_404_NOT_FOUND
+
+
+@pytest.mark.django_db
+class TestTelegramUserIntrospectView:
+    url = reverse("token-introspect")
+
+    @pytest.fixture(autouse=True)
+    def service_key(self, settings):
+        settings.TELEGRAM_USER_TRUSTED_SERVICE_KEYS = ["service-key"]
+
+    def test_requires_service_key(self, api_client):
+        response = api_client.post(self.url, data={"token": "x"}, format="json")
+        assert response.status_code == status.HTTP_403_FORBIDDEN
+
+    def test_introspect_access_token(self, api_client, valid_user_obj):
+        tokens = TelegramUserAuthService._generate_jwt_token(valid_user_obj)
+
+        response = api_client.post(
+            self.url,
+            data={"token": tokens["access"]},
+            format="json",
+            HTTP_X_SERVICE_KEY="service-key",
+        )
+
+        assert response.status_code == status.HTTP_200_OK
+        data = response.json()["data"]
+        assert data["active"] is True
+        assert data["telegram_id"] == valid_user_obj.telegram_id
+
+    def test_introspect_invalid_token(self, api_client):
+        response = api_client.post(
+            self.url,
+            data={"token": "not-a-jwt"},
+            format="json",
+            HTTP_X_SERVICE_KEY="service-key",
+        )
+
+        assert response.status_code == status.HTTP_200_OK
+        assert response.json()["data"] == {"active": False}
+
+    def test_token_required(self, api_client):
+        response = api_client.post(
+            self.url, data={}, format="json", HTTP_X_SERVICE_KEY="service-key"
+        )
+        assert response.status_code == status.HTTP_400_BAD_REQUEST
+
+
+@pytest.mark.django_db
+class TestEndpointQueryCounts:
+    """Число запросов к БД на вызов: регрессии видны здесь и в benchmarks.suite"""
+
+    bot_token = "1234567890:FAKE_BOT_TOKEN"
+
+    @pytest.fixture(autouse=True)
+    def bot_tokens(self, settings):
+        settings.TELEGRAM_BOT_TOKENS = [self.bot_token]
+
+    def test_login_single_upsert(self, api_client, django_assert_num_queries):
+        init_data = TelegramDataSigner.build_init_data(self.bot_token, 42, "Test")
+
+        with django_assert_num_queries(1):
+            response = api_client.post(
+                reverse("telegram-login"), data={"initData": init_data}
+            )
+
+        assert response.status_code == status.HTTP_200_OK
+
+    def test_refresh_single_claim(self, api_client, django_assert_num_queries):
+        TelegramUser.objects.create(telegram_id=42, first_name="Test")
+        warmup, refresh = (
+            TokenMinter.mint_pair({"telegram_id": 42})["refresh"] for _ in range(2)
+        )
+        # Первый запрос воркера загружает фильтр отозванных токенов
+        api_client.post(reverse("token-refresh"), data={"refresh_token": warmup})
+
+        with django_assert_num_queries(1):
+            response = api_client.post(
+                reverse("token-refresh"), data={"refresh_token": refresh}
+            )
+
+        assert response.status_code == status.HTTP_200_OK
+
+
+@pytest.mark.django_db
+class TestApiSettingsProfile:
+    """Эндпоинты под урезанным профилем auth_service.settings_api"""
+
+    bot_token = "1234567890:FAKE_BOT_TOKEN"
+
+    @pytest.fixture(autouse=True)
+    def api_profile(self, settings):
+        from auth_service import settings_api
+
+        settings.MIDDLEWARE = settings_api.MIDDLEWARE
+        settings.ROOT_URLCONF = settings_api.ROOT_URLCONF
+        settings.REST_FRAMEWORK = settings_api.REST_FRAMEWORK
+        settings.TELEGRAM_BOT_TOKENS = [self.bot_token]
+
+    def test_login_and_refresh(self, api_client):
+        init_data = TelegramDataSigner.build_init_data(self.bot_token, 42, "Test")
+
+        login = api_client.post(reverse("telegram-login"), data={"initData": init_data})
+        assert login.status_code == status.HTTP_200_OK
+        refresh = api_client.post(
+            reverse("token-refresh"),
+            data={"refresh_token": login.json()["data"]["tokens"]["refresh"]},
+        )
+        assert refresh.status_code == status.HTTP_200_OK
+        assert refresh["Content-Type"] == "application/json"
+
+    def test_admin_is_not_served(self, api_client):
+        assert api_client.get("/admin/").status_code == status.HTTP_404_NOT_FOUND
@@ -1,8 +1,39 @@
+from django.conf import settings
 from django.urls import path
 
-from telegram_user.views import TelegramUserAuthView, TelegramUserRefreshTokenView
+from telegram_user.views import (
+    TelegramUserAsyncAuthView,
+    TelegramUserAsyncRefreshTokenView,
+    TelegramUserAuthView,
+    TelegramUserBatchVerifyView,
+    TelegramUserIntrospectView,
+    TelegramUserLogoutView,
+    TelegramUserMeView,
+    TelegramUserRefreshTokenView,
+)
+
+# Под ASGI используются асинхронные версии представлений
+if settings.TELEGRAM_USER_ASYNC_VIEWS:
+    login_view, refresh_view = (
+        TelegramUserAsyncAuthView,
+        TelegramUserAsyncRefreshTokenView,
+    )
+else:
+    login_view, refresh_view = TelegramUserAuthView, TelegramUserRefreshTokenView
 
 urlpatterns = [
-    path("auth/login/", TelegramUserAuthView.as_view(), name="telegram-login"),
-    path("auth/refresh/", TelegramUserRefreshTokenView.as_view(), name="token-refresh"),
+    path("auth/login/", login_view.as_view(), name="telegram-login"),
+    path("auth/refresh/", refresh_view.as_view(), name="token-refresh"),
+    path("auth/logout/", TelegramUserLogoutView.as_view(), name="token-logout"),
+    path("auth/me/", TelegramUserMeView.as_view(), name="telegram-me"),
+    path(
+        "auth/verify/batch/",
+        TelegramUserBatchVerifyView.as_view(),
+        name="telegram-verify-batch",
+    ),
+    path(
+        "auth/introspect/",
+        TelegramUserIntrospectView.as_view(),
+        name="token-introspect",
+    ),
 ]
@@ -1,17 +1,70 @@
+import json
 import logging
 
+from django.conf import settings
+from django.http import HttpResponse, JsonResponse
+from django.utils.cache import patch_cache_control
+from django.utils.decorators import method_decorator
+from django.views import View
+from django.views.decorators.csrf import csrf_exempt
+from django.views.decorators.http import condition
 from rest_framework import status
 from rest_framework.exceptions import AuthenticationFailed
-from rest_framework.permissions import AllowAny
+from rest_framework.permissions import AllowAny, IsAuthenticated
 from rest_framework.response import Response
 from rest_framework.views import APIView
 
+from .metrics import Metrics
+from .permissions import IsTrustedService
+from .services.jwt_keys import JWTKeyRing
 from .services.tg_user_auth import TelegramUserAuthService
+from .services.token_introspection import TokenIntrospector
 
 logger = logging.getLogger("telegram_user")
 
 
-class TelegramUserAuthView(APIView):
+def token_pair_payload(user, tokens: dict, message: str) -> dict:
+    """Тело успешного ответа со сведениями о пользователе и парой токенов"""
+    return {
+        "data": {
+            "user": {
+                "telegram_id": user.telegram_id,
+                "username": user.username,
+            },
+            "tokens": {
+                "access": tokens["access"],
+                "refresh": tokens["refresh"],
+            },
+        },
+        "message": message,
+    }
+
+
+class RenderTimingMixin:
+    """
+    Рендерит ответ DRF в finalize_response, чтобы время сериализации попало
+    в этап render_response. Повторный render() обработчика Django ничего не делает.
+    """
+
+    def finalize_response(self, request, response, *args, **kwargs):
+        response = super().finalize_response(request, response, *args, **kwargs)
+        with Metrics.timer("render_response"):
+            response.render()
+        return response
+
+
+def parse_bot_id(bot_id) -> int | None:
+    """Приводит необязательный botId к int, при ошибке - ValueError"""
+    if bot_id is None:
+        return None
+    try:
+        return int(bot_id)
+    except (TypeError, ValueError):
+        logger.warning("Invalid botId: %r", bot_id)
+        raise ValueError("botId must be an integer")
+
+
+class TelegramUserAuthView(RenderTimingMixin, APIView):
     """Класс для обработки запросов на аутентификацию пользователей из Telegram Web App"""
 
     permission_classes = [AllowAny]
@@ -19,41 +72,42 @@ class TelegramUserAuthView(APIView):
     def post(self, request):
         """Аутентификация через Telegram Mini App"""
         try:
-            if not (init_data := request.data.get("initData")):
-                logger.error("initData has not been sent")
+            with Metrics.timer("parse_request"):
+                data = request.data
+            if not (init_data := data.get("initData")):
+                logger.warning("initData has not been sent")
                 return Response(
                     {"error": "initData required"}, status=status.HTTP_400_BAD_REQUEST
                 )
 
-            user, tokens = TelegramUserAuthService.authenticate(init_data)
+            try:
+                bot_id = parse_bot_id(data.get("botId"))
+            except ValueError as e:
+                return Response({"error": str(e)}, status=status.HTTP_400_BAD_REQUEST)
+
+            user, tokens = TelegramUserAuthService.authenticate(init_data, bot_id)
 
             response = Response(
-                {
-                    "data": {
-                        "user": {
-                            "telegram_id": user.telegram_id,
-                            "username": user.username,
-                        },
-                        "tokens": {
-                            "access": tokens["access"],
-                            "refresh": tokens["refresh"],
-                        },
-                    },
-                    "message": "Authentication success!",
-                },
+                token_pair_payload(user, tokens, "Authentication success!"),
                 status=status.HTTP_200_OK,
             )
 
             return response
+        except AuthenticationFailed as e:
+            # Причина уже залогирована сервисом
+            return Response(
+                {"error": str(e), "message": "Authentication failed!"},
+                status=status.HTTP_401_UNAUTHORIZED,
+            )
         except Exception as e:
-            logger.error(f"Authentication failed: {e}")
+            logger.exception("Unexpected error during authentication")
             return Response(
                 {"error": str(e), "message": "Authentication failed!"},
                 status=status.HTTP_401_UNAUTHORIZED,
             )
 
 
-class TelegramUserRefreshTokenView(APIView):
+class TelegramUserRefreshTokenView(RenderTimingMixin, APIView):
     """Класс для обработки запросов на обновление токенов пользователей из Telegram Web App"""
 
     permission_classes = [AllowAny]
@@ -62,8 +116,10 @@ class TelegramUserRefreshTokenView(APIView):
 
     def post(self, request):
         try:
-            if not (refresh_token := request.data.get("refresh_token")):
-                logger.error("Refresh token has not been sent")
+            with Metrics.timer("parse_request"):
+                data = request.data
+            if not (refresh_token := data.get("refresh_token")):
+                logger.warning("Refresh token has not been sent")
                 return Response(
                     {"error": "Refresh token required"},
                     status=status.HTTP_400_BAD_REQUEST,
@@ -72,29 +128,312 @@ class TelegramUserRefreshTokenView(APIView):
             user, new_tokens = TelegramUserAuthService.refresh_user_token(refresh_token)
 
             response = Response(
-                {
-                    "data": {
-                        "user": {
-                            "telegram_id": user.telegram_id,
-                            "username": user.username,
-                        },
-                        "tokens": {
-                            "access": new_tokens["access"],
-                            "refresh": new_tokens["refresh"],
-                        },
-                    },
-                    "message": "Refresh tokens success!",
-                },
+                token_pair_payload(user, new_tokens, "Refresh tokens success!"),
                 status=status.HTTP_200_OK,
             )
 
             return response
         except AuthenticationFailed as e:
-            logger.error(f"Token refresh failed: {e}")
             return Response({"error": str(e)}, status=status.HTTP_401_UNAUTHORIZED)
-        except Exception as e:
-            logger.error(f"Unexpected error during refresh: {e}")
+        except Exception:
+            logger.exception("Unexpected error during refresh")
             return Response(
                 {"error": "Internal server error"},
                 status=status.HTTP_500_INTERNAL_SERVER_ERROR,
             )
+
+
+class TelegramUserLogoutView(APIView):
+    """
+    Выход: отзывает семейство переданного refresh-токена. Access-токены
+    остаются действительными до истечения своего короткого срока.
+    """
+
+    permission_classes = [AllowAny]
+
+    def post(self, request):
+        if not (refresh_token := request.data.get("refresh_token")):
+            logger.warning("Refresh token has not been sent")
+            return Response(
+                {"error": "Refresh token required"},
+                status=status.HTTP_400_BAD_REQUEST,
+            )
+
+        try:
+            TelegramUserAuthService.logout(refresh_token)
+        except AuthenticationFailed as e:
+            return Response({"error": str(e)}, status=status.HTTP_401_UNAUTHORIZED)
+
+        return Response({"message": "Logout success!"}, status=status.HTTP_200_OK)
+
+
+class TelegramUserMeView(APIView):
+    """
+    Данные текущего пользователя. Аутентификация по access-токену не обращается к БД,
+    профиль берётся из кэша и только при промахе загружается из базы.
+    """
+
+    permission_classes = [IsAuthenticated]
+
+    def get(self, request):
+        user = request.user.user
+        if user is None:
+            logger.warning(
+                "User from access token not found",
+                extra={"event": "me_user_not_found", "tg_id": request.user.telegram_id},
+            )
+            return Response(
+                {"error": "User not found"}, status=status.HTTP_404_NOT_FOUND
+            )
+        return Response(
+            {
+                "data": {
+                    "user": {
+                        "telegram_id": user.telegram_id,
+                        "first_name": user.first_name,
+                        "last_name": user.last_name,
+                        "username": user.username,
+                    }
+                },
+                "message": "Current user",
+            },
+            status=status.HTTP_200_OK,
+        )
+
+
+class TelegramUserBatchVerifyView(APIView):
+    """
+    Пакетная проверка initData для доверенных сервисов (бэкенд бота, шлюз).
+    Принимает {"initData": [...], "botId": необязательно}, возвращает результат по каждому элементу.
+    """
+
+    authentication_classes = []
+    permission_classes = [IsTrustedService]
+
+    def post(self, request):
+        init_data_list = request.data.get("initData")
+        if not isinstance(init_data_list, list) or not all(
+            isinstance(item, str) for item in init_data_list
+        ):
+            logger.warning("Batch initData must be a list of strings")
+            return Response(
+                {"error": "initData must be a list of strings"},
+                status=status.HTTP_400_BAD_REQUEST,
+            )
+        if len(init_data_list) > settings.TELEGRAM_USER_BATCH_MAX_SIZE:
+            logger.warning("Batch of %d initData is too large", len(init_data_list))
+            return Response(
+                {
+                    "error": f"At most {settings.TELEGRAM_USER_BATCH_MAX_SIZE} "
+                    "initData per request"
+                },
+                status=status.HTTP_400_BAD_REQUEST,
+            )
+
+        try:
+            bot_id = parse_bot_id(request.data.get("botId"))
+        except ValueError as e:
+            return Response({"error": str(e)}, status=status.HTTP_400_BAD_REQUEST)
+
+        try:
+            results = TelegramUserAuthService.authenticate_batch(init_data_list, bot_id)
+        except AuthenticationFailed:
+            # Ошибка БД уже залогирована сервисом
+            return Response(
+                {"error": "Internal server error"},
+                status=status.HTTP_500_INTERNAL_SERVER_ERROR,
+            )
+
+        return Response(
+            {
+                "data": [
+                    (
+                        {
+                            "valid": True,
+                            "user": {
+                                "telegram_id": result["user"].telegram_id,
+                                "username": result["user"].username,
+                            },
+                        }
+                        if result["valid"]
+                        else result
+                    )
+                    for result in results
+                ],
+                "message": "Batch verification complete",
+            },
+            status=status.HTTP_200_OK,
+        )
+
+
+class TelegramUserIntrospectView(APIView):
+    """
+    Проверка access-токена для доверенных сервисов, которые не проверяют JWT сами.
+    Принимает {"token": "..."}, возвращает active и claims токена.
+    """
+
+    authentication_classes = []
+    permission_classes = [IsTrustedService]
+
+    def post(self, request):
+        token = request.data.get("token")
+        if not token or not isinstance(token, str):
+            logger.warning("Token for introspection has not been sent")
+            return Response(
+                {"error": "token required"}, status=status.HTTP_400_BAD_REQUEST
+            )
+
+        return Response(
+            {
+                "data": TokenIntrospector.introspect(token),
+                "message": "Token introspection complete",
+            },
+            status=status.HTTP_200_OK,
+        )
+
+
+def _request_data(request) -> dict:
+    """Тело запроса JSON или формы (аналог request.data в DRF)"""
+    if request.content_type == "application/json":
+        data = json.loads(request.body or b"{}")
+        if not isinstance(data, dict):
+            raise ValueError("JSON object expected")
+        return data
+    return request.POST
+
+
+@method_decorator(csrf_exempt, name="dispatch")
+class TelegramUserAsyncAuthView(View):
+    """
+    Асинхронная версия TelegramUserAuthView для запуска под ASGI.
+    Пока запрос ожидает БД, воркер обслуживает другие запросы.
+    """
+
+    http_method_names = ["post"]
+
+    async def post(self, request):
+        """Аутентификация через Telegram Mini App"""
+        try:
+            with Metrics.timer("parse_request"):
+                data = _request_data(request)
+        except ValueError as e:
+            logger.warning("Invalid request body: %s", str(e))
+            return JsonResponse(
+                {"error": "Invalid request body"}, status=status.HTTP_400_BAD_REQUEST
+            )
+
+        try:
+            if not (init_data := data.get("initData")):
+                logger.warning("initData has not been sent")
+                return JsonResponse(
+                    {"error": "initData required"}, status=status.HTTP_400_BAD_REQUEST
+                )
+
+            try:
+                bot_id = parse_bot_id(data.get("botId"))
+            except ValueError as e:
+                return JsonResponse(
+                    {"error": str(e)}, status=status.HTTP_400_BAD_REQUEST
+                )
+
+            user, tokens = await TelegramUserAuthService.aauthenticate(
+                init_data, bot_id
+            )
+
+            with Metrics.timer("render_response"):
+                return JsonResponse(
+                    token_pair_payload(user, tokens, "Authentication success!"),
+                    status=status.HTTP_200_OK,
+                )
+        except AuthenticationFailed as e:
+            return JsonResponse(
+                {"error": str(e), "message": "Authentication failed!"},
+                status=status.HTTP_401_UNAUTHORIZED,
+            )
+        except Exception as e:
+            logger.exception("Unexpected error during authentication")
+            return JsonResponse(
+                {"error": str(e), "message": "Authentication failed!"},
+                status=status.HTTP_401_UNAUTHORIZED,
+            )
+
+
+@method_decorator(csrf_exempt, name="dispatch")
+class TelegramUserAsyncRefreshTokenView(View):
+    """Асинхронная версия TelegramUserRefreshTokenView для запуска под ASGI"""
+
+    http_method_names = ["post"]
+
+    async def post(self, request):
+        """Обновление JWT токенов"""
+        try:
+            with Metrics.timer("parse_request"):
+                data = _request_data(request)
+        except ValueError as e:
+            logger.warning("Invalid request body: %s", str(e))
+            return JsonResponse(
+                {"error": "Invalid request body"}, status=status.HTTP_400_BAD_REQUEST
+            )
+
+        try:
+            if not (refresh_token := data.get("refresh_token")):
+                logger.warning("Refresh token has not been sent")
+                return JsonResponse(
+                    {"error": "Refresh token required"},
+                    status=status.HTTP_400_BAD_REQUEST,
+                )
+
+            user, new_tokens = await TelegramUserAuthService.arefresh_user_token(
+                refresh_token
+            )
+
+            with Metrics.timer("render_response"):
+                return JsonResponse(
+                    token_pair_payload(user, new_tokens, "Refresh tokens success!"),
+                    status=status.HTTP_200_OK,
+                )
+        except AuthenticationFailed as e:
+            return JsonResponse({"error": str(e)}, status=status.HTTP_401_UNAUTHORIZED)
+        except Exception:
+            logger.exception("Unexpected error during refresh")
+            return JsonResponse(
+                {"error": "Internal server error"},
+                status=status.HTTP_500_INTERNAL_SERVER_ERROR,
+            )
+
+
+class JWKSView(View):
+    """
+    Открытые ключи подписи JWT (JWKS) для локальной проверки токенов другими сервисами.
+    Ответ кэшируется клиентами на JWKS_MAX_AGE секунд и проверяется по ETag.
+    """
+
+    http_method_names = ["get", "head"]
+
+    @method_decorator(condition(etag_func=lambda request: JWTKeyRing.etag()))
+    def get(self, request):
+        response = HttpResponse(JWTKeyRing.jwks(), content_type="application/json")
+        patch_cache_control(
+            response,
+            public=True,
+            max_age=settings.TELEGRAM_USER_JWT_KEYS["JWKS_MAX_AGE"],
+        )
+        return response
+
+
+class MetricsView(APIView):
+    """
+    Метрики всех воркеров в текстовом формате Prometheus.
+    Доступны только доверенным сервисам: сборщик передаёт ключ в X-Service-Key.
+    """
+
+    http_method_names = ["get"]
+    authentication_classes = []
+    permission_classes = [IsTrustedService]
+
+    def get(self, request):
+        if not Metrics.enabled():
+            return HttpResponse(status=status.HTTP_404_NOT_FOUND)
+        return HttpResponse(
+            Metrics.render(), content_type="text/plain; version=0.0.4; charset=utf-8"
+        )
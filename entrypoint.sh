@@ -1,7 +1,6 @@
 #!/bin/sh
 
-echo "Applying database migrations..."
-python manage.py migrate --noinput
-
+# Миграции применяет отдельное задание (manage.py migrate_locked, сервис migrate
+# в docker-compose.yml), gunicorn при старте только проверяет, что схема актуальна
 echo "Starting server..."
 exec "$@"
\ No newline at end of file